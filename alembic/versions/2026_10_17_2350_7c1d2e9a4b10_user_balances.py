@@ -0,0 +1,39 @@
+"""user balances snapshot
+
+Revision ID: 7c1d2e9a4b10
+Revises: 425d8b7e517e
+Create Date: 2026-10-17 23:50:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c1d2e9a4b10'
+down_revision: Union[str, None] = '425d8b7e517e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('user_balances',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('balance_rub', sa.Numeric(precision=12, scale=2), server_default=sa.text('0'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='RESTRICT'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+    # начальные снапшоты из существующего леджера
+    op.execute(
+        "INSERT INTO user_balances (user_id, balance_rub, updated_at) "
+        "SELECT user_id, SUM(amount_rub), now() FROM wallet_ledger GROUP BY user_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('user_balances')
@@ -0,0 +1,41 @@
+"""telegram updates queue
+
+Revision ID: b3f4a8c2d915
+Revises: 7c1d2e9a4b10
+Create Date: 2026-10-18 00:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f4a8c2d915'
+down_revision: Union[str, None] = '7c1d2e9a4b10'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('telegram_updates',
+    sa.Column('update_id', sa.BIGINT(), autoincrement=False, nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('status', sa.Enum('PENDING', 'PROCESSING', 'DONE', 'DEAD', name='update_status_enum', native_enum=False), server_default=sa.text("'PENDING'"), nullable=False, comment='Статус обработки апдейта'),
+    sa.Column('attempts', sa.Integer(), server_default=sa.text('0'), nullable=False),
+    sa.Column('available_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('locked_until', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('update_id')
+    )
+    op.create_index('ix_telegram_updates_status_available', 'telegram_updates', ['status', 'available_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_telegram_updates_status_available', table_name='telegram_updates')
+    op.drop_table('telegram_updates')
@@ -0,0 +1,48 @@
+"""servers registry
+
+Revision ID: 5e2a9c7d1f40
+Revises: b3f4a8c2d915
+Create Date: 2026-10-18 00:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e2a9c7d1f40'
+down_revision: Union[str, None] = 'b3f4a8c2d915'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('servers',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('country', sa.String(length=64), nullable=False),
+    sa.Column('domain', sa.String(length=64), nullable=False, comment='vpn_domain ноды'),
+    sa.Column('capacity', sa.Integer(), server_default=sa.text('0'), nullable=False, comment='Лимит активных конфигов, 0 — без лимита'),
+    sa.Column('enabled', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+    sa.Column('weight', sa.Integer(), server_default=sa.text('100'), nullable=False, comment='Вес при выборе ноды внутри страны'),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('domain')
+    )
+    op.create_index(op.f('ix_servers_id'), 'servers', ['id'], unique=False)
+    # ноды, на которые уже выданы конфиги
+    op.execute(
+        "INSERT INTO servers (country, domain, created_at, updated_at) "
+        "SELECT DISTINCT ON (vpn_domain) COALESCE(country, ''), vpn_domain, now(), now() "
+        "FROM vpn_configs WHERE vpn_domain IS NOT NULL "
+        "ORDER BY vpn_domain, created_at DESC"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_servers_id'), table_name='servers')
+    op.drop_table('servers')
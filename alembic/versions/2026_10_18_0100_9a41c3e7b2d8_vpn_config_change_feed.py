@@ -0,0 +1,80 @@
+"""vpn config change feed
+
+Revision ID: 9a41c3e7b2d8
+Revises: 5e2a9c7d1f40
+Create Date: 2026-10-18 01:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9a41c3e7b2d8'
+down_revision: Union[str, None] = '5e2a9c7d1f40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Advisory-лок до конца транзакции сериализует пишущих в ленту: ревизия
+# выдаётся под локом, поэтому порядок ревизий совпадает с порядком коммитов
+# и читатель с since=N не может пропустить позже закоммиченную ревизию < N.
+LOG_CHANGE_FUNCTION = """
+CREATE OR REPLACE FUNCTION vpn_config_log_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active AND OLD.vpn_domain IS NOT NULL THEN
+        IF TG_OP = 'DELETE' OR NOT NEW.is_active
+           OR (NEW.uuid, NEW.vpn_domain, NEW.email, NEW.flow)
+              IS DISTINCT FROM (OLD.uuid, OLD.vpn_domain, OLD.email, OLD.flow) THEN
+            PERFORM pg_advisory_xact_lock(hashtext('vpn_config_changes'));
+            INSERT INTO vpn_config_changes (node, config_id, op, uuid, email, flow, created_at)
+            VALUES (OLD.vpn_domain, OLD.id, 'REMOVE', OLD.uuid, COALESCE(OLD.email, OLD.uuid), OLD.flow, now());
+        END IF;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active AND NEW.vpn_domain IS NOT NULL THEN
+        IF TG_OP = 'INSERT' OR NOT OLD.is_active
+           OR (NEW.uuid, NEW.vpn_domain, NEW.email, NEW.flow)
+              IS DISTINCT FROM (OLD.uuid, OLD.vpn_domain, OLD.email, OLD.flow) THEN
+            PERFORM pg_advisory_xact_lock(hashtext('vpn_config_changes'));
+            INSERT INTO vpn_config_changes (node, config_id, op, uuid, email, flow, created_at)
+            VALUES (NEW.vpn_domain, NEW.id, 'ADD', NEW.uuid, COALESCE(NEW.email, NEW.uuid), NEW.flow, now());
+        END IF;
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('vpn_config_changes',
+    sa.Column('revision', sa.BIGINT(), autoincrement=True, nullable=False),
+    sa.Column('node', sa.String(length=64), nullable=False, comment='vpn_domain конфига'),
+    sa.Column('config_id', sa.Integer(), nullable=False),
+    sa.Column('op', sa.Enum('ADD', 'REMOVE', name='config_change_op_enum', native_enum=False), nullable=False),
+    sa.Column('uuid', sa.String(length=64), nullable=True),
+    sa.Column('email', sa.String(length=64), nullable=True, comment='email в инбаунде Xray (email или uuid)'),
+    sa.Column('flow', sa.String(length=64), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('revision')
+    )
+    op.create_index('ix_vpn_config_changes_node_revision', 'vpn_config_changes', ['node', 'revision'], unique=False)
+    op.create_index('ix_vpn_configs_domain_active', 'vpn_configs', ['vpn_domain'], unique=False, postgresql_where=sa.text('is_active'))
+    op.execute(LOG_CHANGE_FUNCTION)
+    op.execute(
+        "CREATE TRIGGER vpn_configs_change_feed "
+        "AFTER INSERT OR UPDATE OR DELETE ON vpn_configs "
+        "FOR EACH ROW EXECUTE FUNCTION vpn_config_log_change()"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP TRIGGER IF EXISTS vpn_configs_change_feed ON vpn_configs")
+    op.execute("DROP FUNCTION IF EXISTS vpn_config_log_change()")
+    op.drop_index('ix_vpn_configs_domain_active', table_name='vpn_configs', postgresql_where=sa.text('is_active'))
+    op.drop_index('ix_vpn_config_changes_node_revision', table_name='vpn_config_changes')
+    op.drop_table('vpn_config_changes')
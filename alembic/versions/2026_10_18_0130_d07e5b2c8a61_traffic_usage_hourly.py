@@ -0,0 +1,35 @@
+"""traffic usage hourly
+
+Revision ID: d07e5b2c8a61
+Revises: 9a41c3e7b2d8
+Create Date: 2026-10-18 01:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd07e5b2c8a61'
+down_revision: Union[str, None] = '9a41c3e7b2d8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('traffic_usage_hourly',
+    sa.Column('config_id', sa.Integer(), nullable=False),
+    sa.Column('bucket', sa.DateTime(), nullable=False, comment='Начало часа'),
+    sa.Column('uplink', sa.BIGINT(), server_default=sa.text('0'), nullable=False),
+    sa.Column('downlink', sa.BIGINT(), server_default=sa.text('0'), nullable=False),
+    sa.ForeignKeyConstraint(['config_id'], ['vpn_configs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('config_id', 'bucket')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('traffic_usage_hourly')
@@ -0,0 +1,40 @@
+"""ledger billing day
+
+Revision ID: e4b19f6d3a72
+Revises: d07e5b2c8a61
+Create Date: 2026-10-18 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e4b19f6d3a72'
+down_revision: Union[str, None] = 'd07e5b2c8a61'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('wallet_ledger', sa.Column('config_id', sa.Integer(), nullable=True))
+    op.add_column('wallet_ledger', sa.Column('billing_day', sa.Date(), nullable=True))
+    op.create_foreign_key(
+        'wallet_ledger_config_id_fkey', 'wallet_ledger', 'vpn_configs',
+        ['config_id'], ['id'], ondelete='SET NULL',
+    )
+    op.create_index(
+        'uq_wallet_ledger_config_day', 'wallet_ledger', ['config_id', 'billing_day'],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('uq_wallet_ledger_config_day', table_name='wallet_ledger')
+    op.drop_constraint('wallet_ledger_config_id_fkey', 'wallet_ledger', type_='foreignkey')
+    op.drop_column('wallet_ledger', 'billing_day')
+    op.drop_column('wallet_ledger', 'config_id')
@@ -0,0 +1,36 @@
+"""server link params
+
+Revision ID: f3c87a1e5d09
+Revises: e4b19f6d3a72
+Create Date: 2026-10-18 02:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c87a1e5d09'
+down_revision: Union[str, None] = 'e4b19f6d3a72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('servers', sa.Column('protocol', sa.String(length=64), server_default=sa.text("'vless'"), nullable=False, comment='vless | vmess | trojan'))
+    op.add_column('servers', sa.Column('port', sa.Integer(), server_default=sa.text('443'), nullable=False))
+    op.add_column('servers', sa.Column('reality_pbk', sa.String(length=128), nullable=True))
+    op.add_column('servers', sa.Column('reality_sid', sa.String(length=64), nullable=True))
+    op.add_column('servers', sa.Column('reality_sni', sa.String(length=128), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('servers', 'reality_sni')
+    op.drop_column('servers', 'reality_sid')
+    op.drop_column('servers', 'reality_pbk')
+    op.drop_column('servers', 'port')
+    op.drop_column('servers', 'protocol')
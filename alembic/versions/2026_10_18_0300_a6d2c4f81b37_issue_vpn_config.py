@@ -0,0 +1,64 @@
+"""issue vpn config function
+
+Revision ID: a6d2c4f81b37
+Revises: f3c87a1e5d09
+Create Date: 2026-10-18 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a6d2c4f81b37'
+down_revision: Union[str, None] = 'f3c87a1e5d09'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Выдача ключа одним вызовом: advisory-лок пользователя до конца транзакции,
+# проверка лимита и вставка. Функция VOLATILE, поэтому в READ COMMITTED каждый
+# запрос внутри видит свежий снапшот: подсчёт после лока учитывает ключ,
+# выданный параллельным запросом, который держал лок до нас.
+# Лимит превышен — строка с config_id NULL и текущим числом ключей.
+ISSUE_FUNCTION = """
+CREATE OR REPLACE FUNCTION issue_vpn_config(
+    p_user_id integer, p_domain varchar, p_country varchar, p_flow varchar, p_limit integer
+) RETURNS TABLE (
+    config_id integer, config_uuid varchar, config_email varchar,
+    config_created_at timestamp, active_keys integer
+) AS $$
+DECLARE
+    v_active integer;
+    v_id integer;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('vpn_configs.issue'), p_user_id);
+    SELECT count(*) INTO v_active
+    FROM vpn_configs c WHERE c.user_id = p_user_id AND c.is_active;
+    IF v_active >= p_limit THEN
+        RETURN QUERY SELECT NULL::integer, NULL::varchar, NULL::varchar, NULL::timestamp, v_active;
+        RETURN;
+    END IF;
+
+    v_id := nextval(pg_get_serial_sequence('vpn_configs', 'id'));
+    RETURN QUERY
+    INSERT INTO vpn_configs AS c (id, user_id, uuid, vpn_domain, flow, email, country, is_active, created_at)
+    VALUES (
+        v_id, p_user_id, gen_random_uuid()::varchar, p_domain, p_flow,
+        format('u%s-k%s', p_user_id, v_id), p_country, true, now()
+    )
+    RETURNING c.id, c.uuid, c.email, c.created_at, v_active + 1;
+END
+$$ LANGUAGE plpgsql VOLATILE;
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute(ISSUE_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute("DROP FUNCTION IF EXISTS issue_vpn_config(integer, varchar, varchar, varchar, integer)")
@@ -0,0 +1,29 @@
+"""ledger history keyset index
+
+Revision ID: b81e5f2a9c64
+Revises: a6d2c4f81b37
+Create Date: 2026-10-18 03:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b81e5f2a9c64'
+down_revision: Union[str, None] = 'a6d2c4f81b37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_index('ix_wallet_ledger_user_created', table_name='wallet_ledger')
+    op.create_index('ix_wallet_ledger_user_created', 'wallet_ledger', ['user_id', 'created_at', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_wallet_ledger_user_created', table_name='wallet_ledger')
+    op.create_index('ix_wallet_ledger_user_created', 'wallet_ledger', ['user_id', 'created_at'], unique=False)
@@ -0,0 +1,111 @@
+"""issue vpn config: node capacity
+
+Revision ID: c4e7a9d2f615
+Revises: b81e5f2a9c64
+Create Date: 2026-10-18 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e7a9d2f615'
+down_revision: Union[str, None] = 'b81e5f2a9c64'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# К лимиту пользователя добавляется servers.capacity: у ноды с лимитом
+# выдача берёт второй advisory-лок — на домен (всегда после лока
+# пользователя, порядок один, взаимных блокировок нет) и считает её
+# активные конфиги по частичному индексу ix_vpn_configs_domain_active.
+# Нода заполнена — строка с config_id NULL и node_full = true.
+ISSUE_FUNCTION = """
+CREATE FUNCTION issue_vpn_config(
+    p_user_id integer, p_domain varchar, p_country varchar, p_flow varchar, p_limit integer
+) RETURNS TABLE (
+    config_id integer, config_uuid varchar, config_email varchar,
+    config_created_at timestamp, active_keys integer, node_full boolean
+) AS $$
+DECLARE
+    v_active integer;
+    v_capacity integer;
+    v_id integer;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('vpn_configs.issue'), p_user_id);
+    SELECT count(*) INTO v_active
+    FROM vpn_configs c WHERE c.user_id = p_user_id AND c.is_active;
+    IF v_active >= p_limit THEN
+        RETURN QUERY SELECT NULL::integer, NULL::varchar, NULL::varchar, NULL::timestamp, v_active, false;
+        RETURN;
+    END IF;
+
+    SELECT s.capacity INTO v_capacity FROM servers s WHERE s.domain = p_domain;
+    IF v_capacity > 0 THEN
+        PERFORM pg_advisory_xact_lock(hashtext('vpn_configs.node'), hashtext(p_domain));
+        IF (SELECT count(*) FROM vpn_configs c WHERE c.vpn_domain = p_domain AND c.is_active) >= v_capacity THEN
+            RETURN QUERY SELECT NULL::integer, NULL::varchar, NULL::varchar, NULL::timestamp, v_active, true;
+            RETURN;
+        END IF;
+    END IF;
+
+    v_id := nextval(pg_get_serial_sequence('vpn_configs', 'id'));
+    RETURN QUERY
+    INSERT INTO vpn_configs AS c (id, user_id, uuid, vpn_domain, flow, email, country, is_active, created_at)
+    VALUES (
+        v_id, p_user_id, gen_random_uuid()::varchar, p_domain, p_flow,
+        format('u%s-k%s', p_user_id, v_id), p_country, true, now()
+    )
+    RETURNING c.id, c.uuid, c.email, c.created_at, v_active + 1, false;
+END
+$$ LANGUAGE plpgsql VOLATILE;
+"""
+
+# Прежняя версия (a6d2c4f81b37) — для downgrade
+PREVIOUS_FUNCTION = """
+CREATE FUNCTION issue_vpn_config(
+    p_user_id integer, p_domain varchar, p_country varchar, p_flow varchar, p_limit integer
+) RETURNS TABLE (
+    config_id integer, config_uuid varchar, config_email varchar,
+    config_created_at timestamp, active_keys integer
+) AS $$
+DECLARE
+    v_active integer;
+    v_id integer;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('vpn_configs.issue'), p_user_id);
+    SELECT count(*) INTO v_active
+    FROM vpn_configs c WHERE c.user_id = p_user_id AND c.is_active;
+    IF v_active >= p_limit THEN
+        RETURN QUERY SELECT NULL::integer, NULL::varchar, NULL::varchar, NULL::timestamp, v_active;
+        RETURN;
+    END IF;
+
+    v_id := nextval(pg_get_serial_sequence('vpn_configs', 'id'));
+    RETURN QUERY
+    INSERT INTO vpn_configs AS c (id, user_id, uuid, vpn_domain, flow, email, country, is_active, created_at)
+    VALUES (
+        v_id, p_user_id, gen_random_uuid()::varchar, p_domain, p_flow,
+        format('u%s-k%s', p_user_id, v_id), p_country, true, now()
+    )
+    RETURNING c.id, c.uuid, c.email, c.created_at, v_active + 1;
+END
+$$ LANGUAGE plpgsql VOLATILE;
+"""
+
+DROP_FUNCTION = "DROP FUNCTION IF EXISTS issue_vpn_config(integer, varchar, varchar, varchar, integer)"
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # тип результата меняется — CREATE OR REPLACE тут не подходит
+    op.execute(DROP_FUNCTION)
+    op.execute(ISSUE_FUNCTION)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(DROP_FUNCTION)
+    op.execute(PREVIOUS_FUNCTION)
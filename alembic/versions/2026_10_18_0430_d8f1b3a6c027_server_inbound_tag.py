@@ -0,0 +1,28 @@
+"""server inbound tag
+
+Revision ID: d8f1b3a6c027
+Revises: c4e7a9d2f615
+Create Date: 2026-10-18 04:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd8f1b3a6c027'
+down_revision: Union[str, None] = 'c4e7a9d2f615'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('servers', sa.Column('inbound_tag', sa.String(length=64), nullable=True, comment='Тег инбаунда Xray; пусто — XRAY_INBOUND_TAG'))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('servers', 'inbound_tag')
@@ -7,6 +7,9 @@ from app.api import payments_stars
 from app.api import tg_webhook
 from app.api import verify
 from app.api import jwt_auth
+from app.api import metrics
+from app.api import nodes
+from app.api import subscription
 
 routers = (
     xray.router,
@@ -18,4 +21,7 @@ routers = (
     tg_webhook.router,
     verify.router,
     jwt_auth.router,
+    metrics.router,
+    nodes.router,
+    subscription.router,
 )
@@ -1,32 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
+from sqlalchemy import select
 from app.core.db.postgres import get_async_session
 from app.core.models.users import User
-from app.core.models.wallet_ledger import WalletEntry
+from app.core.repositories.wallet import get_balance
 from app.core.models.vpn_configs import VpnConfig
 from app.core.schemas.user_full import UserFullInfo
 from app.core.schemas.user_balance import UserBalanceBase
 from app.core.schemas.key import KeyBase
-from app.core.configs.vpn_config import vpn_settings
-from datetime import datetime
+from app.services.link_renderer import link_renderer
+from app.utils.vless import dt_to_str
 
 router = APIRouter(prefix="/user", tags=["User"])
 
 
-def build_vless_link(cfg: VpnConfig) -> str:
-    return (
-        f"vless://{cfg.uuid}@{cfg.vpn_domain}:443"
-        f"?flow={cfg.flow or 'xtls-rprx-vision'}&type=tcp&security=reality"
-        f"&fp=random&sni={vpn_settings.SNI}&pbk={vpn_settings.PBK}"
-        f"&sid={vpn_settings.SID}&spx=/#" + (cfg.email or "vpn-user")
-    )
-
-
-def dt_to_str(dt: datetime | None) -> str:
-    return dt.isoformat() if dt else ""
-
-
 @router.get(
     "/{telegram_id}",
     response_model=UserFullInfo,
@@ -44,12 +31,7 @@ async def get_user_full_info(
         raise HTTPException(404, detail="User not found")
 
     # 2. Баланс
-    balance = (
-        await db.execute(
-            select(func.coalesce(func.sum(WalletEntry.amount_rub), 0))
-            .where(WalletEntry.user_id == user.id)
-        )
-    ).scalar_one()
+    balance = await get_balance(db, user.id)
 
     # 3. VPN-конфиги
     configs = (
@@ -69,7 +51,7 @@ async def get_user_full_info(
         keys=[
             KeyBase(
                 id=cfg.id,
-                key=build_vless_link(cfg),         # ✅ готовая vless-ссылка
+                key=link_renderer.render(cfg),     # ✅ готовая ссылка по шаблону ноды
                 server=cfg.vpn_domain,
                 country=cfg.country,
                 created_at=dt_to_str(cfg.created_at),
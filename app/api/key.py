@@ -1,9 +1,21 @@
 import logging
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.schemas.key import KeyCreate
-from app.test_data import user_data, server_data
+from app.api.jwt_auth import CurrentUser, current_user
+from app.core.cache.profile import profile_cache
+from app.core.cache.subscription import subscription_cache
+from app.core.configs.vpn_config import vpn_settings
+from app.core.db.postgres import get_async_session
+from app.core.models.vpn_configs import VpnConfig
+from app.core.repositories.vpn_config import deactivate_user_config, issue_config
+from app.core.schemas.key import KeyCreate, KeyCreated
+from app.services.link_renderer import link_renderer
+from app.services.node_prober import node_prober, pick_server
+from app.services.server_registry import ServerInfo, server_registry
+from app.services.xray_provisioning import provisioning_queue
+from app.utils.vless import dt_to_str
 
 logger = logging.getLogger(__name__)
 
@@ -13,24 +25,81 @@ router = APIRouter(
 )
 
 
-def get_server_by_id(server_id: int):
-    return next((s for s in server_data if s["id"] == server_id), None)
+def get_server_by_id(server_id: int) -> ServerInfo | None:
+    server = server_registry.snapshot.by_id.get(server_id)
+    return server if server is not None and server.enabled else None
+
+
+def choose_server(server_id: int) -> ServerInfo:
+    """Выбранная нода, а если она недоступна или на дренаже — другая нода той же страны."""
+    server = get_server_by_id(server_id)
+    if server is None:
+        raise HTTPException(status_code=404, detail="Server not found")
+    if server.weight > 0 and node_prober.is_alive(server.domain):
+        return server
+    fallback = pick_server(server.country)
+    if fallback is None:
+        raise HTTPException(status_code=503, detail="No available servers in this country")
+    return fallback
 
 
 @router.post(
     "/",
-    response_model=dict,
+    response_model=KeyCreated,
     status_code=status.HTTP_200_OK,
 )
-async def create_server(data: KeyCreate):
-    server_info = get_server_by_id(data.server_id)
-    user_data["keys"].append({
-        "id": 4,
-        "country": server_info["country"],
-        "key": f"vless://new-key-value/{server_info['country']}",
-        "created_at": "2025-08-04T20:00:00Z"
-    })
-    return {"id": 4}
+async def create_server(
+    data: KeyCreate,
+    current: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Выдаёт ключ: один запрос в БД (лок пользователя, лимиты, вставка;
+    ещё один на каждую заполненную ноду), добавление клиента на ноду —
+    в фоне через очередь провижининга.
+    """
+    server = choose_server(data.server_id)
+    full: set[str] = set()
+    while True:
+        # протокол — тот же, по которому будет собрана ссылка
+        protocol = link_renderer.template(server.domain).protocol
+        flow = vpn_settings.FLOW if protocol == "vless" else None
+        issued = await issue_config(
+            db,
+            user_id=current.id,
+            domain=server.domain,
+            country=server.country,
+            flow=flow,
+            limit=vpn_settings.MAX_KEYS_PER_USER,
+        )
+        if not issued.node_full:
+            break
+        # нода заполнена по capacity — пробуем другую в той же стране
+        full.add(server.domain)
+        server = pick_server(server.country, exclude=full)
+        if server is None:
+            raise HTTPException(status_code=503, detail="No available servers in this country")
+    if issued.id is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Key limit reached ({vpn_settings.MAX_KEYS_PER_USER})",
+        )
+
+    op = await provisioning_queue.add(server.domain, issued.email, issued.uuid, flow, protocol)
+    await profile_cache.invalidate(current.telegram_id)
+    await subscription_cache.invalidate_many([current.id])
+
+    cfg = VpnConfig(
+        id=issued.id, uuid=issued.uuid, vpn_domain=server.domain,
+        flow=flow, email=issued.email, country=server.country,
+    )
+    return KeyCreated(
+        id=issued.id,
+        country=server.country,
+        key=link_renderer.render(cfg),
+        created_at=dt_to_str(issued.created_at),
+        operation_id=op.id,
+    )
 
 
 @router.delete(
@@ -38,6 +107,20 @@ async def create_server(data: KeyCreate):
     response_model=dict,
     status_code=status.HTTP_200_OK,
 )
-async def delete_server(server_id: int):
-    user_data["keys"] = [k for k in user_data["keys"] if k["id"] != server_id]
-    return {"status": "sucsses"}
+async def delete_server(
+    server_id: int,
+    current: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """server_id — id ключа (имя параметра сохранено для клиентов)."""
+    cfg = await deactivate_user_config(db, current.id, server_id)
+    if cfg is None:
+        raise HTTPException(status_code=404, detail="Key not found")
+    await db.commit()
+
+    op = None
+    if cfg.vpn_domain:
+        op = await provisioning_queue.remove(cfg.vpn_domain, cfg.uuid, cfg.email)
+    await profile_cache.invalidate(current.telegram_id)
+    await subscription_cache.invalidate_many([current.id])
+    return {"status": "sucsses", "operation_id": op.id if op is not None else None}
@@ -0,0 +1,17 @@
+from fastapi import APIRouter, status
+
+from app.core.metrics import collect
+
+router = APIRouter(
+    prefix="/metrics",
+    tags=["Metrics"]
+)
+
+
+@router.get(
+    "/",
+    response_model=dict,
+    status_code=status.HTTP_200_OK,
+)
+async def get_metrics():
+    return collect()
@@ -0,0 +1,45 @@
+import hmac
+import logging
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.configs.servers import node_feed_settings
+from app.core.db.postgres import get_async_session
+from app.services.config_feed import config_feed, get_node_changes
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/nodes",
+    tags=["Nodes"]
+)
+
+
+def require_node_token(x_node_token: str | None = Header(default=None, alias="X-Node-Token")):
+    expected = node_feed_settings.TOKEN
+    if not expected:
+        raise HTTPException(status_code=503, detail="node feed is not configured")
+    if not hmac.compare_digest(x_node_token or "", expected):
+        raise HTTPException(status_code=401, detail="invalid node token")
+
+
+@router.get(
+    "/{node}/changes",
+    response_model=dict,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_node_token)],
+)
+async def get_changes(
+    node: str,
+    since: int = Query(0, ge=0, description="Последняя применённая ревизия; 0 — полный снапшот"),
+    wait: float = Query(25.0, ge=0, description="Сколько ждать изменений, секунд"),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Long-poll: ждёт, пока у ноды появятся изменения новее since (не дольше wait),
+    и отдаёт дифф add/remove либо снапшот, если клиент слишком отстал.
+    """
+    if since > 0:
+        await config_feed.wait(node, since, min(wait, node_feed_settings.MAX_WAIT))
+    return await get_node_changes(db, node, since)
@@ -1,10 +1,19 @@
+import base64
+import binascii
 import logging
+from datetime import datetime
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.api.jwt_auth import CurrentUser, current_user
+from app.core.consts import LedgerType
+from app.core.db.postgres import get_async_session
+from app.core.repositories.wallet import get_ledger_page
 from app.core.schemas.payment import PaymentBase, PaymentTest
-from app.core.schemas.history_payment import HistoryPaymentBase
+from app.core.schemas.history_payment import HistoryEntry, HistoryPage
 from app.test_data import user_data
+from app.utils.vless import dt_to_str
 
 logger = logging.getLogger(__name__)
 
@@ -13,6 +22,27 @@ router = APIRouter(
     tags=["Payment"]
 )
 
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(created_at: datetime, entry_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{entry_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Курсор не подписан: подделать можно только позицию в собственной
+    истории — фильтр по пользователю берётся из токена.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        created_at, entry_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), int(entry_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
 
 @router.post(
     "/",
@@ -25,14 +55,43 @@ async def reload_xray_service(data: PaymentBase):
 
 
 @router.get(
-    "/{user_id}",
-    response_model=list[HistoryPaymentBase],
+    "/history",
+    response_model=HistoryPage,
     status_code=status.HTTP_200_OK,
 )
-async def get_payment_history(user_id: int):
-    return [
-        HistoryPaymentBase(id=1, user_id=user_id, amount=100.0,
-                           created_at="2023-10-01T12:00:00Z"),
-        HistoryPaymentBase(id=2, user_id=user_id, amount=150.0,
-                           created_at="2023-11-15T09:30:00Z"),
-    ]
+async def get_payment_history(
+    cursor: str | None = None,
+    limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=HISTORY_MAX_PAGE_SIZE),
+    entry_type: list[LedgerType] | None = Query(None, alias="type"),
+    current: CurrentUser = Depends(current_user),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    История кошелька (проводки + платежи), новые сверху.
+    Следующая страница — тот же запрос с cursor=next_cursor.
+    """
+    rows = await get_ledger_page(
+        db,
+        current.id,
+        limit=limit,
+        before=decode_cursor(cursor) if cursor else None,
+        entry_types=entry_type,
+    )
+    page = rows[:limit]
+    last = page[-1] if page else None
+    return HistoryPage(
+        items=[
+            HistoryEntry(
+                id=row.id,
+                entry_type=row.entry_type,
+                amount=float(row.amount_rub),
+                comment=row.comment,
+                created_at=dt_to_str(row.created_at),
+                payment_id=row.payment_id,
+                payment_status=row.payment_status,
+                stars_amount=row.stars_amount,
+            )
+            for row in page
+        ],
+        next_cursor=encode_cursor(last.created_at, last.id) if len(rows) > limit else None,
+    )
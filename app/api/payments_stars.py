@@ -1,29 +1,27 @@
 # app/api/payments_stars.py
 
-from app.core.models.wallet_ledger import WalletEntry
-from sqlalchemy import select, func
-from fastapi import Depends, HTTPException, status
-from sqlalchemy.exc import IntegrityError
+from app.core.repositories.wallet import get_balance
 from sqlalchemy import select
 from app.core.models.payments import Payment
-from app.core.models.users import User
 from app.core.db.postgres import get_async_session
 from sqlalchemy.ext.asyncio import AsyncSession
 from decimal import Decimal
-from app.api.jwt_auth import require_jwt
+from app.api.jwt_auth import CurrentUser, current_user
+from app.core.configs.bot import bot_settings
+from app.core.repositories.payment import create_pending_payment
+import asyncio
+import logging
 import math
 import os
-from typing import Optional
 from uuid import uuid4
 
-from fastapi import APIRouter, Header, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, Field
+import httpx
 
-from aiogram import Bot
-from aiogram.types import LabeledPrice
+from app.utils.tg_bot_api import TelegramApiError, tg_create_invoice_link
 
-from app.utils.telegram_webapp import validate_webapp_init_data
-from app.core.consts import LedgerType, PaymentStatus
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/payments/stars", tags=["payments-stars"])
 
@@ -45,30 +43,17 @@ class CreateInvoiceResponse(BaseModel):
     payload: str
 
 
-# ===== Dependencies =====
-
-async def get_bot() -> Bot:
-    """
-    Minimal Bot instance provider.
-    NOTE: In production, consider a singleton Bot shared in app state to avoid
-    creating a new session per request.
-    """
-    token = os.environ.get("BOT_TOKEN")
-    if not token:
-        raise RuntimeError("BOT_TOKEN is not set")
-    return Bot(token=token)
-
+# ===== Routes =====
 
 @router.post("/invoice", response_model=CreateInvoiceResponse, status_code=status.HTTP_200_OK)
 async def create_invoice(
     body: CreateInvoiceRequest,
-    bot: Bot = Depends(get_bot),
-    token: dict = Depends(require_jwt),
+    current: CurrentUser = Depends(current_user),
     db: AsyncSession = Depends(get_async_session),
 ):
     """
-    Создаёт Telegram Stars (XTR) инвойс и фиксирует/обновляет PENDING-платёж в БД (идемпотентно по payload).
-    Пользователь определяется по telegram_id из JWT (payload['sub']).
+    Создаёт Telegram Stars (XTR) инвойс и фиксирует PENDING-платёж в БД.
+    Пользователь определяется по JWT (см. current_user).
     """
     # 1) Валидация суммы
     if body.amount_rub < MIN_RUB or body.amount_rub > MAX_RUB:
@@ -77,13 +62,8 @@ async def create_invoice(
             detail=f"Сумма должна быть от {MIN_RUB} до {MAX_RUB} ₽",
         )
 
-    # 2) Пользователь по telegram_id из токена
-    telegram_id = int(token["sub"])
-    user = (
-        await db.execute(select(User).where(User.telegram_id == telegram_id))
-    ).scalar_one_or_none()
-    if not user:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, "User not found")
+    # 2) Пользователь из токена — без запроса в БД
+    telegram_id = current.telegram_id
 
     # 3) Пересчёт в звёзды (целое, вверх) — всё в Decimal
     rub_dec = Decimal(str(body.amount_rub))
@@ -91,133 +71,40 @@ async def create_invoice(
     if stars <= 0:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, "Недопустимая сумма в звёздах")
 
-    # 4) Идемпотентный payload (tg_id + сумма + версия)
+    # 4) Уникальный payload (tg_id + сумма + версия + случайный nonce)
     nonce = uuid4().hex[:8]
     payload = f"topup:{telegram_id}:{body.amount_rub}:v2:{nonce}"
 
-    # 5) Найдём существующий платёж по payload
-    payment = (
-        await db.execute(select(Payment).where(Payment.payload == payload))
-    ).scalar_one_or_none()
-
-    if payment is None:
-        # Создаём новый PENDING
-        payment = Payment(
-            user_id=user.id,                 # ВНУТРЕННИЙ users.id
-            payload=payload,
-            rub_amount=rub_dec,
-            stars_amount=stars,
-            status=PaymentStatus.PENDING,
-            currency="XTR",
-        )
-        db.add(payment)
-        try:
-            await db.commit()
-        except IntegrityError:
-            # На случай гонки — перечитаем и пойдём как с существующей записью
-            await db.rollback()
-            payment = (
-                await db.execute(select(Payment).where(Payment.payload == payload))
-            ).scalar_one_or_none()
-
-    # Если после гонки всё ещё нет — это странно, но безопасно отдадим 409
-    if payment is None:
-        raise HTTPException(status.HTTP_409_CONFLICT, "Cannot create invoice, try again")
-
-    # 6) Если платёж есть — проверим статус/обновим суммы
-    if payment.status == PaymentStatus.PAID:
-        raise HTTPException(status.HTTP_409_CONFLICT, "Invoice already paid")
-    if payment.status != PaymentStatus.PENDING:
-        raise HTTPException(status.HTTP_409_CONFLICT, f"Invoice is {payment.status}")
-
-    # На случай, если логика сменится — актуализируем суммы
-    changed = False
-    if payment.rub_amount != rub_dec:
-        payment.rub_amount = rub_dec
-        changed = True
-    if payment.stars_amount != stars:
-        payment.stars_amount = stars
-        changed = True
-    if payment.currency != "XTR":
-        payment.currency = "XTR"
-        changed = True
-
-    if changed:
-        await db.commit()
-    else:
-        # чтобы гарантировать, что payment.id загружен (если только что коммитили)
-        await db.refresh(payment)
-
-    # 7) Создаём ссылку в Telegram Stars (вне БД-операций)
-    link = await bot.create_invoice_link(
-        title="Пополнение баланса",
-        description=f"Пополнение на {body.amount_rub} ₽ (~{stars} ⭐️)",
+    # 5) PENDING-платёж — один INSERT ... RETURNING с коммитом, сессия дальше не нужна
+    await create_pending_payment(
+        db,
+        user_id=current.id,              # ВНУТРЕННИЙ users.id
         payload=payload,
-        currency="XTR",
-        prices=[LabeledPrice(label="Balance top-up", amount=stars)],
+        rub_amount=rub_dec,
+        stars_amount=stars,
     )
+    # соединение — обратно в пул до сетевого вызова, а не после ответа Telegram
+    await db.close()
+
+    # 6) Ссылка в Telegram Stars через общий клиент Bot API, с общим
+    #    пределом времени на все повторы. Не дождались — платёж остаётся
+    #    PENDING без ссылки, клиент просто запросит новый инвойс.
+    try:
+        async with asyncio.timeout(bot_settings.BOT_API_INVOICE_TIMEOUT):
+            link = await tg_create_invoice_link(
+                title="Пополнение баланса",
+                description=f"Пополнение на {body.amount_rub} ₽ (~{stars} ⭐️)",
+                payload=payload,
+                stars=stars,
+                label="Balance top-up",
+            )
+    except TimeoutError:
+        raise HTTPException(status.HTTP_504_GATEWAY_TIMEOUT, "Telegram did not respond in time")
+    except (TelegramApiError, httpx.HTTPError) as e:
+        logger.warning("createInvoiceLink для %s не удался: %s", payload, e)
+        raise HTTPException(status.HTTP_502_BAD_GATEWAY, "Cannot create invoice, try again")
 
     return CreateInvoiceResponse(invoice_link=link, stars=stars, payload=payload)
-# ===== Routes =====
-
-# @router.post("/invoice", response_model=CreateInvoiceResponse)
-# async def create_invoice(
-#     body: CreateInvoiceRequest,
-#     bot: Bot = Depends(get_bot),
-#     # init_data: Optional[str] = Header(
-#     #     default=None, alias="X-Telegram-Init-Data"),
-#         token: dict = Depends(require_jwt),
-
-# ):
-#     """
-#     Creates a Telegram Stars (XTR) invoice link for a WebApp user.
-#     Frontend must pass WebApp initData in 'X-Telegram-Init-Data' header.
-#     """
-#     # Basic amount validation
-#     if body.amount_rub < MIN_RUB or body.amount_rub > MAX_RUB:
-#         raise HTTPException(
-#             status_code=status.HTTP_400_BAD_REQUEST,
-#             detail=f"Сумма должна быть от {MIN_RUB} до {MAX_RUB} ₽",
-#         )
-
-#     # if not init_data:
-#     #     raise HTTPException(status.HTTP_401_UNAUTHORIZED, "Missing init data")
-
-#     # # Validate WebApp initData signature
-#     # try:
-#     #     parsed = validate_webapp_init_data(init_data, os.environ["BOT_TOKEN"])
-#     # except Exception as e:
-#     #     raise HTTPException(status.HTTP_401_UNAUTHORIZED,
-#     #                         f"Bad init data: {e}")
-
-#     # user = parsed.get("user_obj") or {}
-#     # user_id = user.get("id")
-#     # if not user_id:
-#     #     raise HTTPException(status.HTTP_401_UNAUTHORIZED, "No user id")
-#     user_id = token.get('sub')
-#     # Convert RUB -> Stars (integer, ceil to avoid undercharging)
-#     stars = int(math.ceil(body.amount_rub * XTR_PER_RUB))
-#     if stars <= 0:
-#         raise HTTPException(status.HTTP_400_BAD_REQUEST,
-#                             "Недопустимая сумма в звёздах")
-
-#     # Idempotent payload – tie to user and amount
-#     payload = f"topup:{user_id}:{body.amount_rub}:v1"
-
-#     # TODO: persist a PENDING payment record in DB before creating invoice
-#     # save_pending_payment(user_id=user_id, payload=payload, rub=body.amount_rub, stars=stars)
-
-#     # Create invoice link in Stars (currency='XTR'; provider_token is NOT used for digital goods)
-#     link = await bot.create_invoice_link(
-#         title="Пополнение баланса",
-#         description=f"Пополнение на {body.amount_rub} ₽ (~{stars} ⭐️)",
-#         payload=payload,
-#         currency="XTR",
-#         prices=[LabeledPrice(label="Balance top-up", amount=stars)],
-#         # subscription_period=2592000,  # uncomment if you need a 30-day subscription product
-#     )
-
-#     return CreateInvoiceResponse(invoice_link=link, stars=stars, payload=payload)
 
 
 # @router.get("/status")
@@ -248,38 +135,26 @@ async def create_invoice(
 @router.get("/status")
 async def status_endpoint(
     payload: str,
-    token: dict = Depends(require_jwt),
+    current: CurrentUser = Depends(current_user),
     db: AsyncSession = Depends(get_async_session),
 ):
     """
     Returns current status of the given payment payload
     and the up-to-date user balance.
     """
-    telegram_id = int(token["sub"])
-
-    # 1) Находим пользователя
-    user = (
-        await db.execute(select(User).where(User.telegram_id == telegram_id))
-    ).scalar_one_or_none()
-    if not user:
-        raise HTTPException(status.HTTP_404_NOT_FOUND, "User not found")
+    # 1) Пользователь из токена (current_user)
 
     # 2) Ищем платеж по payload
     payment = (
         await db.execute(
-            select(Payment).where(Payment.payload == payload, Payment.user_id == user.id)
+            select(Payment).where(Payment.payload == payload, Payment.user_id == current.id)
         )
     ).scalar_one_or_none()
     if not payment:
         raise HTTPException(status.HTTP_404_NOT_FOUND, "Payment not found")
 
-    # 3) Считаем баланс из леджера
-    balance = (
-        await db.execute(
-            select(func.coalesce(func.sum(WalletEntry.amount_rub), 0))
-            .where(WalletEntry.user_id == user.id)
-        )
-    ).scalar_one()
+    # 3) Баланс из снапшота user_balances
+    balance = await get_balance(db, current.id)
 
     return {
         "payload": payment.payload,
@@ -3,7 +3,7 @@ import logging
 from fastapi import APIRouter, status
 
 from app.core.schemas.server import ServerBase
-from app.test_data import server_data
+from app.services.node_prober import available_servers, node_prober
 
 logger = logging.getLogger(__name__)
 
@@ -13,10 +13,24 @@ router = APIRouter(
 )
 
 
+def _server_out(server) -> ServerBase:
+    health = node_prober.status(server.domain)
+    if health is None:
+        return ServerBase(id=server.id, country=server.country)
+    data = health.to_dict()
+    return ServerBase(
+        id=server.id,
+        country=server.country,
+        latency_ms=data["latency_ms"],
+        availability=data["availability"],
+    )
+
+
 @router.get(
     "/",
     response_model=list[ServerBase],
     status_code=status.HTTP_200_OK,
 )
 async def get_payment_history():
-    return [ServerBase(**k) for k in server_data]
+    # только снапшот реестра и состояние проб в памяти; мёртвые ноды скрыты
+    return [_server_out(s) for s in available_servers()]
@@ -0,0 +1,87 @@
+import base64
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache.subscription import SubscriptionBody, subscription_cache
+from app.core.configs.subscription import subscription_settings as settings
+from app.core.db.postgres import get_async_session
+from app.core.repositories.vpn_config import get_active_configs
+from app.core.security.subscription import parse_subscription_token
+from app.services.link_renderer import link_renderer, render_qr_svg, render_subscription
+
+router = APIRouter(
+    prefix="/sub",
+    tags=["Subscription"]
+)
+
+_PROFILE_TITLE = "base64:" + base64.b64encode(settings.PROFILE_TITLE.encode("utf-8")).decode("ascii")
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate.strip('"') == etag:
+            return True
+    return False
+
+
+def _headers(entry: SubscriptionBody) -> dict[str, str]:
+    return {
+        "ETag": f'"{entry.etag}"',
+        # клиент всегда переспрашивает, но с If-None-Match получает 304
+        "Cache-Control": "no-cache",
+        "profile-update-interval": str(settings.UPDATE_INTERVAL_HOURS),
+        "profile-title": _PROFILE_TITLE,
+    }
+
+
+@router.get(
+    "/{token}",
+    status_code=status.HTTP_200_OK,
+    responses={304: {"description": "Not Modified"}},
+)
+async def get_subscription(
+    token: str,
+    if_none_match: str | None = Header(default=None),
+    db: AsyncSession = Depends(get_async_session),
+):
+    """
+    Подписка для VPN-клиентов: активные ссылки пользователя в base64.
+    Тело берётся из кеша по ревизии конфигов; в БД идём только после
+    их изменения. Сессия не берёт соединение, пока не нужен запрос.
+    """
+    user_id = parse_subscription_token(token)
+    if user_id is None:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+
+    revision, entry = await subscription_cache.get(user_id, link_renderer.fingerprint)
+    if entry is None:
+        configs = await get_active_configs(db, user_id)
+        body = render_subscription(link_renderer.render_many(configs))
+        entry = await subscription_cache.set(user_id, revision, body)
+
+    headers = _headers(entry)
+    if if_none_match and _etag_matches(if_none_match, entry.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(entry.body, media_type="text/plain; charset=utf-8", headers=headers)
+
+
+@router.get(
+    "/{token}/qr",
+    status_code=status.HTTP_200_OK,
+)
+async def get_subscription_qr(token: str, request: Request):
+    """QR-код ссылки подписки (SVG) — для импорта в клиент сканированием."""
+    if parse_subscription_token(token) is None:
+        raise HTTPException(status_code=404, detail="Subscription not found")
+    url = str(request.url_for("get_subscription", token=token))
+    return Response(
+        render_qr_svg(url),
+        media_type="image/svg+xml",
+        headers={"Cache-Control": "public, max-age=86400"},
+    )
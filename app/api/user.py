@@ -1,33 +1,17 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
 from app.core.db.postgres import get_async_session
-from app.core.models.users import User
-from app.core.models.wallet_ledger import WalletEntry
-from app.core.models.vpn_configs import VpnConfig
+from app.core.repositories.wallet import get_balance
+from app.core.cache.profile import get_profile
 from app.core.schemas.user_full import UserFullInfo
 from app.core.schemas.user_balance import UserBalanceBase
-from app.core.schemas.key import KeyBase
-from app.core.configs.vpn_config import vpn_settings
-from datetime import datetime
-from app.api.jwt_auth import require_jwt
+from app.core.schemas.subscription import SubscriptionLink
+from app.core.security.subscription import issue_subscription_token
+from app.api.jwt_auth import CurrentUser, current_user
 
 router = APIRouter(prefix="/user", tags=["User"])
 
 
-def build_vless_link(cfg: VpnConfig) -> str:
-    return (
-        f"vless://{cfg.uuid}@{cfg.vpn_domain}:443"
-        f"?flow={cfg.flow or 'xtls-rprx-vision'}&type=tcp&security=reality"
-        f"&fp=random&sni={vpn_settings.SNI}&pbk={vpn_settings.PBK}"
-        f"&sid={vpn_settings.SID}&spx=/#" + (cfg.email or "vpn-user")
-    )
-
-
-def dt_to_str(dt: datetime | None) -> str:
-    return dt.isoformat() if dt else ""
-
-
 @router.get(
     "/",
     response_model=UserFullInfo,
@@ -35,51 +19,14 @@ def dt_to_str(dt: datetime | None) -> str:
     status_code=status.HTTP_200_OK,
 )
 async def get_user_full_info(
-    token: dict = Depends(require_jwt),
+    current: CurrentUser = Depends(current_user),
     # telegram_id: int,
     db: AsyncSession = Depends(get_async_session),
 ):
-    telegram_id = int(token["sub"])
-    user = (
-        await db.execute(select(User).where(User.telegram_id == telegram_id))
-    ).scalar_one_or_none()
+    user = await get_profile(db, current.telegram_id)
     if not user:
         raise HTTPException(404, detail="User not found")
-
-    # 2. Баланс
-    balance = (
-        await db.execute(
-            select(func.coalesce(func.sum(WalletEntry.amount_rub), 0))
-            .where(WalletEntry.user_id == user.id)
-        )
-    ).scalar_one()
-
-    # 3. VPN-конфиги
-    configs = (
-        await db.execute(
-            select(VpnConfig)
-            .where(VpnConfig.user_id == user.id, VpnConfig.is_active.is_(True))
-        )
-    ).scalars().all()
-
-    return UserFullInfo(
-        id=user.id,
-        telegram_id=user.telegram_id,
-        first_name=user.first_name,
-        last_name=user.last_name,
-        username=user.username,
-        balance=UserBalanceBase(balance=float(balance)),
-        keys=[
-            KeyBase(
-                id=cfg.id,
-                key=build_vless_link(cfg),         # ✅ готовая vless-ссылка
-                server=cfg.vpn_domain,
-                country=cfg.country,
-                created_at=dt_to_str(cfg.created_at),
-            )
-            for cfg in configs
-        ],
-    )
+    return user
 
 
 @router.get(
@@ -88,31 +35,34 @@ async def get_user_full_info(
     status_code=status.HTTP_200_OK,
 )
 async def get_user_balance(
-    token: dict = Depends(require_jwt),
+    current: CurrentUser = Depends(current_user),
     db: AsyncSession = Depends(get_async_session),
 ):
     """
     Возвращает текущий баланс пользователя.
-    Идентификация по telegram_id из JWT (payload['sub']).
+    Идентификация по users.id из JWT (см. current_user).
     """
-    telegram_id = int(token["sub"])
+    # Снапшот из user_balances; если записей нет — вернётся 0
+    balance = await get_balance(db, current.id)
 
-    # Находим пользователя (чтобы получить его id и отдать 404, если не существует)
-    user = (
-        await db.execute(select(User).where(User.telegram_id == telegram_id))
-    ).scalar_one_or_none()
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
+    return UserBalanceBase(balance=float(balance))
 
-    # Сумма всех проводок; если нет записей — вернётся 0
-    balance = (
-        await db.execute(
-            select(func.coalesce(func.sum(WalletEntry.amount_rub), 0))
-            .where(WalletEntry.user_id == user.id)
-        )
-    ).scalar_one()
 
-    return UserBalanceBase(balance=float(balance))
+@router.get(
+    "/subscription",
+    response_model=SubscriptionLink,
+    status_code=status.HTTP_200_OK,
+)
+async def get_subscription_link(
+    request: Request,
+    current: CurrentUser = Depends(current_user),
+):
+    """Ссылка подписки для VPN-клиента; токен детерминирован — ссылка постоянна."""
+    token = issue_subscription_token(current.id)
+    return SubscriptionLink(
+        token=token,
+        url=str(request.url_for("get_subscription", token=token)),
+    )
 # import logging
 
 # from fastapi import APIRouter, status
@@ -1,143 +1,24 @@
 # app/miniapp/verify.py
 from __future__ import annotations
 
-import base64
-import hashlib
-import hmac
-import time
-from typing import Dict, Tuple, Any
-from urllib.parse import parse_qsl
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
 
 from fastapi import APIRouter, Depends, HTTPException, Header
-from pydantic import BaseModel
-from nacl.signing import VerifyKey  # pip install pynacl
+from pydantic import BaseModel, Field
 from app.core.configs.bot import bot_settings
+from app.core.security.init_data import verify_hmac, verify_third_party
 router = APIRouter(prefix="/miniapp", tags=["miniapp"])
 
-# Telegram Ed25519 public keys (hex)
-TG_PUBKEY_TEST = "40055058a4ee38156a06562e52eece92a771bcd8346a8c4615cb7376eddf72ec"
-TG_PUBKEY_PROD = "e7bf03a2fa4602af4580703d88dda5bb59f32ed8b02a56c187fe7d34caed242d"
+# Пакетная проверка: ограничение размера запроса и пул потоков
+# (libsodium отпускает GIL, подписи проверяются параллельно)
+BATCH_MAX_ITEMS = int(os.getenv("VERIFY_BATCH_MAX_ITEMS", "1000"))
+BATCH_THREADS = int(os.getenv("VERIFY_BATCH_THREADS", "4"))
+BATCH_CHUNK = 64
 
-
-# ---- Utility helpers ----
-
-def parse_init_data(init_data: str) -> Dict[str, str]:
-    """
-    Parse query-string from Telegram.WebApp.initData into a dict (keeps last occurrence on duplicates).
-    """
-    return dict(parse_qsl(init_data, keep_blank_values=True))
-
-
-def build_data_check_string(fields: Dict[str, str]) -> Tuple[str, str]:
-    """
-    Build data_check_string for server-side validation (HMAC path).
-    Exclude only 'hash' field. Sort keys alphabetically.
-    Returns (data_check_string, received_hash_hex)
-    """
-    received_hash = fields.get("hash") or ""
-    items = [(k, v) for k, v in fields.items() if k != "hash"]
-    items.sort(key=lambda kv: kv[0])
-    data_check_string = "\n".join(f"{k}={v}" for k, v in items)
-    return data_check_string, received_hash
-
-
-def compute_secret_key(bot_token: str) -> bytes:
-    """
-    secret_key = HMAC_SHA256(message=bot_token, key="WebAppData")
-    """
-    return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
-
-
-def verify_hmac(init_data: str, bot_token: str, max_age_sec: int = 24 * 3600) -> Dict[str, Any]:
-    """
-    Server-side verification using 'hash' (HMAC-SHA256).
-    Raises HTTPException on failure.
-    Returns parsed fields.
-    """
-    fields = parse_init_data(init_data)
-    data_check_string, received_hash = build_data_check_string(fields)
-
-    if not received_hash:
-        raise HTTPException(status_code=400, detail="Missing 'hash'")
-
-    secret_key = compute_secret_key(bot_token)
-    calc_hash = hmac.new(secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
-
-    if not hmac.compare_digest(calc_hash, received_hash):
-        raise HTTPException(status_code=401, detail="Invalid hash")
-
-    # freshness check
-    try:
-        auth_date = int(fields.get("auth_date", "0"))
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid 'auth_date'")
-
-    now = int(time.time())
-    if auth_date <= 0 or now - auth_date > max_age_sec:
-        raise HTTPException(status_code=401, detail="Stale auth_date")
-
-    return fields
-
-
-def b64url_decode_nopad(s: str) -> bytes:
-    """
-    Base64url decode with optional missing padding.
-    """
-    s = s.replace("-", "+").replace("_", "/")
-    pad = (-len(s)) % 4
-    if pad:
-        s += "=" * pad
-    return base64.b64decode(s)
-
-
-def build_third_party_dcs(fields: Dict[str, str], bot_id: str) -> Tuple[str, bytes]:
-    """
-    Build data_check_string for third-party validation (Ed25519 path).
-    Exclude 'hash' and 'signature'. Sort keys alphabetically.
-    Returns (data_check_string, signature_bytes)
-    """
-    signature_b64u = fields.get("signature") or ""
-    if not signature_b64u:
-        raise HTTPException(status_code=400, detail="Missing 'signature'")
-    try:
-        signature = b64url_decode_nopad(signature_b64u)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid base64url 'signature'")
-
-    items = [(k, v) for k, v in fields.items() if k not in ("hash", "signature")]
-    items.sort(key=lambda kv: kv[0])
-    tail = "\n".join(f"{k}={v}" for k, v in items)
-    dcs = f"{bot_id}:WebAppData\n{tail}"
-    return dcs, signature
-
-
-def verify_third_party(init_data: str, bot_id: str, env: str = "prod", max_age_sec: int = 24 * 3600) -> Dict[str, Any]:
-    """
-    Third-party validation using Ed25519 'signature' and Telegram public key.
-    env: "prod" or "test"
-    """
-    fields = parse_init_data(init_data)
-    dcs, signature = build_third_party_dcs(fields, bot_id)
-
-    pub_hex = TG_PUBKEY_PROD if env == "prod" else TG_PUBKEY_TEST
-    verify_key = VerifyKey(bytes.fromhex(pub_hex))
-    try:
-        # Ed25519 verify: raises BadSignatureError if invalid
-        verify_key.verify(dcs.encode("utf-8"), signature)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid Ed25519 signature")
-
-    # freshness check
-    try:
-        auth_date = int(fields.get("auth_date", "0"))
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Invalid 'auth_date'")
-
-    now = int(time.time())
-    if auth_date <= 0 or now - auth_date > max_age_sec:
-        raise HTTPException(status_code=401, detail="Stale auth_date")
-
-    return fields
+_batch_executor = ThreadPoolExecutor(max_workers=BATCH_THREADS, thread_name_prefix="initdata-verify")
 
 
 # ---- Request/Response models ----
@@ -154,6 +35,24 @@ class VerifyResponse(BaseModel):
     fields: Dict[str, Any]
 
 
+class VerifyBatchRequest(BaseModel):
+    items: list[str] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    mode: str = "third_party"  # "hmac" | "third_party"
+    env: str = "prod"          # "prod" | "test"
+    max_age_sec: int = 24 * 3600
+
+
+class VerifyBatchItem(BaseModel):
+    ok: bool
+    fields: Dict[str, Any] | None = None
+    status_code: int | None = None
+    error: str | None = None
+
+
+class VerifyBatchResponse(BaseModel):
+    results: list[VerifyBatchItem]
+
+
 # ---- Dependencies you may wire from your settings/env ----
 
 def get_bot_token() -> str:
@@ -198,3 +97,51 @@ def verify_init_data(
         raise HTTPException(status_code=400, detail="Unsupported mode. Use 'hmac' or 'third_party'.")
 
     return VerifyResponse(ok=True, fields=fields)
+
+
+def _verify_chunk(
+    items: list[str],
+    mode: str,
+    bot_token: str,
+    bot_id: str,
+    env: str,
+    max_age_sec: int,
+) -> list[VerifyBatchItem]:
+    results = []
+    for init_data in items:
+        try:
+            if mode == "hmac":
+                fields = verify_hmac(init_data, bot_token=bot_token, max_age_sec=max_age_sec)
+            else:
+                fields = verify_third_party(init_data, bot_id=bot_id, env=env, max_age_sec=max_age_sec)
+            results.append(VerifyBatchItem(ok=True, fields=fields))
+        except HTTPException as e:
+            results.append(VerifyBatchItem(ok=False, status_code=e.status_code, error=e.detail))
+    return results
+
+
+@router.post("/verify/batch", response_model=VerifyBatchResponse)
+async def verify_init_data_batch(
+    payload: VerifyBatchRequest,
+    bot_token: str = Depends(get_bot_token),
+    bot_id: str = Depends(get_bot_id),
+):
+    """
+    Проверяет пачку initData (для партнёрских сервисов) на ограниченном пуле
+    потоков. Результаты — в порядке входных строк; ошибка одной строки
+    не валит весь запрос.
+    """
+    if payload.mode not in ("hmac", "third_party"):
+        raise HTTPException(status_code=400, detail="Unsupported mode. Use 'hmac' or 'third_party'.")
+    env = "prod" if payload.env.lower() in ("prod", "production") else "test"
+
+    loop = asyncio.get_running_loop()
+    chunks = [payload.items[i:i + BATCH_CHUNK] for i in range(0, len(payload.items), BATCH_CHUNK)]
+    done = await asyncio.gather(*(
+        loop.run_in_executor(
+            _batch_executor, _verify_chunk,
+            chunk, payload.mode, bot_token, bot_id, env, payload.max_age_sec,
+        )
+        for chunk in chunks
+    ))
+    return VerifyBatchResponse(results=[item for chunk in done for item in chunk])
@@ -1,9 +1,14 @@
+import hmac
 import logging
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
 
+from app.core.configs.xray import xray_settings
 from app.core.schemas.xray import XraySchemasCreate
-from app.utils.xray import XrayService
+from app.services.link_renderer import link_renderer
+from app.services.xray_provisioning import provisioning_queue
+from app.utils.xray import xray_service, user_email
 
 logger = logging.getLogger(__name__)
 
@@ -12,16 +17,26 @@ router = APIRouter(
     tags=["Xray"]
 )
 
+admin_bearer = HTTPBearer(auto_error=False)
+
+
+def require_admin_token(creds: HTTPAuthorizationCredentials | None = Depends(admin_bearer)):
+    expected = xray_settings.ADMIN_TOKEN
+    if not expected:
+        raise HTTPException(status_code=503, detail="xray admin API is not configured")
+    if creds is None or not hmac.compare_digest(creds.credentials, expected):
+        raise HTTPException(status_code=401, detail="invalid admin token")
+
 
 @router.post(
     "/reload",
     response_model=dict,
     status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin_token)],
 )
 async def reload_xray_service():
     try:
-        service = XrayService()
-        await service.reload()
+        await xray_service.reload()
         return {"message": "Xray reloaded"}
     except Exception as e:
         logger.error(e)
@@ -31,32 +46,53 @@ async def reload_xray_service():
 @router.post(
     "/add-user",
     response_model=dict,
-    status_code=status.HTTP_201_CREATED,
+    status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin_token)],
 )
 async def add_user_xray_service(
     user_data: XraySchemasCreate
 ):
+    """Ставит добавление в очередь ноды; статус — GET /xray/operations/{id}."""
     try:
-        service = XrayService()
-        await service.add_user(user_data=user_data)
-        return {"message": "Xray reloaded"}
+        node = xray_service.resolve_node(user_data.node)
     except Exception as e:
-        logger.error(e)
-        return {"message": "Xray reload failed"}
+        raise HTTPException(status_code=400, detail=str(e))
+    protocol = link_renderer.template(node).protocol
+    op = await provisioning_queue.add(
+        node, user_email(user_data), user_data.uuid,
+        user_data.flow if protocol == "vless" else None, protocol,
+    )
+    return {"operation_id": op.id, "status": op.status}
 
 
 @router.delete(
     "/delete-user/{user_id}",
     response_model=dict,
     status_code=status.HTTP_202_ACCEPTED,
+    dependencies=[Depends(require_admin_token)],
 )
 async def delete_user_xray_service(
-    user_id: str
+    user_id: str,
+    node: str | None = None,
+    email: str | None = None,
 ):
+    """user_id — UUID клиента; email — если он отличается от UUID."""
     try:
-        service = XrayService()
-        await service.delete_user(user_id=user_id)
-        return {"message": "Xray reloaded"}
+        node = xray_service.resolve_node(node)
     except Exception as e:
-        logger.error(e)
-        return {"message": "Xray reload failed"}
+        raise HTTPException(status_code=400, detail=str(e))
+    op = await provisioning_queue.remove(node, user_id, email)
+    return {"operation_id": op.id, "status": op.status}
+
+
+@router.get(
+    "/operations/{operation_id}",
+    response_model=dict,
+    status_code=status.HTTP_200_OK,
+    dependencies=[Depends(require_admin_token)],
+)
+async def get_xray_operation(operation_id: str):
+    op = await provisioning_queue.get(operation_id)
+    if op is None:
+        raise HTTPException(status_code=404, detail="Operation not found")
+    return op
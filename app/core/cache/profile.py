@@ -0,0 +1,116 @@
+import logging
+from typing import Any, Iterable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.configs import redis_settings
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+from app.core.repositories.user import load_user_full_info
+from app.core.schemas.user_full import UserFullInfo
+from app.services.link_renderer import link_renderer
+
+logger = logging.getLogger(__name__)
+
+# После инвалидации ключ на короткое время занят маркером: читатель,
+# успевший прочитать БД до коммита, не сможет положить устаревший профиль
+# (запись идёт через SET NX).
+_TOMBSTONE = "-"
+_TOMBSTONE_TTL = 5
+
+
+def _key(telegram_id: int) -> str:
+    return f"profile:{telegram_id}"
+
+
+class ProfileCache:
+    """
+    Read-through кеш UserFullInfo в Redis, ключ — telegram_id.
+
+    В профиле готовые ссылки, поэтому значение — "отпечаток нод|json"
+    (links_fingerprint): профиль, собранный при других параметрах нод,
+    считается промахом и заменяется маркером, как при инвалидации.
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.stale = 0
+        self.errors = 0
+
+    async def get(self, telegram_id: int, nodes: str = "") -> UserFullInfo | None:
+        try:
+            client = await redis_client.get_client()
+            raw = await client.get(_key(telegram_id))
+        except Exception:
+            self.errors += 1
+            logger.warning("Кеш профиля недоступен", exc_info=True)
+            return None
+        if raw is None or raw == _TOMBSTONE:
+            self.misses += 1
+            return None
+        cached_nodes, _, data = raw.partition("|")
+        if cached_nodes != nodes:
+            # ссылки собраны при старых параметрах нод
+            self.misses += 1
+            self.stale += 1
+            await self.invalidate(telegram_id)
+            return None
+        self.hits += 1
+        return UserFullInfo.model_validate_json(data)
+
+    async def set(self, profile: UserFullInfo, nodes: str = "") -> None:
+        data = f"{nodes}|" + profile.model_dump_json(exclude={"access_token"})
+        try:
+            client = await redis_client.get_client()
+            await client.set(_key(profile.telegram_id), data, ex=self.ttl, nx=True)
+        except Exception:
+            self.errors += 1
+            logger.warning("Не удалось записать профиль в кеш", exc_info=True)
+
+    async def invalidate(self, *telegram_ids: int) -> None:
+        await self.invalidate_many(telegram_ids)
+
+    async def invalidate_many(self, telegram_ids: Iterable[int]) -> None:
+        """Вызывать после коммита транзакции, изменившей профиль."""
+        ids = list(telegram_ids)
+        if not ids:
+            return
+        try:
+            await redis_client.batch(
+                ("SET", _key(telegram_id), _TOMBSTONE, "EX", _TOMBSTONE_TTL)
+                for telegram_id in ids
+            )
+            self.invalidations += len(ids)
+        except Exception:
+            self.errors += 1
+            logger.error("Не удалось инвалидировать профили %s", ids, exc_info=True)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations,
+            "stale": self.stale,
+            "errors": self.errors,
+        }
+
+
+profile_cache = ProfileCache(ttl=redis_settings.PROFILE_CACHE_TTL)
+register_collector("profile_cache", profile_cache.stats)
+
+
+async def get_profile(db: AsyncSession, telegram_id: int) -> UserFullInfo | None:
+    """Профиль из кеша, при промахе — из БД с записью в кеш."""
+    nodes = link_renderer.fingerprint
+    profile = await profile_cache.get(telegram_id, nodes)
+    if profile is not None:
+        return profile
+    profile = await load_user_full_info(db, telegram_id)
+    if profile is not None:
+        await profile_cache.set(profile, nodes)
+    return profile
@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import secrets
+import time
+from typing import Any
+
+from app.core.configs.jwt import jwt_settings
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+def _digest(token: str) -> str:
+    # В Redis лежит только хеш: утечка дампа не даёт рабочих токенов
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _key(digest: str) -> str:
+    return "auth:refresh:" + digest
+
+
+def _user_key(user_id: int | str) -> str:
+    return f"auth:refresh:user:{user_id}"
+
+
+class RefreshTokenStore:
+    """
+    Непрозрачные одноразовые refresh-токены в Redis.
+    Значение — "users.id:telegram_id", этого достаточно для нового
+    access-токена без похода в БД. Каждый обмен выдаёт новый токен и
+    удаляет старый; на пользователя живёт не больше max_per_user токенов
+    (индекс — ZSET хешей по времени выдачи), лишние старые удаляются.
+    """
+
+    def __init__(self, ttl: int, max_per_user: int):
+        self.ttl = ttl
+        self.max_per_user = max_per_user
+        self.issued = 0
+        self.refreshed = 0
+        self.rejected = 0
+        self.revoked = 0
+        self.evicted = 0
+        self.errors = 0
+
+    async def _store(self, user_id: int, telegram_id: int) -> str:
+        token = secrets.token_urlsafe(32)
+        digest = _digest(token)
+        user_key = _user_key(user_id)
+        await redis_client.batch([
+            ("SET", _key(digest), f"{user_id}:{telegram_id}", "EX", self.ttl),
+            ("ZADD", user_key, time.time(), digest),
+            ("EXPIRE", user_key, self.ttl),
+        ], transaction=True)
+        await self._evict(user_key)
+        return token
+
+    async def _evict(self, user_key: str) -> None:
+        """Старше max_per_user — вон; заодно чистит хеши истёкших токенов."""
+        client = await redis_client.get_client()
+        extra = await client.zrange(user_key, 0, -self.max_per_user - 1)
+        if not extra:
+            return
+        await redis_client.batch(
+            [("DEL", *(_key(d) for d in extra)), ("ZREM", user_key, *extra)],
+            transaction=True,
+        )
+        self.evicted += len(extra)
+
+    async def issue(self, telegram_id: int, user_id: int) -> str | None:
+        """None, если Redis недоступен — логин работает и без refresh."""
+        try:
+            token = await self._store(user_id, telegram_id)
+        except Exception:
+            self.errors += 1
+            logger.warning("Не удалось сохранить refresh-токен", exc_info=True)
+            return None
+        self.issued += 1
+        return token
+
+    async def rotate(self, token: str) -> tuple[int, int, str] | None:
+        """
+        (users.id, telegram_id, новый токен). Старый забирается GETDEL —
+        повторное предъявление того же токена уже ничего не даст.
+        None — токен неизвестен или истёк. Ошибки Redis пробрасываются.
+        """
+        digest = _digest(token)
+        client = await redis_client.get_client()
+        try:
+            raw = await client.getdel(_key(digest))
+            if raw is None:
+                self.rejected += 1
+                return None
+            user_id, telegram_id = (int(x) for x in raw.split(":", 1))
+            await client.zrem(_user_key(user_id), digest)
+            new_token = await self._store(user_id, telegram_id)
+        except Exception:
+            self.errors += 1
+            raise
+        self.refreshed += 1
+        return user_id, telegram_id, new_token
+
+    async def revoke(self, token: str) -> bool:
+        """False — такого токена уже нет. Ошибки Redis пробрасываются."""
+        digest = _digest(token)
+        client = await redis_client.get_client()
+        raw = await client.getdel(_key(digest))
+        if raw is None:
+            return False
+        await client.zrem(_user_key(raw.split(":", 1)[0]), digest)
+        self.revoked += 1
+        return True
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "issued": self.issued,
+            "refreshed": self.refreshed,
+            "rejected": self.rejected,
+            "revoked": self.revoked,
+            "evicted": self.evicted,
+            "errors": self.errors,
+        }
+
+
+refresh_tokens = RefreshTokenStore(
+    ttl=jwt_settings.REFRESH_TTL,
+    max_per_user=jwt_settings.REFRESH_MAX_PER_USER,
+)
+register_collector("refresh_tokens", refresh_tokens.stats)
@@ -0,0 +1,106 @@
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Any, Iterable
+
+from app.core.configs.subscription import subscription_settings as settings
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+def _rev_key(user_id: int) -> str:
+    return f"sub:rev:{user_id}"
+
+
+def _body_key(user_id: int) -> str:
+    return f"sub:body:{user_id}"
+
+
+@dataclass(frozen=True, slots=True)
+class SubscriptionBody:
+    etag: str
+    body: str
+
+
+class SubscriptionCache:
+    """
+    Готовое тело подписки по users.id.
+
+    sub:rev:<id> — ревизия конфигов пользователя, растёт при каждом их
+    изменении; sub:body:<id> — "ревизия:etag:тело". Ревизия тела — это
+    ревизия конфигов плюс отпечаток параметров нод (links_fingerprint):
+    правка pbk/sni/порта ноды тоже делает тело устаревшим. Тело годно, пока
+    его ревизия совпадает с текущей. Ревизия читается до запроса в БД,
+    поэтому тело, отрисованное во время изменения, сразу окажется устаревшим.
+    """
+
+    def __init__(self, ttl: int, revision_ttl: int):
+        self.ttl = ttl
+        self.revision_ttl = revision_ttl
+        self.hits = 0
+        self.renders = 0
+        self.invalidations = 0
+        self.errors = 0
+
+    async def get(self, user_id: int, nodes: str = "") -> tuple[str | None, SubscriptionBody | None]:
+        """
+        (текущая ревизия, тело или None); nodes — отпечаток параметров нод.
+        Ревизия None — Redis недоступен, отрисованное тело тогда не кешируется.
+        """
+        try:
+            client = await redis_client.get_client()
+            raw_rev, raw_body = await client.mget(_rev_key(user_id), _body_key(user_id))
+        except Exception:
+            self.errors += 1
+            logger.warning("Кеш подписок недоступен", exc_info=True)
+            return None, None
+        revision = f"{raw_rev or '0'}.{nodes}"
+        if raw_body is not None:
+            cached_rev, etag, body = raw_body.split(":", 2)
+            if cached_rev == revision:
+                self.hits += 1
+                return revision, SubscriptionBody(etag, body)
+        return revision, None
+
+    async def set(self, user_id: int, revision: str | None, body: str) -> SubscriptionBody:
+        entry = SubscriptionBody(hashlib.sha256(body.encode("ascii")).hexdigest()[:32], body)
+        self.renders += 1
+        if revision is None:
+            return entry
+        try:
+            client = await redis_client.get_client()
+            await client.set(_body_key(user_id), f"{revision}:{entry.etag}:{body}", ex=self.ttl)
+        except Exception:
+            self.errors += 1
+            logger.warning("Не удалось записать подписку в кеш", exc_info=True)
+        return entry
+
+    async def invalidate_many(self, user_ids: Iterable[int]) -> None:
+        """Вызывать после коммита транзакции, изменившей конфиги пользователей."""
+        ids = list(user_ids)
+        if not ids:
+            return
+        commands = []
+        for user_id in ids:
+            commands.append(("INCR", _rev_key(user_id)))
+            commands.append(("EXPIRE", _rev_key(user_id), self.revision_ttl))
+        try:
+            await redis_client.batch(commands)
+            self.invalidations += len(ids)
+        except Exception:
+            self.errors += 1
+            logger.error("Не удалось сдвинуть ревизии подписок %s", ids, exc_info=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "renders": self.renders,
+            "invalidations": self.invalidations,
+            "errors": self.errors,
+        }
+
+
+subscription_cache = SubscriptionCache(ttl=settings.CACHE_TTL, revision_ttl=settings.REVISION_TTL)
+register_collector("subscription_cache", subscription_cache.stats)
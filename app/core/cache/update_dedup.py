@@ -0,0 +1,93 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
+from app.core.configs.webhook import webhook_settings
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+
+def _key(update_id: int) -> str:
+    return f"tg:update:{update_id}"
+
+
+class UpdateDeduplicator:
+    """
+    Реестр уже обработанных update_id: Redis (SET NX + TTL) и локальный
+    LRU, который отвечает сам, если Redis недоступен.
+    Апдейт отмечается только после успешной обработки, поэтому
+    упавшая обработка не "съедает" повторную доставку от Telegram.
+    """
+
+    def __init__(self, ttl: int, local_size: int):
+        self.ttl = ttl
+        self.local_size = local_size
+        self._local: OrderedDict[int, float] = OrderedDict()
+
+        self.duplicates = 0
+        self.local_hits = 0
+        self.misses = 0
+        self.redis_errors = 0
+
+    def _seen_locally(self, update_id: int) -> bool:
+        expires = self._local.get(update_id)
+        if expires is None:
+            return False
+        if expires < time.monotonic():
+            del self._local[update_id]
+            return False
+        self._local.move_to_end(update_id)
+        return True
+
+    def _remember_locally(self, update_id: int) -> None:
+        self._local[update_id] = time.monotonic() + self.ttl
+        self._local.move_to_end(update_id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def is_duplicate(self, update_id: int) -> bool:
+        if self._seen_locally(update_id):
+            self.duplicates += 1
+            self.local_hits += 1
+            return True
+        try:
+            client = await redis_client.get_client()
+            seen = await client.exists(_key(update_id))
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("Дедупликация апдейтов: Redis недоступен", exc_info=True)
+            seen = False
+        if seen:
+            self.duplicates += 1
+            self._remember_locally(update_id)
+            return True
+        self.misses += 1
+        return False
+
+    async def mark_processed(self, update_id: int) -> None:
+        self._remember_locally(update_id)
+        try:
+            client = await redis_client.get_client()
+            await client.set(_key(update_id), "1", ex=self.ttl, nx=True)
+        except Exception:
+            self.redis_errors += 1
+            logger.warning("Дедупликация апдейтов: Redis недоступен", exc_info=True)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "duplicates": self.duplicates,
+            "local_hits": self.local_hits,
+            "misses": self.misses,
+            "redis_errors": self.redis_errors,
+            "local_size": len(self._local),
+        }
+
+
+update_dedup = UpdateDeduplicator(
+    ttl=webhook_settings.DEDUP_TTL,
+    local_size=webhook_settings.DEDUP_LOCAL_SIZE,
+)
+register_collector("webhook_dedup", update_dedup.stats)
@@ -0,0 +1,91 @@
+import logging
+from collections import OrderedDict
+from typing import Any
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.configs import redis_settings
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+from app.core.repositories.user import get_user_id
+
+logger = logging.getLogger(__name__)
+
+
+def _key(telegram_id: int) -> str:
+    return f"user:id:{telegram_id}"
+
+
+class UserIdCache:
+    """
+    Соответствие telegram_id -> users.id для токенов без claim "uid".
+    Связка неизменна, поэтому инвалидации нет: локальный LRU, за ним Redis,
+    за ним БД.
+    """
+
+    def __init__(self, ttl: int, local_size: int):
+        self.ttl = ttl
+        self.local_size = local_size
+        self._local: OrderedDict[int, int] = OrderedDict()
+
+        self.local_hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _remember_locally(self, telegram_id: int, user_id: int) -> None:
+        self._local[telegram_id] = user_id
+        self._local.move_to_end(telegram_id)
+        while len(self._local) > self.local_size:
+            self._local.popitem(last=False)
+
+    async def remember(self, telegram_id: int, user_id: int) -> None:
+        self._remember_locally(telegram_id, user_id)
+        try:
+            client = await redis_client.get_client()
+            await client.set(_key(telegram_id), user_id, ex=self.ttl)
+        except Exception:
+            self.errors += 1
+            logger.warning("Кеш users.id недоступен", exc_info=True)
+
+    async def resolve(self, db: AsyncSession, telegram_id: int) -> int | None:
+        user_id = self._local.get(telegram_id)
+        if user_id is not None:
+            self._local.move_to_end(telegram_id)
+            self.local_hits += 1
+            return user_id
+
+        try:
+            client = await redis_client.get_client()
+            raw = await client.get(_key(telegram_id))
+        except Exception:
+            self.errors += 1
+            logger.warning("Кеш users.id недоступен", exc_info=True)
+            raw = None
+        if raw is not None:
+            self.redis_hits += 1
+            user_id = int(raw)
+            self._remember_locally(telegram_id, user_id)
+            return user_id
+
+        self.misses += 1
+        user_id = await get_user_id(db, telegram_id)
+        if user_id is not None:
+            await self.remember(telegram_id, user_id)
+        return user_id
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "local_hits": self.local_hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "local_size": len(self._local),
+        }
+
+
+user_id_cache = UserIdCache(
+    ttl=redis_settings.USER_ID_CACHE_TTL,
+    local_size=redis_settings.USER_ID_LOCAL_SIZE,
+)
+register_collector("user_id_cache", user_id_cache.stats)
@@ -1,6 +1,8 @@
 from .app import app_settings
+from .redis import redis_settings
 
 
 __all__ = (
     "app_settings",
+    "redis_settings",
 )
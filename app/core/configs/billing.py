@@ -0,0 +1,19 @@
+from decimal import Decimal
+
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class BillingSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='BILLING_',
+    )
+
+    # Абонплата за один активный конфиг в сутки
+    DAILY_PRICE_RUB: Decimal = Decimal("5.00")
+    # Сколько пользователей списывается одной транзакцией
+    BATCH_SIZE: int = 20000
+
+
+billing_settings = BillingSettings()
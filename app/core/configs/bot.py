@@ -5,5 +5,15 @@ class BotSettings(BaseConfig):
     BOT_TOKEN: str
     BOT_ID: int
 
+    # Bot API клиент (app.utils.tg_bot_api)
+    BOT_API_URL: str = "https://api.telegram.org"
+    BOT_API_TIMEOUT: float = 10.0
+    BOT_API_MAX_RETRIES: int = 3
+    # Лимиты Telegram: ~30 запросов/с на бота, ~1 сообщение/с в один чат
+    BOT_API_RATE_LIMIT: float = 30.0
+    BOT_API_CHAT_RATE_LIMIT: float = 1.0
+    # Общий предел на createInvoiceLink вместе с повторами — пользователь ждёт ответа
+    BOT_API_INVOICE_TIMEOUT: float = 5.0
+
 
 bot_settings = BotSettings()
@@ -14,6 +14,16 @@ class DBSettings(BaseConfig):
     USER: str
     PASS: str
 
+    # Пул соединений
+    POOL_SIZE: int = 10
+    MAX_OVERFLOW: int = 20
+    POOL_TIMEOUT: float = 30.0
+    POOL_RECYCLE: int = 1800
+    POOL_PRE_PING: bool = True
+
+    # Профиль для PgBouncer в transaction mode: без prepared statements asyncpg
+    PGBOUNCER: bool = False
+
     @property
     def URL(self) -> str:
         return (f"postgresql+asyncpg://{self.USER}:{self.PASS}@"
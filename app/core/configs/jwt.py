@@ -0,0 +1,32 @@
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class JwtSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='JWT_',
+    )
+
+    # "EdDSA" (Ed25519) или "ES256" (P-256)
+    ALGORITHM: str = "EdDSA"
+    ACCESS_TTL: int = 10 * 60
+    # Refresh-токен одноразовый: каждый обмен выдаёт новый на полный срок
+    REFRESH_TTL: int = 30 * 24 * 3600
+    # Сколько refresh-токенов (устройств) держим на пользователя
+    REFRESH_MAX_PER_USER: int = 10
+
+    # Каталог с ключами: <kid>.pem — приватный (подпись + проверка),
+    # <kid>.pub.pem — только публичный (старый ключ на время ротации).
+    KEYS_DIR: str = "secrets/jwt"
+    # kid, которым подписываем; по умолчанию — самый свежий приватный ключ
+    SIGNING_KID: str | None = None
+
+    # Старый общий секрет HS256: токены без kid принимаются, пока он задан
+    SECRET: str | None = None
+
+    # Как часто можно перечитывать каталог при неизвестном kid
+    RELOAD_INTERVAL: float = 30.0
+
+
+jwt_settings = JwtSettings()
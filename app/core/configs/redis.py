@@ -0,0 +1,29 @@
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class RedisSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='REDIS_',
+    )
+
+    URL: str = "redis://localhost:6379/0"
+
+    # Пул соединений процесса
+    MAX_CONNECTIONS: int = 50
+    POOL_TIMEOUT: float = 5.0
+    SOCKET_TIMEOUT: float = 2.0
+    SOCKET_CONNECT_TIMEOUT: float = 2.0
+    HEALTH_CHECK_INTERVAL: int = 30
+    RETRIES: int = 3
+
+    # TTL кеша профиля — только страховка, основное — явная инвалидация
+    PROFILE_CACHE_TTL: int = 300
+
+    # telegram_id -> users.id не меняется, держим долго
+    USER_ID_CACHE_TTL: int = 7 * 24 * 3600
+    USER_ID_LOCAL_SIZE: int = 100_000
+
+
+redis_settings = RedisSettings()
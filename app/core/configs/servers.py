@@ -0,0 +1,49 @@
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class ServerSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='SERVERS_',
+    )
+
+    # Снапшот реестра нод: плановое перечитывание и канал Redis,
+    # публикация в который перечитывает снапшот сразу
+    REFRESH_INTERVAL: float = 60.0
+    NOTIFY_CHANNEL: str = "servers:changed"
+
+    # Проверка нод: TCP connect + TLS handshake на PROBE_PORT
+    PROBE_ENABLED: bool = True
+    PROBE_INTERVAL: float = 15.0
+    PROBE_TIMEOUT: float = 3.0
+    PROBE_PORT: int = 443
+    # SNI для handshake; по умолчанию — домен ноды
+    PROBE_SNI: str | None = None
+    PROBE_CONCURRENCY: int = 50
+    # Окно сэмплов на ноду, сглаживание задержки, порог "мёртвой" ноды
+    PROBE_SAMPLES: int = 20
+    PROBE_EWMA_ALPHA: float = 0.3
+    PROBE_DEAD_AFTER: int = 3
+
+
+server_settings = ServerSettings()
+
+
+class NodeFeedSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='NODE_FEED_',
+    )
+
+    # Токен агентов нод (заголовок X-Node-Token); пусто — лента закрыта (503):
+    # в ответах UUID всех клиентов, без проверки её не отдаём
+    TOKEN: str | None = None
+    # Как часто процесс смотрит на голову ленты, максимум ожидания long-poll
+    POLL_INTERVAL: float = 1.0
+    MAX_WAIT: float = 30.0
+    # Больше изменений, чем это, — отдаём снапшот вместо диффа
+    MAX_CHANGES: int = 5000
+    RETENTION_HOURS: int = 7 * 24
+
+
+node_feed_settings = NodeFeedSettings()
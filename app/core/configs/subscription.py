@@ -0,0 +1,22 @@
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class SubscriptionSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='SUB_',
+    )
+
+    # Ключ подписи токенов /sub/<token>; по умолчанию выводится из BOT_TOKEN.
+    # Смена ключа отзывает все выданные ссылки подписки.
+    SECRET: str | None = None
+    # Тело подписки в Redis; актуальность определяет ревизия, TTL — страховка
+    CACHE_TTL: int = 24 * 3600
+    REVISION_TTL: int = 30 * 24 * 3600
+    # Заголовки для клиентов (v2rayN, Hiddify, Streisand)
+    UPDATE_INTERVAL_HOURS: int = 1
+    PROFILE_TITLE: str = "Fast Rabbit VPN"
+
+
+subscription_settings = SubscriptionSettings()
@@ -7,6 +7,12 @@ class VPNSettings(BaseConfig):
     SNI: str
     DOMAIN: str
     FLOW: str
+    # Общие параметры ссылок для нод без своих значений
+    LINK_PORT: int = 443
+    LINK_FP: str = "random"
+    LINK_SPX: str = "/"
+    # Сколько активных ключей может быть у одного пользователя
+    MAX_KEYS_PER_USER: int = 5
 
 
 vpn_settings = VPNSettings()
@@ -0,0 +1,27 @@
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class WebhookSettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='WEBHOOK_',
+    )
+
+    SECRET: str | None = None
+
+    # Дедупликация повторных доставок по update_id
+    DEDUP_TTL: int = 24 * 3600
+    DEDUP_LOCAL_SIZE: int = 10_000
+
+    # Быстрый ack: апдейт кладётся в telegram_updates, оплату проводят воркеры
+    QUEUE_ENABLED: bool = False
+    WORKERS: int = 4
+    BATCH_SIZE: int = 20
+    POLL_INTERVAL: float = 1.0
+    LEASE_SECONDS: int = 60
+    MAX_ATTEMPTS: int = 8
+    RETENTION_HOURS: int = 72
+
+
+webhook_settings = WebhookSettings()
@@ -0,0 +1,40 @@
+from pydantic_settings import SettingsConfigDict
+
+from .base import BaseConfig
+
+
+class XraySettings(BaseConfig):
+    model_config = SettingsConfigDict(
+        env_prefix='XRAY_',
+    )
+
+    # Нода -> адрес gRPC API Xray (host:port). Нода без записи
+    # доступна по "<нода>:API_PORT". Ключ ноды — vpn_domain конфига.
+    NODES: dict[str, str] = {}
+    API_PORT: int = 10085
+    DEFAULT_NODE: str | None = None
+
+    INBOUND_TAG: str = "vless-in"
+
+    # Bearer-токен админских ручек /xray; не задан — ручки отвечают 503
+    ADMIN_TOKEN: str | None = None
+
+    TIMEOUT: float = 5.0
+    RETRIES: int = 3
+    RETRY_BACKOFF: float = 0.2
+
+    # Очередь провижининга: окно накопления, размер пачки, параллелизм
+    # вызовов внутри пачки и сколько хранить статус операции
+    DEBOUNCE: float = 0.5
+    MAX_BATCH: int = 500
+    BATCH_CONCURRENCY: int = 32
+    OPERATION_TTL: int = 3600
+
+    # Сбор трафика из StatsService (счётчики читаются со сбросом);
+    # процесс сборщика: python -m app.services.traffic_stats
+    STATS_INTERVAL: float = 60.0
+    STATS_PATTERN: str = "user>>>"
+    STATS_CONCURRENCY: int = 4
+
+
+xray_settings = XraySettings()
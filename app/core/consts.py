@@ -22,3 +22,22 @@ class RefundStatus(StrEnum):
     REQUESTED = "REQUESTED"
     OK = "OK"
     FAILED = "FAILED"
+
+
+class UpdateStatus(StrEnum):
+    PENDING = "PENDING"
+    PROCESSING = "PROCESSING"
+    DONE = "DONE"
+    DEAD = "DEAD"          # исчерпаны попытки — dead-letter, разбирается вручную
+
+
+class ProvisionStatus(StrEnum):
+    PENDING = "PENDING"
+    APPLIED = "APPLIED"
+    CANCELLED = "CANCELLED"  # взаимно погашена противоположной операцией
+    FAILED = "FAILED"
+
+
+class ConfigChangeOp(StrEnum):
+    ADD = "ADD"
+    REMOVE = "REMOVE"
@@ -1,27 +1,118 @@
 import datetime
+import time
 from typing import Annotated, AsyncGenerator, Any
+from uuid import uuid4
 from sqlalchemy import MetaData, String, text, ForeignKey
 from sqlalchemy.sql import func
 from sqlalchemy.types import JSON
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase, mapped_column
-from sqlalchemy.pool import NullPool
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+)
+from sqlalchemy.orm import DeclarativeBase, mapped_column
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from app.core.configs.db import db_settings as settings
+from app.core.metrics import register_collector
 
 
 metadata = MetaData()
 
 
-engine = create_async_engine(settings.URL, poolclass=NullPool)
-async_session_maker = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False)
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Очередь соединений, которая замеряет время ожидания checkout.
+    Нужна, чтобы подбирать POOL_SIZE / MAX_OVERFLOW по реальной нагрузке.
+    """
+
+    checkouts: int = 0
+    wait_total: float = 0.0
+    wait_max: float = 0.0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - started
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+
+
+def _engine_options() -> dict[str, Any]:
+    options: dict[str, Any] = {
+        "poolclass": InstrumentedPool,
+        "pool_size": settings.POOL_SIZE,
+        "max_overflow": settings.MAX_OVERFLOW,
+        "pool_timeout": settings.POOL_TIMEOUT,
+        "pool_recycle": settings.POOL_RECYCLE,
+        "pool_pre_ping": settings.POOL_PRE_PING,
+    }
+    if settings.PGBOUNCER:
+        # PgBouncer (transaction mode) не держит prepared statements между
+        # транзакциями: выключаем кеш asyncpg и делаем имена уникальными.
+        options["connect_args"] = {
+            "statement_cache_size": 0,
+            "prepared_statement_cache_size": 0,
+            "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+        }
+    return options
+
+
+engine: AsyncEngine | None = None
+async_session_maker: async_sessionmaker[AsyncSession] | None = None
+
+
+def init_engine() -> AsyncEngine:
+    """Создаёт пул (один раз на процесс). Вызывается из lifespan приложения."""
+    global engine, async_session_maker
+    if engine is None:
+        engine = create_async_engine(settings.URL, **_engine_options())
+        async_session_maker = async_sessionmaker(
+            engine, class_=AsyncSession, expire_on_commit=False)
+    return engine
+
+
+async def dispose_engine() -> None:
+    """Закрывает все соединения пула при остановке приложения."""
+    global engine, async_session_maker
+    if engine is not None:
+        await engine.dispose()
+    engine = None
+    async_session_maker = None
+
+
+def get_session_maker() -> async_sessionmaker[AsyncSession]:
+    if async_session_maker is None:
+        init_engine()
+    return async_session_maker
 
 
 async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
-    async with async_session_maker() as session:
+    async with get_session_maker()() as session:
         yield session
 
 
+def pool_stats() -> dict[str, Any]:
+    if engine is None:
+        return {"initialized": False}
+    pool = engine.pool
+    checkouts = pool.checkouts if isinstance(pool, InstrumentedPool) else 0
+    wait_total = pool.wait_total if isinstance(pool, InstrumentedPool) else 0.0
+    return {
+        "initialized": True,
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "in_use": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checkouts": checkouts,
+        "wait_avg_ms": round(wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+        "wait_max_ms": round(getattr(pool, "wait_max", 0.0) * 1000, 3),
+    }
+
+
+register_collector("db_pool", pool_stats)
+
+
 str_64 = Annotated[str, 64]
 str_128 = Annotated[str, 128]
 str_256 = Annotated[str, 256]
@@ -1,34 +1,104 @@
 import logging
+from typing import Any, Iterable, Sequence
+
 import redis.asyncio as aioredis
+from redis.asyncio.retry import Retry
+from redis.backoff import ExponentialBackoff
+from redis.exceptions import ConnectionError, TimeoutError
 
 from app.core.configs import redis_settings
+from app.core.metrics import register_collector
 
 logger = logging.getLogger(__name__)
 
 
 class RedisClient:
+    """
+    Один клиент Redis на процесс поверх ограниченного пула соединений.
+    Создаётся в lifespan приложения (init/close); get_client() лениво
+    инициализирует пул для скриптов, которые lifespan не запускают.
+    """
+
+    _pool: aioredis.BlockingConnectionPool | None = None
+    _client: aioredis.Redis | None = None
+
     @classmethod
-    async def get_client(cls) -> aioredis.Redis:
+    def _create(cls) -> aioredis.Redis:
+        cls._pool = aioredis.BlockingConnectionPool.from_url(
+            redis_settings.URL,
+            max_connections=redis_settings.MAX_CONNECTIONS,
+            timeout=redis_settings.POOL_TIMEOUT,
+            socket_timeout=redis_settings.SOCKET_TIMEOUT,
+            socket_connect_timeout=redis_settings.SOCKET_CONNECT_TIMEOUT,
+            health_check_interval=redis_settings.HEALTH_CHECK_INTERVAL,
+            retry=Retry(ExponentialBackoff(cap=1.0, base=0.05), redis_settings.RETRIES),
+            retry_on_error=[ConnectionError, TimeoutError],
+            encoding="utf-8",
+            decode_responses=True,
+        )
+        cls._client = aioredis.Redis(connection_pool=cls._pool)
+        return cls._client
+
+    @classmethod
+    async def init(cls) -> None:
         """
-        Получить клиента Redis.
+        Создать пул и проверить доступность Redis.
 
         Логи:
           - INFO при попытке подключения
-          - ERROR при неудаче
+          - ERROR при неудаче (приложение всё равно стартует — кеши
+            деградируют до походов в БД, пул переподключится сам)
         """
+        logger.info("Подключение к Redis: %s", redis_settings.URL)
+        client = cls._client or cls._create()
         try:
-            logger.info("Подключение к Redis: %s", redis_settings.URL)
-            client = aioredis.from_url(
-                redis_settings.URL,
-                encoding="utf-8",
-                decode_responses=True,
-            )
             await client.ping()
             logger.info("Успешно подключились к Redis")
-            return client
         except Exception:
             logger.exception("Не удалось подключиться к Redis", exc_info=True)
-            raise
+
+    @classmethod
+    async def close(cls) -> None:
+        if cls._client is not None:
+            await cls._client.aclose()
+        if cls._pool is not None:
+            await cls._pool.disconnect()
+        cls._client = None
+        cls._pool = None
+
+    @classmethod
+    async def get_client(cls) -> aioredis.Redis:
+        """Получить общий клиент Redis (без нового соединения на вызов)."""
+        return cls._client or cls._create()
+
+    @classmethod
+    async def batch(
+        cls,
+        commands: Iterable[Sequence[Any]],
+        transaction: bool = False,
+    ) -> list[Any]:
+        """
+        Выполнить несколько команд за один round trip.
+        commands: [("SET", "k", "v", "EX", 60), ("GET", "k2"), ...]
+        """
+        client = await cls.get_client()
+        async with client.pipeline(transaction=transaction) as pipe:
+            for command in commands:
+                pipe.execute_command(*command)
+            return await pipe.execute()
+
+    @classmethod
+    def stats(cls) -> dict[str, Any]:
+        pool = cls._pool
+        if pool is None:
+            return {"initialized": False}
+        return {
+            "initialized": True,
+            "max_connections": pool.max_connections,
+            "in_use": len(pool._in_use_connections),
+            "idle": len(pool._available_connections),
+        }
 
 
 redis_client = RedisClient()
+register_collector("redis_pool", RedisClient.stats)
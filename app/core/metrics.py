@@ -0,0 +1,17 @@
+from typing import Any, Callable
+
+
+_collectors: dict[str, Callable[[], dict[str, Any]]] = {}
+
+
+def register_collector(name: str, collector: Callable[[], dict[str, Any]]) -> None:
+    """
+    Регистрирует функцию, которая отдаёт текущие показатели компонента.
+    Повторная регистрация под тем же именем заменяет предыдущую.
+    """
+    _collectors[name] = collector
+
+
+def collect() -> dict[str, dict[str, Any]]:
+    """Снимок всех зарегистрированных метрик."""
+    return {name: collector() for name, collector in _collectors.items()}
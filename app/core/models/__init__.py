@@ -3,3 +3,8 @@ from .payments import Payment
 from .refunds import Refund
 from .wallet_ledger import WalletEntry
 from .vpn_configs import VpnConfig
+from .user_balances import UserBalance
+from .telegram_updates import TelegramUpdate
+from .servers import Server
+from .vpn_config_changes import VpnConfigChange
+from .traffic_usage import TrafficUsageHourly
@@ -0,0 +1,34 @@
+from datetime import datetime
+
+from sqlalchemy import func, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db.postgres import Base, intpk, str_64, str_128, created_at
+
+
+class Server(Base):
+    """VPN-нода. Читается не напрямую, а через снапшот app.services.server_registry."""
+    __tablename__ = "servers"
+
+    id: Mapped[intpk]
+    country: Mapped[str_64]
+    domain: Mapped[str_64] = mapped_column(unique=True, comment="vpn_domain ноды")
+    capacity: Mapped[int] = mapped_column(
+        default=0, server_default=text("0"), comment="Лимит активных конфигов, 0 — без лимита"
+    )
+    enabled: Mapped[bool] = mapped_column(default=True, server_default=text("true"))
+    weight: Mapped[int] = mapped_column(
+        default=100, server_default=text("100"), comment="Вес при выборе ноды внутри страны"
+    )
+
+    # Параметры ссылок ноды; пустые — берутся общие из VPNSettings
+    protocol: Mapped[str_64] = mapped_column(
+        default="vless", server_default=text("'vless'"), comment="vless | vmess | trojan"
+    )
+    port: Mapped[int] = mapped_column(default=443, server_default=text("443"))
+    reality_pbk: Mapped[str_128 | None]
+    reality_sid: Mapped[str_64 | None]
+    reality_sni: Mapped[str_128 | None]
+    inbound_tag: Mapped[str_64 | None] = mapped_column(comment="Тег инбаунда Xray; пусто — XRAY_INBOUND_TAG")
+
+    created_at: Mapped[created_at]
+    updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
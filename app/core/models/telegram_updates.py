@@ -0,0 +1,34 @@
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import BIGINT, Enum, Index, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.consts import UpdateStatus
+from app.core.db.postgres import Base, created_at
+
+
+class TelegramUpdate(Base):
+    """Очередь входящих апдейтов вебхука (at-least-once, ключ — update_id)."""
+    __tablename__ = "telegram_updates"
+
+    update_id: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=False)
+    payload: Mapped[dict[str, Any]] = mapped_column(JSONB, nullable=False)
+    status: Mapped[UpdateStatus] = mapped_column(
+        Enum(UpdateStatus, name="update_status_enum", native_enum=False),
+        default=UpdateStatus.PENDING,
+        server_default=text("'PENDING'"),
+        comment="Статус обработки апдейта",
+        nullable=False
+    )
+    attempts: Mapped[int] = mapped_column(default=0, server_default=text("0"))
+    available_at: Mapped[datetime] = mapped_column(server_default=text("now()"))
+    locked_until: Mapped[datetime | None]
+    last_error: Mapped[str | None]
+    created_at: Mapped[created_at]
+    processed_at: Mapped[datetime | None]
+
+    __table_args__ = (
+        # выборка готовых к обработке и просроченных аренд
+        Index("ix_telegram_updates_status_available", "status", "available_at"),
+    )
@@ -0,0 +1,20 @@
+from datetime import datetime
+
+from sqlalchemy import BIGINT, ForeignKey, text
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.db.postgres import Base
+
+
+class TrafficUsageHourly(Base):
+    """
+    Трафик конфига по часам (байты). Пишется пачками коллектором
+    app.services.traffic_stats, ORM-объекты для вставки не создаются.
+    """
+    __tablename__ = "traffic_usage_hourly"
+
+    config_id: Mapped[int] = mapped_column(
+        ForeignKey("vpn_configs.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket: Mapped[datetime] = mapped_column(primary_key=True, comment="Начало часа")
+    uplink: Mapped[int] = mapped_column(BIGINT, default=0, server_default=text("0"))
+    downlink: Mapped[int] = mapped_column(BIGINT, default=0, server_default=text("0"))
@@ -0,0 +1,27 @@
+from typing import TYPE_CHECKING
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import Numeric, ForeignKey, func, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship
+from app.core.db.postgres import Base
+
+if TYPE_CHECKING:
+    from app.core.models.users import User
+
+
+class UserBalance(Base):
+    """
+    Материализованный баланс пользователя.
+    Обновляется в той же транзакции, что и вставка в wallet_ledger
+    (см. app.core.repositories.wallet.add_ledger_entry).
+    """
+    __tablename__ = "user_balances"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="RESTRICT"), primary_key=True)
+    balance_rub: Mapped[Decimal] = mapped_column(
+        Numeric(12, 2), default=0, server_default=text("0"), nullable=False
+    )
+    updated_at: Mapped[datetime] = mapped_column(default=func.now(), onupdate=func.now())
+
+    user: Mapped["User"] = relationship(back_populates="balance_snapshot")
@@ -1,4 +1,4 @@
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 from sqlalchemy.orm import Mapped, relationship, mapped_column
 from sqlalchemy import BIGINT
 
@@ -11,6 +11,7 @@ if TYPE_CHECKING:
     from app.core.models.vpn_configs import VpnConfig
     from app.core.models.payments import Payment
     from app.core.models.refunds import Refund
+    from app.core.models.user_balances import UserBalance
 
 
 class User(Base):
@@ -27,3 +28,4 @@ class User(Base):
     ledger: Mapped[list["WalletEntry"]] = relationship(back_populates="user", cascade="all, delete-orphan")
     vpn_configs: Mapped[list["VpnConfig"]] = relationship(back_populates="user", cascade="all, delete-orphan")
     refunds: Mapped[list["Refund"]] = relationship(back_populates="user", cascade="all, delete-orphan")
+    balance_snapshot: Mapped[Optional["UserBalance"]] = relationship(back_populates="user", cascade="all, delete-orphan")
@@ -0,0 +1,29 @@
+from sqlalchemy import BIGINT, Enum, Index
+from sqlalchemy.orm import Mapped, mapped_column
+from app.core.consts import ConfigChangeOp
+from app.core.db.postgres import Base, str_64, created_at
+
+
+class VpnConfigChange(Base):
+    """
+    Лента изменений vpn_configs для нод. Пишется только триггером
+    vpn_configs_change_feed (см. миграцию), порядок ревизий совпадает
+    с порядком коммитов.
+    """
+    __tablename__ = "vpn_config_changes"
+
+    revision: Mapped[int] = mapped_column(BIGINT, primary_key=True, autoincrement=True)
+    node: Mapped[str_64] = mapped_column(comment="vpn_domain конфига")
+    # без FK: строка конфига может быть уже удалена
+    config_id: Mapped[int]
+    op: Mapped[ConfigChangeOp] = mapped_column(
+        Enum(ConfigChangeOp, name="config_change_op_enum", native_enum=False),
+    )
+    uuid: Mapped[str_64 | None]
+    email: Mapped[str_64 | None] = mapped_column(comment="email в инбаунде Xray (email или uuid)")
+    flow: Mapped[str_64 | None]
+    created_at: Mapped[created_at]
+
+    __table_args__ = (
+        Index("ix_vpn_config_changes_node_revision", "node", "revision"),
+    )
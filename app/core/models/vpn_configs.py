@@ -34,4 +34,9 @@ class VpnConfig(Base):
     __table_args__ = (
         UniqueConstraint("user_id", "uuid", name="uq_vpn_config_user_external"),
         Index("ix_vpn_configs_created", "created_at"),
+        # снапшот активных конфигов ноды для ленты изменений
+        Index(
+            "ix_vpn_configs_domain_active", "vpn_domain",
+            postgresql_where=text("is_active"),
+        ),
     )
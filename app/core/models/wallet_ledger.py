@@ -1,5 +1,6 @@
 from typing import TYPE_CHECKING
 from typing import Optional
+from datetime import date
 from decimal import Decimal
 
 from sqlalchemy import (
@@ -32,11 +33,19 @@ class WalletEntry(Base):
     amount_rub: Mapped[Decimal] = mapped_column(Numeric(12, 2), nullable=False)  # >0 пополнение; <0 списание
     comment: Mapped[str | None]
 
+    # Абонплата: за какой конфиг и день списано (ключ идемпотентности биллинга)
+    config_id: Mapped[int | None] = mapped_column(ForeignKey("vpn_configs.id", ondelete="SET NULL"))
+    billing_day: Mapped[date | None]
+
     created_at: Mapped[created_at]
 
     user: Mapped["User"] = relationship(back_populates="ledger")
     payment: Mapped[Optional["Payment"]] = relationship(back_populates="ledger_entries")
 
     __table_args__ = (
-        Index("ix_wallet_ledger_user_created", "user_id", "created_at"),
+        # id замыкает ключ keyset-пагинации истории: (created_at, id) строго упорядочены
+        Index("ix_wallet_ledger_user_created", "user_id", "created_at", "id"),
+        # NULL-ы различны, так что прочим проводкам индекс не мешает;
+        # заодно обслуживает ON DELETE SET NULL по config_id
+        Index("uq_wallet_ledger_config_day", "config_id", "billing_day", unique=True),
     )
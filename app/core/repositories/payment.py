@@ -0,0 +1,40 @@
+from decimal import Decimal
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.consts import PaymentStatus
+from app.core.models.payments import Payment
+
+
+async def create_pending_payment(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    payload: str,
+    rub_amount: Decimal,
+    stars_amount: int,
+) -> int:
+    """
+    PENDING-платёж под новый инвойс — один INSERT ... RETURNING id.
+    payload уникален по построению (случайный nonce), искать его перед
+    вставкой незачем. Коммитит сам: инвойс в Telegram можно создавать только
+    под уже сохранённый платёж (AUTOCOMMIT не годится — сессия могла уже
+    открыть транзакцию).
+    """
+    payment_id = (
+        await db.execute(
+            insert(Payment)
+            .values(
+                user_id=user_id,
+                payload=payload,
+                rub_amount=rub_amount,
+                stars_amount=stars_amount,
+                status=PaymentStatus.PENDING,
+                currency="XTR",
+            )
+            .returning(Payment.id)
+        )
+    ).scalar_one()
+    await db.commit()
+    return payment_id
@@ -0,0 +1,100 @@
+from datetime import datetime
+
+from sqlalchemy import select, func, literal_column
+from sqlalchemy.dialects.postgresql import aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.models.user_balances import UserBalance
+from app.core.models.users import User
+from app.core.models.vpn_configs import VpnConfig
+from app.core.schemas.key import KeyBase
+from app.core.schemas.user_balance import UserBalanceBase
+from app.core.schemas.user_full import UserFullInfo
+from app.services.link_renderer import link_renderer
+from app.utils.vless import dt_to_str
+
+
+_KEY_FIELDS = ("id", "uuid", "vpn_domain", "flow", "email", "country", "created_at")
+
+# Активные конфиги пользователя одним JSON-массивом (коррелированный подзапрос)
+_active_keys = (
+    select(
+        func.coalesce(
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object(
+                        *(arg for name in _KEY_FIELDS for arg in (name, getattr(VpnConfig, name)))
+                    ),
+                    VpnConfig.id,
+                )
+            ),
+            literal_column("'[]'::json"),
+        )
+    )
+    .where(VpnConfig.user_id == User.id, VpnConfig.is_active.is_(True))
+    .correlate(User)
+    .scalar_subquery()
+)
+
+
+def _config_from_json(row: dict) -> VpnConfig:
+    created_at = row.get("created_at")
+    return VpnConfig(
+        id=row["id"],
+        uuid=row.get("uuid"),
+        vpn_domain=row.get("vpn_domain"),
+        flow=row.get("flow"),
+        email=row.get("email"),
+        country=row.get("country"),
+        created_at=datetime.fromisoformat(created_at) if created_at else None,
+    )
+
+
+async def load_user_full_info(db: AsyncSession, telegram_id: int) -> UserFullInfo | None:
+    """
+    Пользователь, баланс из user_balances и активные VPN-конфиги
+    за один SQL-запрос. None — если пользователя нет.
+    """
+    row = (
+        await db.execute(
+            select(
+                User.id,
+                User.telegram_id,
+                User.first_name,
+                User.last_name,
+                User.username,
+                func.coalesce(UserBalance.balance_rub, 0).label("balance"),
+                _active_keys.label("configs"),
+            )
+            .outerjoin(UserBalance, UserBalance.user_id == User.id)
+            .where(User.telegram_id == telegram_id)
+        )
+    ).one_or_none()
+    if row is None:
+        return None
+
+    configs = [_config_from_json(item) for item in row.configs]
+    return UserFullInfo(
+        id=row.id,
+        telegram_id=row.telegram_id,
+        first_name=row.first_name,
+        last_name=row.last_name,
+        username=row.username,
+        balance=UserBalanceBase(balance=float(row.balance)),
+        keys=[
+            KeyBase(
+                id=cfg.id,
+                key=link_renderer.render(cfg),     # ✅ готовая ссылка по шаблону ноды
+                country=cfg.country,
+                created_at=dt_to_str(cfg.created_at),
+            )
+            for cfg in configs
+        ],
+    )
+
+
+async def get_user_id(db: AsyncSession, telegram_id: int) -> int | None:
+    """users.id по telegram_id (unique-индекс)."""
+    return (
+        await db.execute(select(User.id).where(User.telegram_id == telegram_id))
+    ).scalar_one_or_none()
@@ -0,0 +1,71 @@
+from dataclasses import dataclass
+from datetime import datetime
+
+from sqlalchemy import select, update, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.models.vpn_configs import VpnConfig
+
+
+async def get_active_configs(db: AsyncSession, user_id: int) -> list[VpnConfig]:
+    """Активные конфиги пользователя в порядке создания."""
+    rows = await db.execute(
+        select(VpnConfig)
+        .where(VpnConfig.user_id == user_id, VpnConfig.is_active.is_(True))
+        .order_by(VpnConfig.id)
+    )
+    return list(rows.scalars().all())
+
+
+@dataclass(frozen=True, slots=True)
+class IssuedConfig:
+    id: int | None
+    uuid: str | None
+    email: str | None
+    created_at: datetime | None
+    active_keys: int
+    # id None и node_full — у ноды исчерпан servers.capacity
+    node_full: bool = False
+
+
+async def issue_config(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    domain: str,
+    country: str,
+    flow: str | None,
+    limit: int,
+) -> IssuedConfig:
+    """
+    Новый конфиг с UUID от Postgres через функцию issue_vpn_config:
+    advisory-лок пользователя, проверка лимита пользователя и ёмкости
+    ноды, вставка — один запрос.
+    Коммитит сам: ключ можно отдавать и ставить на ноду только после
+    коммита. На AUTOCOMMIT полагаться нельзя — сессия могла уже открыть
+    транзакцию (например, в current_user), и execution_options её соединения
+    не поменять. id None — лимит исчерпан (node_full — у ноды, иначе
+у пользователя).
+    """
+    issued = func.issue_vpn_config(user_id, domain, country, flow, limit).table_valued(
+        "config_id", "config_uuid", "config_email", "config_created_at", "active_keys", "node_full",
+    )
+    row = (await db.execute(select(issued))).one()
+    await db.commit()
+    return IssuedConfig(*row)
+
+
+async def deactivate_user_config(db: AsyncSession, user_id: int, config_id: int) -> VpnConfig | None:
+    """Деактивирует конфиг пользователя; None — нет такого активного конфига."""
+    return (
+        await db.execute(
+            update(VpnConfig)
+            .where(
+                VpnConfig.id == config_id,
+                VpnConfig.user_id == user_id,
+                VpnConfig.is_active.is_(True),
+            )
+            .values(is_active=False, deleted_at=func.now())
+            .returning(VpnConfig)
+        )
+    ).scalar_one_or_none()
@@ -0,0 +1,95 @@
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable
+
+from sqlalchemy import Row, select, func, tuple_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.consts import LedgerType
+from app.core.models.payments import Payment
+from app.core.models.user_balances import UserBalance
+from app.core.models.wallet_ledger import WalletEntry
+
+
+async def add_ledger_entry(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    amount_rub: Decimal,
+    entry_type: LedgerType,
+    payment_id: int | None = None,
+    comment: str | None = None,
+) -> None:
+    """
+    Пишет проводку в wallet_ledger и сдвигает снапшот user_balances.
+    Оба изменения живут в транзакции вызывающего кода — коммит за ним.
+    """
+    amount = Decimal(amount_rub)
+    await db.execute(
+        insert(WalletEntry).values(
+            user_id=user_id,
+            payment_id=payment_id,
+            entry_type=entry_type,
+            amount_rub=amount,
+            comment=comment,
+        )
+    )
+    stmt = insert(UserBalance).values(user_id=user_id, balance_rub=amount)
+    await db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=[UserBalance.user_id],
+            set_={
+                "balance_rub": UserBalance.balance_rub + stmt.excluded.balance_rub,
+                "updated_at": func.now(),
+            },
+        )
+    )
+
+
+async def get_balance(db: AsyncSession, user_id: int) -> Decimal:
+    """Баланс по первичному ключу; нет строки — значит, проводок ещё не было."""
+    balance = (
+        await db.execute(
+            select(UserBalance.balance_rub).where(UserBalance.user_id == user_id)
+        )
+    ).scalar_one_or_none()
+    return balance if balance is not None else Decimal(0)
+
+
+async def get_ledger_page(
+    db: AsyncSession,
+    user_id: int,
+    *,
+    limit: int,
+    before: tuple[datetime, int] | None = None,
+    entry_types: Iterable[LedgerType] | None = None,
+) -> list[Row]:
+    """
+    Страница истории, новые сверху. Keyset по (created_at, id) < before
+    идёт по индексу ix_wallet_ledger_user_created (user_id, created_at, id):
+    любая страница стоит одинаково, без OFFSET. Возвращает до limit + 1
+    строк — лишняя говорит, что есть следующая страница.
+    """
+    stmt = (
+        select(
+            WalletEntry.id,
+            WalletEntry.entry_type,
+            WalletEntry.amount_rub,
+            WalletEntry.comment,
+            WalletEntry.created_at,
+            WalletEntry.payment_id,
+            Payment.status.label("payment_status"),
+            Payment.stars_amount,
+        )
+        .outerjoin(Payment, Payment.id == WalletEntry.payment_id)
+        .where(WalletEntry.user_id == user_id)
+        .order_by(WalletEntry.created_at.desc(), WalletEntry.id.desc())
+        .limit(limit + 1)
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(WalletEntry.created_at, WalletEntry.id) < tuple_(*before))
+    types = list(entry_types or ())
+    if types:
+        stmt = stmt.where(WalletEntry.entry_type.in_(types))
+    return list((await db.execute(stmt)).all())
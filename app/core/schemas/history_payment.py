@@ -1,9 +1,22 @@
 from pydantic import BaseModel, ConfigDict
 
+from app.core.consts import LedgerType, PaymentStatus
 
-class HistoryPaymentBase(BaseModel):
+
+class HistoryEntry(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
-    user_id: int
+    entry_type: LedgerType
     amount: float
+    comment: str | None = None
     created_at: str
+    # для пополнений — платёж, которым оно пришло
+    payment_id: int | None = None
+    payment_status: PaymentStatus | None = None
+    stars_amount: int | None = None
+
+
+class HistoryPage(BaseModel):
+    items: list[HistoryEntry]
+    # курсор следующей страницы; None — это последняя
+    next_cursor: str | None = None
@@ -12,3 +12,8 @@ class KeyBase(BaseModel):
 class KeyCreate(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     server_id: int
+
+
+class KeyCreated(KeyBase):
+    # провижининг на ноде идёт в фоне: GET /xray/operations/{operation_id}
+    operation_id: str
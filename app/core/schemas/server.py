@@ -1,3 +1,5 @@
+from typing import Optional
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -5,6 +7,9 @@ class ServerBase(BaseModel):
     model_config = ConfigDict(from_attributes=True)
     id: int
     country: str
+    # по данным фоновой проверки; None — нода ещё не проверялась
+    latency_ms: Optional[float] = None
+    availability: Optional[float] = None
 
 
 class ServerCreate(BaseModel):
@@ -0,0 +1,6 @@
+from pydantic import BaseModel
+
+
+class SubscriptionLink(BaseModel):
+    token: str
+    url: str
@@ -13,4 +13,5 @@ class XraySchemasBase(BaseModel):
 
 
 class XraySchemasCreate(XraySchemasBase):
-    pass
+    # нода (vpn_domain); по умолчанию — XRAY_DEFAULT_NODE
+    node: Optional[str] = None
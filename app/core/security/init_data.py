@@ -0,0 +1,191 @@
+import base64
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Tuple, Any
+from urllib.parse import parse_qsl
+
+from fastapi import HTTPException
+from nacl.signing import VerifyKey
+
+
+def parse_init_data(init_data: str) -> Dict[str, str]:
+    """
+    Parse query-string from Telegram.WebApp.initData into a dict (keeps last occurrence on duplicates).
+    """
+    return dict(parse_qsl(init_data, keep_blank_values=True))
+
+
+def build_data_check_string(fields: Dict[str, str]) -> Tuple[str, str]:
+    """
+    Build data_check_string for server-side validation (HMAC path).
+    Exclude only 'hash' field. Sort keys alphabetically.
+    Returns (data_check_string, received_hash_hex)
+    """
+    received_hash = fields.get("hash") or ""
+    items = [(k, v) for k, v in fields.items() if k != "hash"]
+    items.sort(key=lambda kv: kv[0])
+    data_check_string = "\n".join(f"{k}={v}" for k, v in items)
+    return data_check_string, received_hash
+
+
+def compute_secret_key(bot_token: str) -> bytes:
+    """
+    secret_key = HMAC_SHA256(message=bot_token, key="WebAppData")
+    """
+    return hmac.new(b"WebAppData", bot_token.encode("utf-8"), hashlib.sha256).digest()
+
+
+def check_auth_date(fields: Dict[str, str], max_age_sec: int) -> int:
+    """Freshness check. Returns auth_date."""
+    try:
+        auth_date = int(fields.get("auth_date", "0"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid 'auth_date'")
+
+    if auth_date <= 0 or int(time.time()) - auth_date > max_age_sec:
+        raise HTTPException(status_code=401, detail="Stale auth_date")
+    return auth_date
+
+
+# Telegram Ed25519 public keys (hex)
+TG_PUBKEY_TEST = "40055058a4ee38156a06562e52eece92a771bcd8346a8c4615cb7376eddf72ec"
+TG_PUBKEY_PROD = "e7bf03a2fa4602af4580703d88dda5bb59f32ed8b02a56c187fe7d34caed242d"
+
+# Ключи разбираются один раз при импорте, а не на каждый запрос
+_VERIFY_KEYS = {
+    "prod": VerifyKey(bytes.fromhex(TG_PUBKEY_PROD)),
+    "test": VerifyKey(bytes.fromhex(TG_PUBKEY_TEST)),
+}
+
+
+def b64url_decode_nopad(s: str) -> bytes:
+    """
+    Base64url decode with optional missing padding.
+    """
+    s = s.replace("-", "+").replace("_", "/")
+    pad = (-len(s)) % 4
+    if pad:
+        s += "=" * pad
+    return base64.b64decode(s)
+
+
+def build_third_party_dcs(fields: Dict[str, str], bot_id: str) -> Tuple[str, bytes]:
+    """
+    Build data_check_string for third-party validation (Ed25519 path).
+    Exclude 'hash' and 'signature'. Sort keys alphabetically.
+    Returns (data_check_string, signature_bytes)
+    """
+    signature_b64u = fields.get("signature") or ""
+    if not signature_b64u:
+        raise HTTPException(status_code=400, detail="Missing 'signature'")
+    try:
+        signature = b64url_decode_nopad(signature_b64u)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid base64url 'signature'")
+
+    items = [(k, v) for k, v in fields.items() if k not in ("hash", "signature")]
+    items.sort(key=lambda kv: kv[0])
+    tail = "\n".join(f"{k}={v}" for k, v in items)
+    dcs = f"{bot_id}:WebAppData\n{tail}"
+    return dcs, signature
+
+
+def verify_third_party(init_data: str, bot_id: str, env: str = "prod", max_age_sec: int = 24 * 3600) -> Dict[str, Any]:
+    """
+    Third-party validation using Ed25519 'signature' and Telegram public key.
+    env: "prod" or "test"
+    """
+    fields = parse_init_data(init_data)
+    dcs, signature = build_third_party_dcs(fields, bot_id)
+
+    verify_key = _VERIFY_KEYS["prod" if env == "prod" else "test"]
+    try:
+        # Ed25519 verify: raises BadSignatureError if invalid
+        verify_key.verify(dcs.encode("utf-8"), signature)
+    except Exception:
+        raise HTTPException(status_code=401, detail="Invalid Ed25519 signature")
+
+    check_auth_date(fields, max_age_sec)
+    return fields
+
+
+class InitDataVerifier:
+    """
+    HMAC-проверка initData для одного бота.
+    secret_key считается один раз; уже проверенные строки initData
+    запоминаются (по дайджесту) до истечения окна auth_date, так что
+    повторный логин из той же сессии WebApp не пересчитывает HMAC.
+    """
+
+    def __init__(self, bot_token: str, cache_size: int = 10_000):
+        self._secret_key = compute_secret_key(bot_token)
+        self._cache_size = cache_size
+        # digest(initData) -> (expires_at, auth_date, fields)
+        self._verified: OrderedDict[bytes, Tuple[int, int, Dict[str, str]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _cached(self, digest: bytes, now: int) -> Tuple[int, Dict[str, str]] | None:
+        with self._lock:
+            entry = self._verified.get(digest)
+            if entry is None:
+                return None
+            expires_at, auth_date, fields = entry
+            if expires_at < now:
+                del self._verified[digest]
+                return None
+            self._verified.move_to_end(digest)
+            return auth_date, fields
+
+    def _remember(self, digest: bytes, expires_at: int, auth_date: int, fields: Dict[str, str]) -> None:
+        with self._lock:
+            self._verified[digest] = (expires_at, auth_date, fields)
+            self._verified.move_to_end(digest)
+            while len(self._verified) > self._cache_size:
+                self._verified.popitem(last=False)
+
+    def verify(self, init_data: str, max_age_sec: int = 24 * 3600) -> Dict[str, Any]:
+        """
+        Server-side verification using 'hash' (HMAC-SHA256).
+        Raises HTTPException on failure.
+        Returns parsed fields.
+        """
+        now = int(time.time())
+        digest = hashlib.sha256(init_data.encode("utf-8")).digest()
+        cached = self._cached(digest, now)
+        if cached is not None:
+            auth_date, fields = cached
+            if now - auth_date > max_age_sec:
+                raise HTTPException(status_code=401, detail="Stale auth_date")
+            self.hits += 1
+            return dict(fields)
+
+        self.misses += 1
+        fields = parse_init_data(init_data)
+        data_check_string, received_hash = build_data_check_string(fields)
+
+        if not received_hash:
+            raise HTTPException(status_code=400, detail="Missing 'hash'")
+
+        calc_hash = hmac.new(self._secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+
+        if not hmac.compare_digest(calc_hash, received_hash):
+            raise HTTPException(status_code=401, detail="Invalid hash")
+
+        auth_date = check_auth_date(fields, max_age_sec)
+        self._remember(digest, auth_date + max_age_sec, auth_date, fields)
+        return dict(fields)
+
+
+@lru_cache(maxsize=8)
+def get_init_data_verifier(bot_token: str) -> InitDataVerifier:
+    return InitDataVerifier(bot_token)
+
+
+def verify_hmac(init_data: str, bot_token: str, max_age_sec: int = 24 * 3600) -> Dict[str, Any]:
+    return get_init_data_verifier(bot_token).verify(init_data, max_age_sec=max_age_sec)
@@ -0,0 +1,152 @@
+"""
+Ключи подписи JWT (EdDSA/ES256) с kid и ротацией.
+
+Ротация: кладём новый <kid>.pem и переключаем JWT_SIGNING_KID; старый ключ
+оставляем как <kid>.pub.pem минимум на JWT_ACCESS_TTL, чтобы выданные им
+токены продолжали проверяться. Публичные ключи отдаются в JWKS.
+"""
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+from jwt.algorithms import ECAlgorithm, OKPAlgorithm
+
+from app.core.configs import app_settings
+from app.core.configs.jwt import jwt_settings
+
+logger = logging.getLogger(__name__)
+
+_PUBLIC_SUFFIX = ".pub.pem"
+
+
+def generate_private_key(algorithm: str):
+    if algorithm == "EdDSA":
+        return ed25519.Ed25519PrivateKey.generate()
+    if algorithm == "ES256":
+        return ec.generate_private_key(ec.SECP256R1())
+    raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+
+
+def _to_jwk(algorithm: str, kid: str, public_key) -> dict[str, Any]:
+    impl = OKPAlgorithm if algorithm == "EdDSA" else ECAlgorithm
+    jwk = impl.to_jwk(public_key, as_dict=True)
+    jwk.update(kid=kid, alg=algorithm, use="sig")
+    return jwk
+
+
+class KeyRing:
+    """
+    Разобранные ключи по kid: PEM парсится один раз при загрузке,
+    проверка токена — поиск в словаре.
+    """
+
+    def __init__(self, algorithm: str, keys_dir: str, signing_kid: str | None = None):
+        self.algorithm = algorithm
+        self.keys_dir = Path(keys_dir)
+        self.signing_kid = signing_kid
+        self._lock = threading.Lock()
+        self._signing: tuple[str, Any] | None = None
+        self._public: dict[str, Any] = {}
+        self._jwks: dict[str, Any] = {"keys": []}
+        self._loaded_at = 0.0
+
+    def load(self) -> None:
+        private: dict[str, tuple[float, Any]] = {}
+        public: dict[str, Any] = {}
+        if self.keys_dir.is_dir():
+            for path in sorted(self.keys_dir.glob("*.pem")):
+                data = path.read_bytes()
+                if path.name.endswith(_PUBLIC_SUFFIX):
+                    kid = path.name[:-len(_PUBLIC_SUFFIX)]
+                    public[kid] = serialization.load_pem_public_key(data)
+                else:
+                    key = serialization.load_pem_private_key(data, password=None)
+                    private[path.stem] = (path.stat().st_mtime, key)
+                    public[path.stem] = key.public_key()
+
+        if private:
+            if self.signing_kid:
+                if self.signing_kid not in private:
+                    raise RuntimeError(f"JWT signing key '{self.signing_kid}' not found in {self.keys_dir}")
+                kid = self.signing_kid
+            else:
+                kid = max(private, key=lambda k: private[k][0])
+            signing = (kid, private[kid][1])
+        elif self._signing is not None:
+            # каталог опустел — продолжаем подписывать тем, что уже есть
+            signing = self._signing
+            public.setdefault(signing[0], signing[1].public_key())
+        elif not app_settings.DEBUG:
+            # у каждого воркера был бы свой ключ, и токены ломались бы на рестарте
+            raise RuntimeError(f"JWT signing keys not found in {self.keys_dir}")
+        else:
+            # локальная разработка (DEBUG): эфемерный ключ, токены живут до рестарта
+            logger.warning("JWT: ключи в %s не найдены, сгенерирован временный ключ", self.keys_dir)
+            kid = f"dev-{int(time.time())}"
+            key = generate_private_key(self.algorithm)
+            signing = (kid, key)
+            public[kid] = key.public_key()
+
+        jwks = {"keys": [_to_jwk(self.algorithm, kid, key) for kid, key in sorted(public.items())]}
+        with self._lock:
+            self._signing = signing
+            self._public = public
+            self._jwks = jwks
+            self._loaded_at = time.monotonic()
+
+    def _ensure_loaded(self) -> None:
+        if self._signing is None:
+            self.load()
+
+    def signing_key(self) -> tuple[str, Any]:
+        """(kid, приватный ключ) для выпуска токенов."""
+        self._ensure_loaded()
+        return self._signing
+
+    def public_key(self, kid: str) -> Any | None:
+        """
+        Публичный ключ по kid. Неизвестный kid — повод перечитать каталог
+        (новый ключ мог появиться на другом инстансе), но не чаще
+        JWT_RELOAD_INTERVAL.
+        """
+        self._ensure_loaded()
+        key = self._public.get(kid)
+        if key is None and time.monotonic() - self._loaded_at > jwt_settings.RELOAD_INTERVAL:
+            try:
+                self.load()
+            except Exception:
+                logger.exception("JWT: не удалось перечитать ключи")
+            key = self._public.get(kid)
+        return key
+
+    def jwks(self) -> dict[str, Any]:
+        self._ensure_loaded()
+        return self._jwks
+
+
+key_ring = KeyRing(
+    algorithm=jwt_settings.ALGORITHM,
+    keys_dir=jwt_settings.KEYS_DIR,
+    signing_kid=jwt_settings.SIGNING_KID,
+)
+
+
+if __name__ == "__main__":
+    # Новый ключ для ротации: python -m app.core.security.jwt_keys <kid>
+    import sys
+
+    kid = sys.argv[1] if len(sys.argv) > 1 else time.strftime("%Y%m%d%H%M%S")
+    path = Path(jwt_settings.KEYS_DIR) / f"{kid}.pem"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    pem = generate_private_key(jwt_settings.ALGORITHM).private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    path.write_bytes(pem)
+    path.chmod(0o600)
+    print(path)
@@ -0,0 +1,48 @@
+"""
+Непрозрачные токены ссылок подписки.
+
+Токен — base64url(users.id + HMAC-SHA256 усечённый до 16 байт): проверяется
+без БД и Redis, не раскрывает telegram_id и не подделывается без ключа.
+"""
+import base64
+import binascii
+import hashlib
+import hmac
+
+from app.core.configs.bot import bot_settings
+from app.core.configs.subscription import subscription_settings
+
+_ID_BYTES = 8
+_MAC_BYTES = 16
+
+
+def _secret() -> bytes:
+    if subscription_settings.SECRET:
+        return subscription_settings.SECRET.encode("utf-8")
+    return hashlib.sha256(b"subscription:" + bot_settings.BOT_TOKEN.encode("utf-8")).digest()
+
+
+_KEY = _secret()
+
+
+def _mac(raw_id: bytes) -> bytes:
+    return hmac.new(_KEY, raw_id, hashlib.sha256).digest()[:_MAC_BYTES]
+
+
+def issue_subscription_token(user_id: int) -> str:
+    raw_id = user_id.to_bytes(_ID_BYTES, "big")
+    return base64.urlsafe_b64encode(raw_id + _mac(raw_id)).rstrip(b"=").decode("ascii")
+
+
+def parse_subscription_token(token: str) -> int | None:
+    """users.id из токена; None — токен битый или подделан."""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (binascii.Error, ValueError):
+        return None
+    if len(raw) != _ID_BYTES + _MAC_BYTES:
+        return None
+    raw_id, mac = raw[:_ID_BYTES], raw[_ID_BYTES:]
+    if not hmac.compare_digest(mac, _mac(raw_id)):
+        return None
+    return int.from_bytes(raw_id, "big")
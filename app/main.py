@@ -1,16 +1,53 @@
 import uvicorn
 
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api import routers
 from app.core.configs import app_settings
+from app.core.configs.webhook import webhook_settings
+from app.core.db.postgres import init_engine, dispose_engine
+from app.core.db.redis import redis_client
+from app.core.security.jwt_keys import key_ring
+from app.services.config_feed import config_feed
+from app.services.node_prober import node_prober
+from app.services.server_registry import server_registry
+from app.services.webhook_queue import webhook_workers
+from app.services.xray_provisioning import provisioning_queue
+from app.utils.tg_bot_api import bot_api
+from app.utils.xray import xray_service
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_engine()
+    key_ring.load()
+    await redis_client.init()
+    await server_registry.start()
+    node_prober.start()
+    config_feed.start()
+    if webhook_settings.QUEUE_ENABLED:
+        webhook_workers.start()
+    try:
+        yield
+    finally:
+        await webhook_workers.stop()
+        await config_feed.stop()
+        await node_prober.stop()
+        await server_registry.stop()
+        await provisioning_queue.stop()
+        await bot_api.close()
+        await xray_service.close()
+        await redis_client.close()
+        await dispose_engine()
 
 
 app = FastAPI(
     title="Fast-Rabbit-VPN-Backend",
     version="0.0.1a",
     debug=app_settings.DEBUG,
+    lifespan=lifespan,
 )
 
 
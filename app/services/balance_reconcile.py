@@ -0,0 +1,128 @@
+"""
+Сверка снапшотов user_balances с wallet_ledger.
+
+Запуск: python -m app.services.balance_reconcile [--dry-run] [--batch-size N]
+"""
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from sqlalchemy import select, func
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.db.postgres import get_session_maker, dispose_engine
+from app.core.models.user_balances import UserBalance
+from app.core.models.users import User
+from app.core.models.wallet_ledger import WalletEntry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Drift:
+    user_id: int
+    snapshot: Decimal | None
+    ledger: Decimal
+
+
+@dataclass
+class ReconcileReport:
+    users_checked: int = 0
+    drifts: list[Drift] = field(default_factory=list)
+
+
+async def reconcile_balances(batch_size: int = 1000, fix: bool = True) -> ReconcileReport:
+    """
+    Пересчитывает балансы из леджера пачками по users.id (keyset) и
+    сравнивает со снапшотом. Расхождения логируются и, если fix=True,
+    перезаписываются значением из леджера.
+
+    Существующие строки снапшота блокируются FOR UPDATE до пересчёта суммы,
+    поэтому параллельные проводки либо уже видны в сумме, либо дождутся
+    коммита сверки и прибавятся поверх. Отсутствующие строки вставляются
+    с ON CONFLICT DO NOTHING — если их параллельно создала проводка,
+    расхождение будет разобрано следующим прогоном.
+    """
+    report = ReconcileReport()
+    last_id = 0
+    session_maker = get_session_maker()
+
+    while True:
+        async with session_maker() as db, db.begin():
+            user_ids = (
+                await db.execute(
+                    select(User.id)
+                    .where(User.id > last_id)
+                    .order_by(User.id)
+                    .limit(batch_size)
+                )
+            ).scalars().all()
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+
+            snapshots = dict((
+                await db.execute(
+                    select(UserBalance.user_id, UserBalance.balance_rub)
+                    .where(UserBalance.user_id.in_(user_ids))
+                    .with_for_update()
+                )
+            ).all())
+            ledger_sums = dict((
+                await db.execute(
+                    select(WalletEntry.user_id, func.sum(WalletEntry.amount_rub))
+                    .where(WalletEntry.user_id.in_(user_ids))
+                    .group_by(WalletEntry.user_id)
+                )
+            ).all())
+
+            for user_id in user_ids:
+                ledger = ledger_sums.get(user_id) or Decimal(0)
+                snapshot = snapshots.get(user_id)
+                if snapshot == ledger or (snapshot is None and ledger == 0):
+                    continue
+                report.drifts.append(Drift(user_id=user_id, snapshot=snapshot, ledger=ledger))
+                logger.warning(
+                    "Расхождение баланса user_id=%s: снапшот=%s, леджер=%s",
+                    user_id, snapshot, ledger,
+                )
+                if not fix:
+                    continue
+                stmt = insert(UserBalance).values(user_id=user_id, balance_rub=ledger)
+                if snapshot is None:
+                    stmt = stmt.on_conflict_do_nothing(index_elements=[UserBalance.user_id])
+                else:
+                    stmt = stmt.on_conflict_do_update(
+                        index_elements=[UserBalance.user_id],
+                        set_={"balance_rub": stmt.excluded.balance_rub, "updated_at": func.now()},
+                    )
+                await db.execute(stmt)
+
+            report.users_checked += len(user_ids)
+
+    logger.info(
+        "Сверка балансов: проверено %s пользователей, расхождений %s",
+        report.users_checked, len(report.drifts),
+    )
+    return report
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description="Reconcile user_balances with wallet_ledger")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dry-run", action="store_true", help="only report drift")
+    args = parser.parse_args()
+    try:
+        report = await reconcile_balances(batch_size=args.batch_size, fix=not args.dry_run)
+    finally:
+        await dispose_engine()
+    for drift in report.drifts:
+        print(f"user_id={drift.user_id} snapshot={drift.snapshot} ledger={drift.ledger}")
+    print(f"checked={report.users_checked} drifted={len(report.drifts)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,221 @@
+"""
+Суточная абонплата за активные VPN-конфиги.
+
+Списание считается в SQL целиком: на каждый активный конфиг — DEBIT
+в wallet_ledger, суммы по пользователям — в user_balances, конфиги
+ушедших в минус — деактивируются. Всё это один statement на пачку
+пользователей (keyset по vpn_configs.user_id), без цикла в Python.
+
+Повторный прогон за тот же день безопасен: уникальный индекс
+(config_id, billing_day) отбрасывает уже списанные конфиги, и баланс
+сдвигается только на реально вставленные проводки. Деактивированные
+конфиги после коммита пачки ставятся на удаление в очередь провижининга
+нод (gRPC); агенты нод, читающие ленту изменений, увидят их и там.
+
+Запуск (cron, раз в сутки): python -m app.services.billing [--day YYYY-MM-DD]
+"""
+import argparse
+import asyncio
+import datetime
+import logging
+from dataclasses import dataclass
+from decimal import Decimal
+
+from sqlalchemy import Date, func, literal, select, update
+from sqlalchemy.dialects.postgresql import JSON, insert
+
+from app.core.cache.profile import profile_cache
+from app.core.cache.subscription import subscription_cache
+from app.core.configs.billing import billing_settings as settings
+from app.core.consts import LedgerType
+from app.core.db.postgres import get_session_maker, dispose_engine
+from app.core.db.redis import redis_client
+from app.core.models.user_balances import UserBalance
+from app.core.models.users import User
+from app.core.models.vpn_configs import VpnConfig
+from app.core.models.wallet_ledger import WalletEntry
+from app.services.server_registry import server_registry
+from app.services.xray_provisioning import provisioning_queue
+from app.utils.xray import xray_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BillingReport:
+    day: datetime.date
+    batches: int = 0
+    configs_charged: int = 0
+    users_charged: int = 0
+    configs_deactivated: int = 0
+
+
+def _charge_statement(day: datetime.date, price: Decimal, after: int, upto: int | None):
+    """
+    WITH charged (DEBIT по конфигам пачки, без уже списанных за день),
+         balances (сдвиг снапшотов, RETURNING нового баланса),
+         deactivated (активные конфиги тех, кто ушёл в минус)
+    SELECT списанных пользователей (id, telegram_id, ушёл ли в минус,
+           деактивированные конфиги [[домен, uuid, email], ...]) и счётчики.
+    """
+    configs = VpnConfig.is_active.is_(True), VpnConfig.user_id > after
+    if upto is not None:
+        configs += (VpnConfig.user_id <= upto,)
+
+    charge = insert(WalletEntry).from_select(
+        ["user_id", "config_id", "entry_type", "amount_rub", "billing_day", "comment", "created_at"],
+        select(
+            VpnConfig.user_id,
+            VpnConfig.id,
+            literal(LedgerType.DEBIT, WalletEntry.entry_type.type),
+            literal(-price, WalletEntry.amount_rub.type),
+            literal(day, Date),
+            literal(f"Абонплата за {day.isoformat()}"),
+            func.now(),
+        ).where(*configs),
+    )
+    charged = (
+        charge.on_conflict_do_nothing(
+            index_elements=[WalletEntry.config_id, WalletEntry.billing_day],
+        )
+        .returning(WalletEntry.user_id, WalletEntry.amount_rub)
+        .cte("charged")
+    )
+
+    shift = insert(UserBalance).from_select(
+        ["user_id", "balance_rub", "updated_at"],
+        select(charged.c.user_id, func.sum(charged.c.amount_rub), func.now())
+        .group_by(charged.c.user_id),
+    )
+    balances = (
+        shift.on_conflict_do_update(
+            index_elements=[UserBalance.user_id],
+            set_={
+                "balance_rub": UserBalance.balance_rub + shift.excluded.balance_rub,
+                "updated_at": func.now(),
+            },
+        )
+        .returning(UserBalance.user_id, UserBalance.balance_rub)
+        .cte("balances")
+    )
+
+    deactivated = (
+        update(VpnConfig)
+        .where(
+            VpnConfig.user_id == balances.c.user_id,
+            balances.c.balance_rub < 0,
+            VpnConfig.is_active.is_(True),
+        )
+        .values(is_active=False, deleted_at=func.now())
+        .returning(VpnConfig.user_id, VpnConfig.vpn_domain, VpnConfig.uuid, VpnConfig.email)
+        .cte("deactivated")
+    )
+    removed = (
+        select(
+            deactivated.c.user_id,
+            func.json_agg(
+                func.json_build_array(deactivated.c.vpn_domain, deactivated.c.uuid, deactivated.c.email),
+                type_=JSON,
+            ).label("configs"),
+        )
+        .group_by(deactivated.c.user_id)
+        .subquery("removed")
+    )
+
+    return (
+        select(
+            User.id,
+            User.telegram_id,
+            (balances.c.balance_rub < 0).label("blocked"),
+            select(func.count()).select_from(charged).scalar_subquery(),
+            select(func.count()).select_from(deactivated).scalar_subquery(),
+            removed.c.configs,
+        )
+        .join(balances, User.id == balances.c.user_id)
+        .outerjoin(removed, removed.c.user_id == User.id)
+    )
+
+
+async def _next_bound(db, after: int, batch_size: int) -> int | None:
+    """user_id, которым заканчивается пачка из ~batch_size активных конфигов."""
+    return (
+        await db.execute(
+            select(VpnConfig.user_id)
+            .where(VpnConfig.is_active.is_(True), VpnConfig.user_id > after)
+            .order_by(VpnConfig.user_id)
+            .offset(batch_size - 1)
+            .limit(1)
+        )
+    ).scalar_one_or_none()
+
+
+async def run_billing(
+    day: datetime.date | None = None,
+    price: Decimal | None = None,
+    batch_size: int | None = None,
+) -> BillingReport:
+    """Списывает абонплату за day (по умолчанию — сегодня по UTC)."""
+    day = day or datetime.datetime.now(datetime.timezone.utc).date()
+    price = Decimal(price if price is not None else settings.DAILY_PRICE_RUB)
+    batch_size = batch_size or settings.BATCH_SIZE
+    report = BillingReport(day=day)
+    session_maker = get_session_maker()
+
+    after = 0
+    while True:
+        async with session_maker() as db, db.begin():
+            upto = await _next_bound(db, after, batch_size)
+            rows = (await db.execute(_charge_statement(day, price, after, upto))).all()
+
+        report.batches += 1
+        if rows:
+            report.users_charged += len(rows)
+            report.configs_charged += rows[0][3]
+            report.configs_deactivated += rows[0][4]
+            # у всех списанных поменялся баланс в профиле,
+            # у ушедших в минус — ещё и набор ссылок в подписке
+            await profile_cache.invalidate_many(row.telegram_id for row in rows)
+            await subscription_cache.invalidate_many(row.id for row in rows if row.blocked)
+            # как DELETE /key/: заблокированные клиенты снимаются с нод
+            for row in rows:
+                for domain, uuid, email in row.configs or ():
+                    if domain:
+                        await provisioning_queue.remove(domain, uuid, email)
+
+        if upto is None:
+            break
+        after = upto
+
+    logger.info(
+        "Биллинг за %s: конфигов %s, пользователей %s, деактивировано %s (пачек %s)",
+        day, report.configs_charged, report.users_charged,
+        report.configs_deactivated, report.batches,
+    )
+    return report
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description="Charge the daily fee for active VPN configs")
+    parser.add_argument("--day", type=datetime.date.fromisoformat, default=None)
+    parser.add_argument("--price", type=Decimal, default=None)
+    parser.add_argument("--batch-size", type=int, default=None)
+    args = parser.parse_args()
+    try:
+        # инбаунды нод для удаления клиентов берутся из реестра
+        await server_registry.refresh()
+        report = await run_billing(day=args.day, price=args.price, batch_size=args.batch_size)
+    finally:
+        # дождаться удаления клиентов с нод до выхода процесса
+        await provisioning_queue.stop()
+        await xray_service.close()
+        await redis_client.close()
+        await dispose_engine()
+    print(
+        f"day={report.day} charged={report.configs_charged} users={report.users_charged} "
+        f"deactivated={report.configs_deactivated} batches={report.batches}"
+    )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,194 @@
+"""
+Лента изменений конфигов для агентов нод.
+
+Ревизии пишет триггер vpn_configs_change_feed (INSERT / деактивация /
+DELETE). Агент ноды спрашивает изменения с последней известной ревизии
+и получает только add/remove; если он отстал больше, чем хранится
+в ленте (или изменений слишком много), — компактный снапшот активных
+пользователей ноды.
+
+Ожидание long-poll не ходит в БД на каждого клиента: один наблюдатель
+на процесс раз в NODE_FEED_POLL_INTERVAL читает головы ленты по нодам
+и будит ждущих.
+"""
+import asyncio
+import logging
+from typing import Any
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.configs.servers import node_feed_settings as settings
+from app.core.consts import ConfigChangeOp
+from app.core.db.postgres import get_session_maker
+from app.core.metrics import register_collector
+from app.core.models.vpn_config_changes import VpnConfigChange
+from app.core.models.vpn_configs import VpnConfig
+
+logger = logging.getLogger(__name__)
+
+
+async def get_node_snapshot(db: AsyncSession, node: str) -> dict[str, Any]:
+    # голову читаем до снапшота: изменение между запросами придёт ещё раз
+    # следующим диффом, а add/remove на ноде идемпотентны
+    revision = (await db.execute(select(func.coalesce(func.max(VpnConfigChange.revision), 0)))).scalar_one()
+    rows = await db.execute(
+        select(VpnConfig.uuid, func.coalesce(VpnConfig.email, VpnConfig.uuid), VpnConfig.flow)
+        .where(VpnConfig.vpn_domain == node, VpnConfig.is_active.is_(True))
+        .order_by(VpnConfig.id)
+    )
+    return {
+        "node": node,
+        "mode": "snapshot",
+        "revision": revision,
+        "users": [list(row) for row in rows.all()],
+    }
+
+
+async def get_node_changes(db: AsyncSession, node: str, since: int) -> dict[str, Any]:
+    """
+    Дифф с ревизии since: add — [uuid, email, flow], remove — email.
+    Несколько изменений одного клиента сворачиваются в итоговое.
+    """
+    if since <= 0:
+        return await get_node_snapshot(db, node)
+
+    floor = (await db.execute(select(func.min(VpnConfigChange.revision)))).scalar_one()
+    if floor is not None and since < floor - 1:
+        # нужные ревизии уже вычищены
+        return await get_node_snapshot(db, node)
+
+    rows = (await db.execute(
+        select(
+            VpnConfigChange.revision, VpnConfigChange.op,
+            VpnConfigChange.uuid, VpnConfigChange.email, VpnConfigChange.flow,
+        )
+        .where(VpnConfigChange.node == node, VpnConfigChange.revision > since)
+        .order_by(VpnConfigChange.revision)
+        .limit(settings.MAX_CHANGES + 1)
+    )).all()
+    if len(rows) > settings.MAX_CHANGES:
+        return await get_node_snapshot(db, node)
+
+    # email -> (первая операция в окне, последняя строка)
+    net: dict[str, tuple[ConfigChangeOp, Any]] = {}
+    for row in rows:
+        first = net[row.email][0] if row.email in net else row.op
+        net[row.email] = (first, row)
+
+    add, remove = [], []
+    for email, (first, last) in net.items():
+        if last.op == ConfigChangeOp.ADD:
+            if first == ConfigChangeOp.REMOVE:
+                # клиент пересоздан (например, с новым uuid)
+                remove.append(email)
+            add.append([last.uuid, email, last.flow])
+        elif first == ConfigChangeOp.REMOVE:
+            # add -> remove внутри окна до ноды не доходил
+            remove.append(email)
+
+    return {
+        "node": node,
+        "mode": "diff",
+        "revision": rows[-1].revision if rows else since,
+        "add": add,
+        "remove": remove,
+    }
+
+
+class ChangeFeedWatcher:
+    def __init__(self):
+        self.heads: dict[str, int] = {}
+        self._last = 0
+        self._changed: asyncio.Condition | None = None
+        self._tasks: list[asyncio.Task] = []
+
+        self.polls = 0
+        self.waiters = 0
+        self.pruned = 0
+
+    def start(self) -> None:
+        self._changed = asyncio.Condition()
+        self._tasks = [
+            asyncio.create_task(self._watch(), name="config-feed-watch"),
+            asyncio.create_task(self._prune(), name="config-feed-prune"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _poll(self) -> None:
+        async with get_session_maker()() as db:
+            rows = (await db.execute(
+                select(VpnConfigChange.node, func.max(VpnConfigChange.revision))
+                .where(VpnConfigChange.revision > self._last)
+                .group_by(VpnConfigChange.node)
+            )).all()
+        self.polls += 1
+        if not rows:
+            return
+        for node, revision in rows:
+            self.heads[node] = revision
+            self._last = max(self._last, revision)
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await self._poll()
+            except Exception:
+                logger.exception("Лента конфигов: не удалось прочитать голову")
+            await asyncio.sleep(settings.POLL_INTERVAL)
+
+    async def _prune(self) -> None:
+        while True:
+            try:
+                async with get_session_maker()() as db, db.begin():
+                    # самую свежую строку не трогаем — по ней видна голова ленты
+                    newest = select(func.max(VpnConfigChange.revision)).scalar_subquery()
+                    cutoff = func.now() - func.make_interval(0, 0, 0, 0, settings.RETENTION_HOURS)
+                    result = await db.execute(
+                        delete(VpnConfigChange)
+                        .where(
+                            VpnConfigChange.revision < newest,
+                            VpnConfigChange.created_at < cutoff,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+                    self.pruned += result.rowcount
+            except Exception:
+                logger.exception("Лента конфигов: ошибка очистки")
+            await asyncio.sleep(3600)
+
+    async def wait(self, node: str, since: int, timeout: float) -> bool:
+        """Дождаться ревизии ноды больше since. False — вышел таймаут."""
+        if self._changed is None:
+            return True  # наблюдатель не запущен — сразу читаем БД
+        self.waiters += 1
+        try:
+            async with self._changed:
+                return await asyncio.wait_for(
+                    self._changed.wait_for(lambda: self.heads.get(node, 0) > since),
+                    timeout,
+                )
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiters -= 1
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "head": self._last,
+            "nodes": len(self.heads),
+            "polls": self.polls,
+            "waiters": self.waiters,
+            "pruned": self.pruned,
+        }
+
+
+config_feed = ChangeFeedWatcher()
+register_collector("config_feed", config_feed.stats)
@@ -0,0 +1,175 @@
+"""
+Клиентские ссылки (vless / vmess / trojan), тело подписки и QR-коды.
+
+Всё, что зависит только от ноды — адрес, порт, Reality-параметры
+(pbk / sid / sni), fingerprint, — собирается в шаблон один раз на версию
+снапшота реестра нод. На ключ остаётся подставить uuid и подпись
+(для vless ещё flow). Параметры ноды берутся из таблицы servers,
+пустые — из общих VPNSettings. Там же — тег инбаунда ноды, в который
+очередь провижининга добавляет клиентов с этими ссылками.
+"""
+import base64
+import hashlib
+import io
+import json
+import logging
+import string
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable
+from urllib.parse import quote, urlencode
+
+from app.core.configs.vpn_config import vpn_settings
+from app.core.configs.xray import xray_settings
+from app.core.models.vpn_configs import VpnConfig
+from app.services.server_registry import ServerInfo, server_registry
+
+logger = logging.getLogger(__name__)
+
+PROTOCOLS = ("vless", "vmess", "trojan")
+DEFAULT_LABEL = "vpn-user"
+_LABEL_SAFE = "@-._~"
+_LABEL_SAFE_CHARS = frozenset(string.ascii_letters + string.digits + _LABEL_SAFE)
+
+
+def _label(label: str) -> str:
+    # обычные подписи (email конфига) экранировать не нужно — quote дороже проверки
+    return label if _LABEL_SAFE_CHARS.issuperset(label) else quote(label, safe=_LABEL_SAFE)
+
+
+def _json_str(value: str) -> str:
+    # uuid и обычные подписи в JSON экранировать не нужно — dumps дороже проверки
+    return f'"{value}"' if _LABEL_SAFE_CHARS.issuperset(value) else json.dumps(value, ensure_ascii=False)
+
+
+@dataclass(frozen=True, slots=True)
+class NodeTemplate:
+    protocol: str
+    # vless / trojan: всё между uuid и flow / подписью;
+    # vmess: куски JSON до подписи и после uuid
+    head: str
+    tail: str
+    flow: str = ""
+    # инбаунд Xray на ноде, куда добавляются клиенты с такими ссылками
+    inbound_tag: str = ""
+
+    def render(self, uuid: str, label: str, flow: str | None = None) -> str:
+        if self.protocol == "vless":
+            return f"vless://{uuid}{self.head}{flow or self.flow}{self.tail}{_label(label)}"
+        if self.protocol == "trojan":
+            return f"trojan://{uuid}{self.head}{_label(label)}"
+        payload = f'{self.head}{_json_str(label)},"id":{_json_str(uuid)}{self.tail}'
+        return "vmess://" + base64.b64encode(payload.encode("utf-8")).decode("ascii")
+
+
+def build_template(domain: str, server: ServerInfo | None = None) -> NodeTemplate:
+    protocol = server.protocol if server is not None else "vless"
+    if protocol not in PROTOCOLS:
+        logger.warning("Нода %s: неизвестный протокол %r, ссылки будут vless", domain, protocol)
+        protocol = "vless"
+    port = server.port if server is not None else vpn_settings.LINK_PORT
+    sni = (server and server.reality_sni) or vpn_settings.SNI
+    pbk = (server and server.reality_pbk) or vpn_settings.PBK
+    sid = (server and server.reality_sid) or vpn_settings.SID
+    tag = (server and server.inbound_tag) or xray_settings.INBOUND_TAG
+
+    if protocol == "vmess":
+        # Reality у vmess нет — обычный TLS с SNI ноды
+        rest = json.dumps({
+            "add": domain, "port": str(port), "aid": "0", "scy": "auto",
+            "net": "tcp", "type": "none", "tls": "tls", "sni": sni, "fp": vpn_settings.LINK_FP,
+        }, separators=(",", ":"), ensure_ascii=False)
+        return NodeTemplate(protocol, head='{"v":"2","ps":', tail="," + rest[1:], inbound_tag=tag)
+
+    query = urlencode({
+        "type": "tcp",
+        "security": "reality",
+        "fp": vpn_settings.LINK_FP,
+        "sni": sni,
+        "pbk": pbk,
+        "sid": sid,
+        "spx": vpn_settings.LINK_SPX,
+    }, safe="/", quote_via=quote)
+    if protocol == "vless":
+        return NodeTemplate(
+            protocol, head=f"@{domain}:{port}?flow=", tail=f"&{query}#", flow=vpn_settings.FLOW, inbound_tag=tag,
+        )
+    return NodeTemplate(protocol, head=f"@{domain}:{port}?{query}#", tail="", inbound_tag=tag)
+
+
+def links_fingerprint(servers: Iterable[ServerInfo]) -> str:
+    """
+    Хеш всего, из чего собираются ссылки: параметры нод и общие VPNSettings.
+    Одинаков во всех процессах и не меняется от перечитывания реестра
+    без правок (в отличие от snapshot.version).
+    """
+    parts = [
+        vpn_settings.DOMAIN, vpn_settings.FLOW, vpn_settings.SNI, vpn_settings.PBK,
+        vpn_settings.SID, vpn_settings.LINK_PORT, vpn_settings.LINK_FP, vpn_settings.LINK_SPX,
+    ]
+    for s in sorted(servers, key=lambda s: s.domain):
+        parts += [s.domain, s.protocol, s.port, s.reality_pbk, s.reality_sid, s.reality_sni]
+    return hashlib.sha256(repr(parts).encode("utf-8")).hexdigest()[:12]
+
+
+class LinkRenderer:
+    """Шаблоны по домену ноды; сбрасываются при новой версии снапшота реестра."""
+
+    def __init__(self):
+        self._version = -1
+        self._templates: dict[str, NodeTemplate] = {}
+        self._fingerprint = ""
+
+    def _sync(self) -> None:
+        snapshot = server_registry.snapshot
+        if snapshot.version != self._version:
+            self._templates = {}
+            self._fingerprint = links_fingerprint(snapshot.servers)
+            self._version = snapshot.version
+
+    @property
+    def fingerprint(self) -> str:
+        """Меняется, когда у тех же конфигов поменялись бы ссылки."""
+        self._sync()
+        return self._fingerprint
+
+    def template(self, domain: str) -> NodeTemplate:
+        self._sync()
+        snapshot = server_registry.snapshot
+        template = self._templates.get(domain)
+        if template is None:
+            template = self._templates[domain] = build_template(domain, snapshot.by_domain.get(domain))
+        return template
+
+    def render(self, cfg: VpnConfig) -> str:
+        template = self.template(cfg.vpn_domain or vpn_settings.DOMAIN)
+        return template.render(cfg.uuid, cfg.email or DEFAULT_LABEL, cfg.flow)
+
+    def render_many(self, configs: Iterable[VpnConfig]) -> list[str]:
+        links = []
+        templates: dict[str | None, NodeTemplate] = {}
+        for cfg in configs:
+            domain = cfg.vpn_domain
+            template = templates.get(domain)
+            if template is None:
+                template = templates[domain] = self.template(domain or vpn_settings.DOMAIN)
+            links.append(template.render(cfg.uuid, cfg.email or DEFAULT_LABEL, cfg.flow))
+        return links
+
+
+link_renderer = LinkRenderer()
+
+
+def render_subscription(links: Iterable[str]) -> str:
+    """Тело подписки: ссылки по одной на строку, целиком в base64."""
+    return base64.b64encode("\n".join(links).encode("utf-8")).decode("ascii")
+
+
+@lru_cache(maxsize=4096)
+def render_qr_svg(data: str) -> bytes:
+    """SVG с QR-кодом; одинаковые ссылки не перерисовываются."""
+    import segno  # нужен только для QR
+
+    buffer = io.BytesIO()
+    segno.make(data, error="m").save(buffer, kind="svg", scale=4, border=2)
+    return buffer.getvalue()
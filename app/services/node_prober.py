@@ -0,0 +1,203 @@
+"""
+Фоновая проверка доступности и задержки VPN-нод.
+
+Раз в SERVERS_PROBE_INTERVAL все включённые ноды из реестра проверяются
+параллельно: время TCP connect и TLS handshake до :443. Сэмплы копятся
+в кольцевом буфере на ноду, задержка сглаживается EWMA. Ответы API читают
+только уже посчитанное состояние и никогда не ждут пробу.
+"""
+import asyncio
+import logging
+import random
+import ssl
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Collection
+
+from app.core.configs.servers import server_settings as settings
+from app.core.metrics import register_collector
+from app.services.server_registry import ServerInfo, server_registry
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ProbeSample:
+    at: float
+    ok: bool
+    tcp_ms: float | None = None
+    tls_ms: float | None = None
+    error: str | None = None
+
+
+class NodeHealth:
+    def __init__(self, samples: int):
+        self.samples: deque[ProbeSample] = deque(maxlen=samples)
+        self.ewma_ms: float | None = None
+        self.consecutive_failures = 0
+
+    def record(self, sample: ProbeSample, alpha: float) -> None:
+        self.samples.append(sample)
+        if sample.ok:
+            self.consecutive_failures = 0
+            total = sample.tcp_ms + sample.tls_ms
+            self.ewma_ms = total if self.ewma_ms is None else alpha * total + (1 - alpha) * self.ewma_ms
+        else:
+            self.consecutive_failures += 1
+
+    @property
+    def availability(self) -> float | None:
+        if not self.samples:
+            return None
+        return sum(1 for s in self.samples if s.ok) / len(self.samples)
+
+    @property
+    def alive(self) -> bool:
+        return self.consecutive_failures < settings.PROBE_DEAD_AFTER
+
+    def to_dict(self) -> dict[str, Any]:
+        last = self.samples[-1] if self.samples else None
+        return {
+            "alive": self.alive,
+            "latency_ms": round(self.ewma_ms, 1) if self.ewma_ms is not None else None,
+            "availability": round(self.availability, 3) if self.availability is not None else None,
+            "samples": len(self.samples),
+            "last_error": last.error if last is not None else None,
+        }
+
+
+def _ssl_context() -> ssl.SSLContext:
+    # Проверяем, что нода отвечает на handshake, а не её сертификат:
+    # Reality отдаёт сертификат маскировочного домена
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+class NodeProber:
+    def __init__(self):
+        self.health: dict[str, NodeHealth] = {}
+        self._ssl = _ssl_context()
+        self._task: asyncio.Task | None = None
+
+        self.rounds = 0
+        self.round_ms = 0.0
+
+    async def probe(self, host: str, port: int | None = None) -> ProbeSample:
+        started = time.perf_counter()
+        writer = None
+        try:
+            async with asyncio.timeout(settings.PROBE_TIMEOUT):
+                _, writer = await asyncio.open_connection(host, port or settings.PROBE_PORT)
+                connected = time.perf_counter()
+                await writer.start_tls(self._ssl, server_hostname=settings.PROBE_SNI or host)
+                done = time.perf_counter()
+        except (OSError, TimeoutError, ssl.SSLError) as e:
+            return ProbeSample(time.time(), False, error=f"{type(e).__name__}: {e}"[:200])
+        finally:
+            if writer is not None:
+                writer.close()
+                try:
+                    await asyncio.wait_for(writer.wait_closed(), settings.PROBE_TIMEOUT)
+                except (OSError, TimeoutError, ssl.SSLError):
+                    pass
+        return ProbeSample(
+            time.time(), True,
+            tcp_ms=(connected - started) * 1000,
+            tls_ms=(done - connected) * 1000,
+        )
+
+    async def probe_all(self) -> None:
+        servers = server_registry.snapshot.enabled()
+        # порт ноды из servers.port (у нескольких записей одного домена — первый)
+        ports: dict[str, int] = {}
+        for server in servers:
+            ports.setdefault(server.domain, server.port)
+        domains = set(ports)
+        semaphore = asyncio.Semaphore(settings.PROBE_CONCURRENCY)
+
+        async def run(domain: str) -> None:
+            async with semaphore:
+                sample = await self.probe(domain, ports[domain])
+            health = self.health.get(domain)
+            if health is None:
+                health = self.health[domain] = NodeHealth(settings.PROBE_SAMPLES)
+            was_alive = health.alive
+            health.record(sample, settings.PROBE_EWMA_ALPHA)
+            if was_alive != health.alive:
+                logger.warning("Нода %s: %s", domain, "снова доступна" if health.alive else f"недоступна ({sample.error})")
+
+        started = time.perf_counter()
+        await asyncio.gather(*(run(domain) for domain in domains))
+        # ноды, удалённые из реестра, больше не показываем
+        for domain in set(self.health) - domains:
+            del self.health[domain]
+        self.rounds += 1
+        self.round_ms = (time.perf_counter() - started) * 1000
+
+    async def _loop(self) -> None:
+        while True:
+            try:
+                await self.probe_all()
+            except Exception:
+                logger.exception("Проверка нод: ошибка раунда")
+            await asyncio.sleep(settings.PROBE_INTERVAL)
+
+    def start(self) -> None:
+        if settings.PROBE_ENABLED:
+            self._task = asyncio.create_task(self._loop(), name="node-prober")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def status(self, domain: str) -> NodeHealth | None:
+        return self.health.get(domain)
+
+    def is_alive(self, domain: str) -> bool:
+        """Ещё не проверенная нода считается живой."""
+        health = self.health.get(domain)
+        return health is None or health.alive
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "rounds": self.rounds,
+            "round_ms": round(self.round_ms, 1),
+            "nodes": {domain: health.to_dict() for domain, health in self.health.items()},
+        }
+
+
+node_prober = NodeProber()
+register_collector("node_prober", node_prober.stats)
+
+
+def available_servers(country: str | None = None) -> list[ServerInfo]:
+    """Включённые и живые ноды (опционально — одной страны)."""
+    snapshot = server_registry.snapshot
+    servers = snapshot.by_country.get(country, ()) if country else snapshot.servers
+    return [s for s in servers if s.enabled and node_prober.is_alive(s.domain)]
+
+
+def pick_server(country: str, exclude: Collection[str] = ()) -> ServerInfo | None:
+    """
+    Нода страны для нового ключа: случайный выбор по весу,
+    вес делится на сглаженную задержку — быстрые ноды чаще.
+    Нода с weight=0 выведена из выдачи (дренаж); exclude — домены,
+    которые уже отказали (например, заполнены по capacity).
+    """
+    candidates = [
+        s for s in available_servers(country)
+        if s.weight > 0 and s.domain not in exclude
+    ]
+    if not candidates:
+        return None
+    weights = []
+    for server in candidates:
+        health = node_prober.status(server.domain)
+        latency = health.ewma_ms if health is not None and health.ewma_ms else 100.0
+        weights.append(server.weight / max(latency, 1.0))
+    return random.choices(candidates, weights=weights)[0]
@@ -0,0 +1,206 @@
+"""
+Реестр VPN-нод в памяти процесса.
+
+Таблица servers маленькая и меняется редко, поэтому её целиком держим
+неизменяемым снапшотом с индексами по id, домену и стране. Снапшот заменяется
+одной ссылкой: читатели никогда не видят его наполовину обновлённым
+и не ходят в БД. Перечитывается по таймеру и по сообщению в канал Redis
+(notify_servers_changed).
+
+Правка ноды с уведомлением всех процессов:
+    python -m app.services.server_registry de1.example.com --disable --weight 0
+Без параметров правки — только уведомление (после ручного SQL).
+"""
+import argparse
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Mapping
+
+from sqlalchemy import select, update
+
+from app.core.configs.servers import server_settings as settings
+from app.core.db.postgres import dispose_engine, get_session_maker
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+from app.core.models.servers import Server
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class ServerInfo:
+    id: int
+    country: str
+    domain: str
+    capacity: int
+    enabled: bool
+    weight: int
+    protocol: str = "vless"
+    port: int = 443
+    reality_pbk: str | None = None
+    reality_sid: str | None = None
+    reality_sni: str | None = None
+    inbound_tag: str | None = None
+
+
+@dataclass(frozen=True)
+class ServerSnapshot:
+    servers: tuple[ServerInfo, ...] = ()
+    version: int = 0
+    by_id: Mapping[int, ServerInfo] = field(default_factory=lambda: MappingProxyType({}))
+    by_domain: Mapping[str, ServerInfo] = field(default_factory=lambda: MappingProxyType({}))
+    by_country: Mapping[str, tuple[ServerInfo, ...]] = field(default_factory=lambda: MappingProxyType({}))
+
+    @classmethod
+    def build(cls, servers: list[ServerInfo], version: int) -> "ServerSnapshot":
+        by_country: dict[str, list[ServerInfo]] = {}
+        for server in servers:
+            by_country.setdefault(server.country, []).append(server)
+        return cls(
+            servers=tuple(servers),
+            version=version,
+            by_id=MappingProxyType({s.id: s for s in servers}),
+            by_domain=MappingProxyType({s.domain: s for s in servers}),
+            by_country=MappingProxyType({c: tuple(items) for c, items in by_country.items()}),
+        )
+
+    def enabled(self) -> tuple[ServerInfo, ...]:
+        return tuple(s for s in self.servers if s.enabled)
+
+
+class ServerRegistry:
+    def __init__(self):
+        self.snapshot = ServerSnapshot()
+        self._tasks: list[asyncio.Task] = []
+        self._wakeup: asyncio.Event | None = None
+
+        self.refreshes = 0
+        self.errors = 0
+
+    async def refresh(self) -> ServerSnapshot:
+        async with get_session_maker()() as db:
+            rows = (await db.execute(
+                select(
+                    Server.id, Server.country, Server.domain,
+                    Server.capacity, Server.enabled, Server.weight,
+                    Server.protocol, Server.port,
+                    Server.reality_pbk, Server.reality_sid, Server.reality_sni,
+                    Server.inbound_tag,
+                ).order_by(Server.id)
+            )).all()
+        servers = [ServerInfo(*row) for row in rows]
+        self.snapshot = ServerSnapshot.build(servers, self.snapshot.version + 1)
+        self.refreshes += 1
+        return self.snapshot
+
+    async def start(self) -> None:
+        self._wakeup = asyncio.Event()
+        try:
+            await self.refresh()
+        except Exception:
+            self.errors += 1
+            logger.exception("Реестр нод: не удалось загрузить снапшот, повторим в фоне")
+        self._tasks = [
+            asyncio.create_task(self._refresher(), name="servers-refresh"),
+            asyncio.create_task(self._listener(), name="servers-listen"),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _refresher(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.REFRESH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.refresh()
+            except Exception:
+                self.errors += 1
+                logger.exception("Реестр нод: ошибка обновления снапшота")
+
+    async def _listener(self) -> None:
+        while True:
+            try:
+                client = await redis_client.get_client()
+                async with client.pubsub() as pubsub:
+                    await pubsub.subscribe(settings.NOTIFY_CHANNEL)
+                    async for message in pubsub.listen():
+                        if message.get("type") == "message":
+                            self._wakeup.set()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.warning("Реестр нод: подписка на %s оборвалась", settings.NOTIFY_CHANNEL, exc_info=True)
+                await asyncio.sleep(5)
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "version": self.snapshot.version,
+            "servers": len(self.snapshot.servers),
+            "enabled": sum(1 for s in self.snapshot.servers if s.enabled),
+            "refreshes": self.refreshes,
+            "errors": self.errors,
+        }
+
+
+server_registry = ServerRegistry()
+register_collector("servers", server_registry.stats)
+
+
+async def notify_servers_changed() -> None:
+    """Попросить все процессы перечитать реестр (после правки таблицы servers)."""
+    client = await redis_client.get_client()
+    await client.publish(settings.NOTIFY_CHANNEL, "1")
+
+
+async def update_server(domain: str, **values: Any) -> bool:
+    """Правит ноду и рассылает уведомление; False — такой ноды нет."""
+    if values:
+        async with get_session_maker()() as db, db.begin():
+            result = await db.execute(update(Server).where(Server.domain == domain).values(**values))
+        if not result.rowcount:
+            return False
+    await notify_servers_changed()
+    return True
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description="Update a VPN node and notify all processes")
+    parser.add_argument("domain", nargs="?", help="node domain; omit to only send the notification")
+    state = parser.add_mutually_exclusive_group()
+    state.add_argument("--enable", dest="enabled", action="store_true", default=None)
+    state.add_argument("--disable", dest="enabled", action="store_false")
+    parser.add_argument("--weight", type=int, default=None)
+    parser.add_argument("--capacity", type=int, default=None)
+    parser.add_argument("--inbound-tag", default=None)
+    args = parser.parse_args()
+    values = {
+        name: value
+        for name in ("enabled", "weight", "capacity", "inbound_tag")
+        if (value := getattr(args, name)) is not None
+    }
+    if values and not args.domain:
+        parser.error("domain is required to change a node")
+    try:
+        if args.domain:
+            found = await update_server(args.domain, **values)
+        else:
+            await notify_servers_changed()
+            found = True
+    finally:
+        await redis_client.close()
+        await dispose_engine()
+    print(f"{args.domain or '*'}: {'notified' if found else 'not found'}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
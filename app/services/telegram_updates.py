@@ -0,0 +1,156 @@
+"""Обработка апдейтов Telegram: pre_checkout_query и successful_payment."""
+from decimal import Decimal
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import select, exists
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache.profile import profile_cache
+from app.core.consts import LedgerType, PaymentStatus
+from app.core.models.payments import Payment
+from app.core.models.users import User
+from app.core.models.wallet_ledger import WalletEntry
+from app.core.repositories.wallet import add_ledger_entry
+from app.utils.tg_bot_api import tg_answer_pre_checkout_query
+
+
+def _utcnow() -> datetime:
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+async def _credit_if_absent(
+    db: AsyncSession,
+    *,
+    user_id: int,
+    payment_id: int,
+    amount_rub: Decimal,
+    comment: str | None = None,
+) -> bool:
+    """
+    Создаёт строку в кошельке, если её ещё нет для этого платежа (идемпотентно).
+    Снапшот user_balances сдвигается в той же транзакции.
+    Возвращает True, если проводка создана.
+    """
+    already = (await db.execute(
+        select(exists().where(WalletEntry.payment_id == payment_id))
+    )).scalar()
+    if already:
+        return False
+    await add_ledger_entry(
+        db,
+        user_id=user_id,
+        payment_id=payment_id,
+        entry_type=LedgerType.TOPUP,   # твой enum
+        amount_rub=Decimal(amount_rub),  # >0
+        comment=comment,
+    )
+    return True
+
+
+async def _settle_successful_payment(db: AsyncSession, msg: dict) -> int | None:
+    """
+    Фиксирует successful_payment: платёж → PAID и проводка в кошельке.
+    Возвращает telegram_id, если баланс пользователя изменился.
+    """
+    sp = msg.get("successful_payment") or {}
+    payload = sp.get("invoice_payload")
+    telegram_id = (msg.get("from") or {}).get("id")  # ← telegram_id пользователя
+    charge_id = sp.get("telegram_payment_charge_id")
+    total_stars = sp.get("total_amount")            # Stars (XTR), int
+
+    # базовая валидация входа
+    if not payload or telegram_id is None or total_stars is None:
+        return None  # игнорируем кривые апдейты без 500
+
+    # транзакция: фиксируем платёж и создаём запись в кошельке
+    async with db.begin():
+        # Находим пользователя по telegram_id (BIGINT)
+        user = (await db.execute(
+            select(User).where(User.telegram_id == int(telegram_id))
+        )).scalar_one_or_none()
+        if not user:
+            # если такого юзера нет — безопасно выходим
+            return None
+
+        # Лочим платёж по payload (FOR UPDATE), убеждаемся, что он принадлежит этому юзеру
+        payment = (await db.execute(
+            select(Payment).where(Payment.payload == payload).with_for_update()
+        )).scalar_one_or_none()
+        if payment is None:
+            return None
+        if payment.user_id != user.id:
+            # чужой payload — не трогаем
+            return None
+
+        # Идемпотентность: повторные апдейты
+        if payment.status == PaymentStatus.PAID:
+            credited = await _credit_if_absent(
+                db,
+                user_id=user.id,
+                payment_id=payment.id,
+                amount_rub=payment.rub_amount,
+                comment="Top-up via Stars (idemp)",
+            )
+            return user.telegram_id if credited else None
+        if payment.status != PaymentStatus.PENDING:
+            # FAILED/CANCELED — ничего не делаем
+            return None
+
+        # Доп.проверка суммы в звёздах (учти, что на создании мог быть ceil)
+        if isinstance(payment.stars_amount, int) and total_stars < payment.stars_amount:
+            payment.status = PaymentStatus.FAILED
+            payment.failed_reason = f"Stars mismatch: expected {payment.stars_amount}, got {total_stars}"
+            payment.telegram_charge_id = charge_id
+            payment.paid_at = None
+            payment.canceled_at = None
+            return None
+
+        # Обновляем платёж → PAID
+        payment.status = PaymentStatus.PAID
+        payment.telegram_charge_id = charge_id
+        payment.paid_at = _utcnow()
+        payment.failed_reason = None
+        payment.canceled_at = None
+
+        # Начисляем в кошелёк (рубли берём из payment.rub_amount, НЕ пересчитываем)
+        credited = await _credit_if_absent(
+            db,
+            user_id=user.id,
+            payment_id=payment.id,
+            amount_rub=payment.rub_amount,
+            comment=f"Top-up via Stars #{payment.id}",
+        )
+
+    # commit произошёл по выходу из with
+    return user.telegram_id if credited else None
+
+
+async def process_update(db: AsyncSession, update: dict[str, Any]) -> None:
+    """
+    Обрабатывает один апдейт. Идемпотентна: повторная доставка того же
+    апдейта не создаёт вторую проводку.
+    """
+    # 1) pre_checkout_query — подтверждаем только PENDING-инвойсы
+    pcq = update.get("pre_checkout_query")
+    if pcq:
+        qid = pcq["id"]
+        payload = pcq.get("invoice_payload")
+        ok = False
+        if payload:
+            status_ = (await db.execute(
+                select(Payment.status).where(Payment.payload == payload)
+            )).scalar_one_or_none()
+            ok = status_ == PaymentStatus.PENDING
+        await tg_answer_pre_checkout_query(qid, ok=ok, error_message=None if ok else "Invoice is not available")
+        return
+
+    # 2) успешная оплата
+    msg = update.get("message") or {}
+    if msg.get("successful_payment"):
+        credited_telegram_id = await _settle_successful_payment(db, msg)
+        if credited_telegram_id is not None:
+            # профиль в кеше устарел — сбрасываем уже после коммита
+            await profile_cache.invalidate(credited_telegram_id)
+
+    # Остальные апдейты игнорим
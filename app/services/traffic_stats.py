@@ -0,0 +1,211 @@
+"""
+Сбор трафика с нод Xray в почасовые бакеты traffic_usage_hourly.
+
+Раз в XRAY_STATS_INTERVAL с каждой ноды одним QueryStats("user>>>", reset)
+забираются все пользовательские счётчики. Они суммируются по email
+в словаре, COPY-ятся во временную таблицу, и одним INSERT ... SELECT
+сопоставляются с vpn_configs (email или uuid конфига ноды) и добавляются
+к бакету текущего часа. Ни ORM-объектов, ни запроса на строку.
+
+Счётчики на ноде уже сброшены, поэтому то, что не удалось записать,
+остаётся в памяти и уходит со следующим циклом. Разбор ответа и суммирование
+(сотни тысяч счётчиков на ноду) идут в потоке, не в цикле событий.
+
+Сборщик — отдельный процесс, один на всю установку (в каждом воркере API
+он снимал бы одни и те же счётчики наперегонки):
+
+    python -m app.services.traffic_stats          # цикл раз в XRAY_STATS_INTERVAL
+    python -m app.services.traffic_stats --once   # один проход, для cron
+"""
+import argparse
+import asyncio
+import logging
+import time
+from typing import Any, Iterable
+
+from sqlalchemy import column, func, select, table
+from sqlalchemy.dialects.postgresql import insert
+
+from app.core.configs.xray import xray_settings as settings
+from app.core.db.postgres import dispose_engine, get_session_maker
+from app.core.models.traffic_usage import TrafficUsageHourly
+from app.core.models.vpn_configs import VpnConfig
+from app.services.server_registry import server_registry
+from app.utils import xray_proto
+from app.utils.xray import xray_service
+
+logger = logging.getLogger(__name__)
+
+_STAGE = "traffic_stage"
+_stage = table(_STAGE, column("email"), column("uplink"), column("downlink"))
+
+
+def aggregate(stats: Iterable[tuple[str, int]], into: dict[str, list[int]] | None = None) -> dict[str, list[int]]:
+    """
+    "user>>>{email}>>>traffic>>>uplink|downlink" -> {email: [uplink, downlink]}.
+    Нулевые и чужие счётчики пропускаются.
+    """
+    usage = into if into is not None else {}
+    for name, value in stats:
+        if not value:
+            continue
+        parts = name.split(">>>")
+        if len(parts) != 4 or parts[0] != "user" or parts[2] != "traffic":
+            continue
+        direction = 0 if parts[3] == "uplink" else 1 if parts[3] == "downlink" else None
+        if direction is None:
+            continue
+        counters = usage.get(parts[1])
+        if counters is None:
+            counters = usage[parts[1]] = [0, 0]
+        counters[direction] += value
+    return usage
+
+
+def summarize(data: bytes, into: dict[str, list[int]] | None = None) -> tuple[dict[str, list[int]], int]:
+    """Разбор ответа QueryStats и aggregate; (трафик по email, число счётчиков)."""
+    stats = xray_proto.parse_query_stats(data)
+    return aggregate(stats, into=into), len(stats)
+
+
+def _upsert_from_stage(node: str):
+    bucket = func.date_trunc("hour", func.now())
+    source = (
+        select(
+            VpnConfig.id,
+            bucket,
+            func.sum(_stage.c.uplink),
+            func.sum(_stage.c.downlink),
+        )
+        .join(_stage, func.coalesce(VpnConfig.email, VpnConfig.uuid) == _stage.c.email)
+        .where(VpnConfig.vpn_domain == node)
+        .group_by(VpnConfig.id)
+    )
+    stmt = insert(TrafficUsageHourly).from_select(
+        ["config_id", "bucket", "uplink", "downlink"], source,
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[TrafficUsageHourly.config_id, TrafficUsageHourly.bucket],
+        set_={
+            "uplink": TrafficUsageHourly.uplink + stmt.excluded.uplink,
+            "downlink": TrafficUsageHourly.downlink + stmt.excluded.downlink,
+        },
+    )
+
+
+async def write_usage(node: str, usage: dict[str, list[int]]) -> int:
+    """Записывает трафик ноды; возвращает число затронутых конфигов."""
+    async with get_session_maker()() as db, db.begin():
+        conn = await db.connection()
+        await conn.exec_driver_sql(
+            f"CREATE TEMP TABLE {_STAGE} (email text, uplink bigint, downlink bigint) ON COMMIT DROP"
+        )
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            _STAGE,
+            records=[(email, up, down) for email, (up, down) in usage.items()],
+            columns=["email", "uplink", "downlink"],
+        )
+        # временные таблицы autovacuum не анализирует — без статистики план хуже
+        await conn.exec_driver_sql(f"ANALYZE {_STAGE}")
+        result = await conn.execute(_upsert_from_stage(node))
+        return result.rowcount
+
+
+class TrafficCollector:
+    def __init__(self):
+        # нода -> трафик, снятый с ноды, но ещё не записанный в БД
+        self._unsaved: dict[str, dict[str, list[int]]] = {}
+
+        self.cycles = 0
+        self.counters = 0
+        self.configs = 0
+        self.errors = 0
+        self.last = {}
+
+    async def collect_node(self, node: str) -> None:
+        started = time.perf_counter()
+        try:
+            data = await xray_service.query_stats_raw(node, settings.STATS_PATTERN, reset=True)
+        except Exception as e:
+            self.errors += 1
+            logger.warning("Трафик %s: не удалось снять счётчики: %s", node, e)
+            return
+        fetched = time.perf_counter()
+
+        usage, counters = await asyncio.to_thread(summarize, data, self._unsaved.pop(node, None))
+        parsed = time.perf_counter()
+        self.counters += counters
+        if not usage:
+            return
+        try:
+            configs = await write_usage(node, usage)
+        except Exception:
+            self.errors += 1
+            self._unsaved[node] = usage
+            logger.exception("Трафик %s: запись не удалась, повторим в следующем цикле", node)
+            return
+        self.configs += configs
+        self.last[node] = {
+            "counters": counters,
+            "emails": len(usage),
+            "configs": configs,
+            "fetch_ms": round((fetched - started) * 1000, 1),
+            "parse_ms": round((parsed - fetched) * 1000, 1),
+            "write_ms": round((time.perf_counter() - parsed) * 1000, 1),
+        }
+
+    async def collect(self) -> None:
+        semaphore = asyncio.Semaphore(settings.STATS_CONCURRENCY)
+
+        async def run(node: str) -> None:
+            async with semaphore:
+                await self.collect_node(node)
+
+        await server_registry.refresh()
+        nodes = {s.domain for s in server_registry.snapshot.enabled()} | set(self._unsaved)
+        await asyncio.gather(*(run(node) for node in nodes))
+        self.cycles += 1
+
+    async def run_forever(self) -> None:
+        while True:
+            started = time.monotonic()
+            try:
+                await self.collect()
+                logger.info("Трафик: %s", self.stats())
+            except Exception:
+                logger.exception("Трафик: ошибка цикла сбора")
+            await asyncio.sleep(max(0.0, settings.STATS_INTERVAL - (time.monotonic() - started)))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "cycles": self.cycles,
+            "counters": self.counters,
+            "configs_updated": self.configs,
+            "errors": self.errors,
+            "unsaved_nodes": len(self._unsaved),
+            "last": self.last,
+        }
+
+
+traffic_collector = TrafficCollector()
+
+
+async def _main() -> None:
+    parser = argparse.ArgumentParser(description="Collect per-user traffic from Xray nodes")
+    parser.add_argument("--once", action="store_true", help="one pass instead of a loop")
+    args = parser.parse_args()
+    try:
+        if args.once:
+            await traffic_collector.collect()
+            print(traffic_collector.stats())
+        else:
+            await traffic_collector.run_forever()
+    finally:
+        await xray_service.close()
+        await dispose_engine()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
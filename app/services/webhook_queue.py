@@ -0,0 +1,204 @@
+"""
+Очередь апдейтов вебхука в Postgres и пул воркеров, которые её разбирают.
+
+Семантика at-least-once: апдейт берётся в работу с арендой (locked_until);
+если воркер упал, аренда истекает и апдейт достаётся другому воркеру.
+Обработка (process_update) идемпотентна, поэтому повтор безопасен.
+"""
+import asyncio
+import logging
+from typing import Any
+
+from sqlalchemy import Row, select, update, delete, func, or_, and_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.configs.webhook import webhook_settings as settings
+from app.core.consts import UpdateStatus
+from app.core.db.postgres import get_session_maker
+from app.core.metrics import register_collector
+from app.core.models.telegram_updates import TelegramUpdate
+from app.services.telegram_updates import process_update
+
+logger = logging.getLogger(__name__)
+
+
+async def enqueue_update(db: AsyncSession, update_id: int, payload: dict[str, Any]) -> bool:
+    """
+    Сохраняет апдейт в очередь. Повторная доставка того же update_id
+    игнорируется. Возвращает True, если апдейт новый.
+    """
+    inserted = (
+        await db.execute(
+            insert(TelegramUpdate)
+            .values(update_id=update_id, payload=payload)
+            .on_conflict_do_nothing(index_elements=[TelegramUpdate.update_id])
+            .returning(TelegramUpdate.update_id)
+        )
+    ).scalar_one_or_none()
+    await db.commit()
+    return inserted is not None
+
+
+def _seconds(value: float):
+    return func.make_interval(0, 0, 0, 0, 0, 0, value)
+
+
+class WebhookWorkerPool:
+    def __init__(self):
+        self._tasks: list[asyncio.Task] = []
+        # у каждого воркера своё событие: общий clear() терял бы пробуждения соседей
+        self._wakeups: list[asyncio.Event] = []
+        self._stopping = False
+
+        self.processed = 0
+        self.failed = 0
+        self.dead = 0
+        self.depth: dict[str, int] = {}
+
+    def notify(self) -> None:
+        """Разбудить воркеров сразу после enqueue, не дожидаясь опроса."""
+        for wakeup in self._wakeups:
+            wakeup.set()
+
+    def start(self) -> None:
+        self._stopping = False
+        self._wakeups = [asyncio.Event() for _ in range(settings.WORKERS)]
+        self._tasks = [
+            asyncio.create_task(self._worker(n), name=f"webhook-worker-{n}")
+            for n in range(settings.WORKERS)
+        ]
+        self._tasks.append(asyncio.create_task(self._monitor(), name="webhook-monitor"))
+        logger.info("Запущено воркеров вебхука: %s", settings.WORKERS)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _claim(self) -> list[Row]:
+        ready = or_(
+            and_(TelegramUpdate.status == UpdateStatus.PENDING,
+                 TelegramUpdate.available_at <= func.now()),
+            and_(TelegramUpdate.status == UpdateStatus.PROCESSING,
+                 TelegramUpdate.locked_until < func.now()),
+        )
+        candidates = (
+            select(TelegramUpdate.update_id)
+            .where(ready)
+            .order_by(TelegramUpdate.update_id)
+            .limit(settings.BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+            .scalar_subquery()
+        )
+        async with get_session_maker()() as db, db.begin():
+            rows = await db.execute(
+                update(TelegramUpdate)
+                .where(TelegramUpdate.update_id.in_(candidates))
+                .values(
+                    status=UpdateStatus.PROCESSING,
+                    attempts=TelegramUpdate.attempts + 1,
+                    locked_until=func.now() + _seconds(settings.LEASE_SECONDS),
+                )
+                .returning(TelegramUpdate.update_id, TelegramUpdate.payload, TelegramUpdate.attempts)
+                .execution_options(synchronize_session=False)
+            )
+            return sorted(rows.all(), key=lambda row: row.update_id)
+
+    async def _handle(self, update_id: int, payload: dict[str, Any], attempts: int) -> None:
+        session_maker = get_session_maker()
+        try:
+            async with session_maker() as db:
+                await process_update(db, payload)
+        except Exception as e:
+            self.failed += 1
+            dead = attempts >= settings.MAX_ATTEMPTS
+            logger.exception("Апдейт %s: ошибка обработки (попытка %s)", update_id, attempts)
+            async with session_maker() as db, db.begin():
+                await db.execute(
+                    update(TelegramUpdate)
+                    .where(TelegramUpdate.update_id == update_id)
+                    .values(
+                        status=UpdateStatus.DEAD if dead else UpdateStatus.PENDING,
+                        locked_until=None,
+                        # экспоненциальная задержка, не больше 10 минут
+                        available_at=func.now() + _seconds(min(2 ** attempts, 600)),
+                        last_error=repr(e)[:2000],
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            if dead:
+                self.dead += 1
+                logger.error("Апдейт %s перенесён в dead-letter", update_id)
+            return
+
+        async with session_maker() as db, db.begin():
+            await db.execute(
+                update(TelegramUpdate)
+                .where(TelegramUpdate.update_id == update_id)
+                .values(
+                    status=UpdateStatus.DONE,
+                    locked_until=None,
+                    processed_at=func.now(),
+                    last_error=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+        self.processed += 1
+
+    async def _worker(self, n: int) -> None:
+        wakeup = self._wakeups[n]
+        while not self._stopping:
+            # сброс до выборки: notify во время выборки не потеряется
+            wakeup.clear()
+            try:
+                batch = await self._claim()
+            except Exception:
+                logger.exception("webhook-worker-%s: не удалось забрать апдейты", n)
+                batch = []
+            for row in batch:
+                await self._handle(row.update_id, row.payload, row.attempts)
+            if len(batch) < settings.BATCH_SIZE:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), settings.POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _monitor(self) -> None:
+        """Глубина очереди для метрик и чистка обработанных апдейтов."""
+        while not self._stopping:
+            try:
+                async with get_session_maker()() as db, db.begin():
+                    rows = await db.execute(
+                        select(TelegramUpdate.status, func.count())
+                        .group_by(TelegramUpdate.status)
+                    )
+                    self.depth = {str(status): count for status, count in rows.all()}
+                    cutoff = func.now() - _seconds(settings.RETENTION_HOURS * 3600)
+                    await db.execute(
+                        delete(TelegramUpdate)
+                        .where(
+                            TelegramUpdate.status == UpdateStatus.DONE,
+                            TelegramUpdate.processed_at < cutoff,
+                        )
+                        .execution_options(synchronize_session=False)
+                    )
+            except Exception:
+                logger.exception("webhook-monitor: ошибка")
+            await asyncio.sleep(max(settings.POLL_INTERVAL, 5.0))
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "enabled": settings.QUEUE_ENABLED,
+            "workers": len(self._tasks) - 1 if self._tasks else 0,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dead_lettered": self.dead,
+            "depth": self.depth,
+        }
+
+
+webhook_workers = WebhookWorkerPool()
+register_collector("webhook_queue", webhook_workers.stats)
@@ -0,0 +1,236 @@
+"""
+Очередь провижининга Xray: операции add/remove копятся по нодам в коротком
+окне (XRAY_DEBOUNCE) и применяются пачкой через один канал ноды.
+
+Внутри окна операции над одним клиентом (его UUID) сворачиваются:
+remove отменяет ещё не применённый add (сам remove при этом остаётся —
+клиент мог быть на ноде и до него), повторы одной операции склеиваются.
+Статус каждой операции можно опросить по её id.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from typing import Any
+from uuid import uuid4
+
+from app.core.configs.xray import xray_settings as settings
+from app.core.consts import ProvisionStatus
+from app.core.db.redis import redis_client
+from app.core.metrics import register_collector
+from app.services.link_renderer import link_renderer
+from app.utils.xray import XrayError, xray_service
+
+logger = logging.getLogger(__name__)
+
+ADD = "add"
+REMOVE = "remove"
+
+# Сколько завершённых операций держим в памяти процесса
+_LOCAL_OPS_MAX = 100_000
+
+
+def _key(op_id: str) -> str:
+    return f"xray:op:{op_id}"
+
+
+@dataclass(eq=False)
+class Operation:
+    kind: str
+    node: str
+    uuid: str
+    # email клиента в инбаунде: по нему Xray добавляет и удаляет
+    email: str
+    flow: str | None = None
+    # протокол инбаунда ноды (vless / vmess / trojan) — от него зависит аккаунт
+    protocol: str = "vless"
+    id: str = field(default_factory=lambda: uuid4().hex)
+    status: ProvisionStatus = ProvisionStatus.PENDING
+    error: str | None = None
+    created_at: float = field(default_factory=time.time)
+    finished_at: float | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+class ProvisioningQueue:
+    def __init__(self):
+        # node -> uuid -> операции в порядке применения (не больше двух: remove, add)
+        self._pending: dict[str, dict[str, list[Operation]]] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        self._flushes: set[asyncio.Task] = set()
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._ops: OrderedDict[str, Operation] = OrderedDict()
+
+        self.batches = 0
+        self.applied = 0
+        self.cancelled = 0
+        self.failed = 0
+
+    # ---- приём операций ----
+
+    async def add(
+        self, node: str, email: str, uuid: str, flow: str | None = None, protocol: str = "vless",
+    ) -> Operation:
+        return await self._submit(Operation(ADD, node, uuid, email, flow=flow, protocol=protocol))
+
+    async def remove(self, node: str, uuid: str, email: str | None = None) -> Operation:
+        """email по умолчанию — uuid (как user_email для клиентов без email)."""
+        return await self._submit(Operation(REMOVE, node, uuid, email or uuid))
+
+    async def _submit(self, op: Operation) -> Operation:
+        queued = self._pending.setdefault(op.node, {}).setdefault(op.uuid, [])
+        cancelled: list[Operation] = []
+
+        if queued and queued[-1].kind == ADD and op.kind == REMOVE:
+            # remove отменяет неприменённый add, но сам остаётся в очереди:
+            # клиент мог попасть на ноду раньше, прошлым применённым add
+            cancelled.append(queued.pop())
+        if queued and queued[-1].kind == op.kind:
+            # та же операция ещё не применена — отдаём её id
+            result, touched = queued[-1], cancelled
+        else:
+            queued.append(op)
+            result, touched = op, [op, *cancelled]
+
+        for item in cancelled:
+            item.status = ProvisionStatus.CANCELLED
+            item.finished_at = time.time()
+        self.cancelled += len(cancelled)
+        if touched:
+            self._remember(touched)
+            await self._publish(touched)
+        self._schedule(op.node)
+        return result
+
+    def _schedule(self, node: str) -> None:
+        size = len(self._pending.get(node, ()))
+        if not size:
+            return
+        if size >= settings.MAX_BATCH:
+            # пачка набрана — не ждём конца окна
+            task = asyncio.create_task(self.flush(node), name=f"xray-flush-{node}")
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        self._arm_timer(node)
+
+    def _arm_timer(self, node: str) -> None:
+        timer = self._timers.get(node)
+        if timer is None or timer.done():
+            self._timers[node] = asyncio.create_task(self._flush_later(node), name=f"xray-debounce-{node}")
+
+    async def _flush_later(self, node: str) -> None:
+        await asyncio.sleep(settings.DEBOUNCE)
+        # окно закрыто: операции, пришедшие во время пачки, заводят новый таймер
+        if self._timers.get(node) is asyncio.current_task():
+            del self._timers[node]
+        # отмена таймера не должна прерывать уже начатую пачку
+        await asyncio.shield(self.flush(node))
+
+    # ---- применение пачки ----
+
+    async def flush(self, node: str) -> None:
+        lock = self._locks.setdefault(node, asyncio.Lock())
+        async with lock:
+            batch = self._pending.pop(node, None)
+            if not batch:
+                return
+            self.batches += 1
+            # тег инбаунда — по текущему реестру нод, как и ссылки
+            tag = link_renderer.template(node).inbound_tag
+            removes = [ops[0] for ops in batch.values() if ops[0].kind == REMOVE]
+            adds = [ops[-1] for ops in batch.values() if ops[-1].kind == ADD]
+            semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+            async def apply(op: Operation) -> None:
+                async with semaphore:
+                    try:
+                        if op.kind == ADD:
+                            await self._add_client(node, op, tag)
+                        else:
+                            await xray_service.remove_client(node, op.email, tag)
+                        op.status = ProvisionStatus.APPLIED
+                        self.applied += 1
+                    except Exception as e:
+                        op.status = ProvisionStatus.FAILED
+                        op.error = str(e)[:500]
+                        self.failed += 1
+                    op.finished_at = time.time()
+
+            # remove раньше add: для пары remove+add по одному клиенту важен порядок
+            await asyncio.gather(*(apply(op) for op in removes))
+            await asyncio.gather(*(apply(op) for op in adds))
+            logger.info("Xray %s: применено операций %s (add %s, remove %s)",
+                        node, len(removes) + len(adds), len(adds), len(removes))
+            await self._publish([*removes, *adds])
+        # пока шла пачка, могли прийти новые операции
+        if self._pending.get(node):
+            self._arm_timer(node)
+
+    @staticmethod
+    async def _add_client(node: str, op: Operation, tag: str) -> None:
+        if await xray_service.add_client(node, op.email, op.uuid, op.flow, op.protocol, tag):
+            return
+        # email уже есть в инбаунде, возможно со старым uuid — пересоздаём клиента
+        await xray_service.remove_client(node, op.email, tag)
+        if not await xray_service.add_client(node, op.email, op.uuid, op.flow, op.protocol, tag):
+            raise XrayError(f"AddUser {op.email} on {node}: still exists after remove")
+
+    async def stop(self) -> None:
+        """Отменить таймеры и применить всё, что ещё в очереди."""
+        for timer in self._timers.values():
+            timer.cancel()
+        await asyncio.gather(*self._timers.values(), *self._flushes, return_exceptions=True)
+        self._timers = {}
+        for node in list(self._pending):
+            await self.flush(node)
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers = {}
+
+    # ---- статусы операций ----
+
+    def _remember(self, ops: list[Operation]) -> None:
+        for op in ops:
+            self._ops[op.id] = op
+            self._ops.move_to_end(op.id)
+        while len(self._ops) > _LOCAL_OPS_MAX:
+            self._ops.popitem(last=False)
+
+    async def _publish(self, ops: list[Operation]) -> None:
+        """Статусы в Redis — чтобы опрос работал с любого воркера."""
+        try:
+            await redis_client.batch(
+                ("SET", _key(op.id), json.dumps(op.to_dict()), "EX", settings.OPERATION_TTL)
+                for op in ops
+            )
+        except Exception:
+            logger.warning("Не удалось сохранить статусы операций Xray", exc_info=True)
+
+    async def get(self, op_id: str) -> dict[str, Any] | None:
+        op = self._ops.get(op_id)
+        if op is not None:
+            return op.to_dict()
+        try:
+            client = await redis_client.get_client()
+            raw = await client.get(_key(op_id))
+        except Exception:
+            logger.warning("Статус операции Xray недоступен", exc_info=True)
+            return None
+        return json.loads(raw) if raw else None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "pending": {node: len(batch) for node, batch in self._pending.items()},
+            "batches": self.batches,
+            "applied": self.applied,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+        }
+
+
+provisioning_queue = ProvisioningQueue()
+register_collector("xray_provisioning", provisioning_queue.stats)
@@ -1,42 +1,218 @@
-import os
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any
+
 import httpx
 from app.core.configs.bot import bot_settings
+from app.core.metrics import register_collector
+
+logger = logging.getLogger(__name__)
+
+# Сколько per-chat лимитеров держим в памяти (LRU)
+_CHAT_BUCKETS_MAX = 10_000
+
+
+class TelegramApiError(RuntimeError):
+    def __init__(self, method: str, data: dict[str, Any]):
+        self.method = method
+        self.error_code = data.get("error_code")
+        self.description = data.get("description")
+        super().__init__(f"{method} error: {data}")
+
+
+class TokenBucket:
+    """Асинхронный token bucket: rate токенов в секунду, ёмкость capacity."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """Забирает токен, при необходимости ждёт. Возвращает время ожидания."""
+        waited = 0.0
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+
+
+class TelegramBotApi:
+    """
+    Общий на процесс клиент Bot API: keep-alive + HTTP/2, глобальный и
+    per-chat лимиты, повтор с учётом retry_after на 429.
+    """
+
+    def __init__(
+        self,
+        token: str,
+        *,
+        base_url: str,
+        timeout: float,
+        max_retries: int,
+        rate_limit: float,
+        chat_rate_limit: float,
+    ):
+        self._base_url = f"{base_url}/bot{token}/"
+        self._timeout = timeout
+        self._max_retries = max_retries
+        self._chat_rate_limit = chat_rate_limit
+        self._global_bucket = TokenBucket(rate_limit)
+        self._chat_buckets: OrderedDict[int | str, TokenBucket] = OrderedDict()
+        self._client: httpx.AsyncClient | None = None
+        # 429 от Telegram касается всего бота — притормаживаем все вызовы
+        self._blocked_until = 0.0
+
+        self.requests = 0
+        self.retries = 0
+        self.rate_limited = 0
+        self.errors = 0
+        self.throttle_wait = 0.0
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self._base_url,
+                http2=True,
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=20,
+                    max_keepalive_connections=10,
+                    keepalive_expiry=60,
+                ),
+            )
+        return self._client
+
+    def _chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self._chat_rate_limit)
+            if len(self._chat_buckets) > _CHAT_BUCKETS_MAX:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _throttle(self, chat_id: int | str | None) -> None:
+        pause = self._blocked_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+            self.throttle_wait += pause
+        waited = 0.0
+        if chat_id is not None:
+            waited += await self._chat_bucket(chat_id).acquire()
+        waited += await self._global_bucket.acquire()
+        self.throttle_wait += waited
+
+    async def call(
+        self,
+        method: str,
+        payload: dict[str, Any],
+        *,
+        chat_id: int | str | None = None,
+        timeout: float | None = None,
+    ) -> Any:
+        """Вызывает метод Bot API и возвращает поле result."""
+        client = self._get_client()
+        attempt = 0
+        while True:
+            await self._throttle(chat_id if chat_id is not None else payload.get("chat_id"))
+            self.requests += 1
+            try:
+                r = await client.post(
+                    method,
+                    json=payload,
+                    timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+                )
+                data = r.json()
+            except (httpx.TransportError, ValueError):
+                if attempt >= self._max_retries:
+                    self.errors += 1
+                    raise
+                delay = 0.5 * 2 ** attempt
+            else:
+                if data.get("ok"):
+                    return data["result"]
+                if r.status_code == 429 and attempt < self._max_retries:
+                    self.rate_limited += 1
+                    delay = float((data.get("parameters") or {}).get("retry_after", 1))
+                    self._blocked_until = max(self._blocked_until, time.monotonic() + delay)
+                elif r.status_code >= 500 and attempt < self._max_retries:
+                    delay = 0.5 * 2 ** attempt
+                else:
+                    self.errors += 1
+                    raise TelegramApiError(method, data)
+            attempt += 1
+            self.retries += 1
+            logger.warning("Bot API %s: повтор %s через %.2fs", method, attempt, delay)
+            await asyncio.sleep(delay)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "errors": self.errors,
+            "throttle_wait_s": round(self.throttle_wait, 3),
+            "chat_buckets": len(self._chat_buckets),
+        }
+
 
-BOT_API = f"https://api.telegram.org/bot{bot_settings.BOT_TOKEN}"
+bot_api = TelegramBotApi(
+    bot_settings.BOT_TOKEN,
+    base_url=bot_settings.BOT_API_URL,
+    timeout=bot_settings.BOT_API_TIMEOUT,
+    max_retries=bot_settings.BOT_API_MAX_RETRIES,
+    rate_limit=bot_settings.BOT_API_RATE_LIMIT,
+    chat_rate_limit=bot_settings.BOT_API_CHAT_RATE_LIMIT,
+)
+register_collector("telegram_api", bot_api.stats)
 
 
-async def tg_create_invoice_link(*, title, description, payload, stars: int):
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(f"{BOT_API}/createInvoiceLink", json={
-            "title": title,
-            "description": description,
-            "payload": payload,
-            "currency": "XTR",
-            "prices": [{"label": title, "amount": stars}],
-        })
-        r.raise_for_status()
-        data = r.json()
-        if not data.get("ok"):
-            raise RuntimeError(f"createInvoiceLink error: {data}")
-        return data["result"]
+async def tg_create_invoice_link(
+    *,
+    title,
+    description,
+    payload,
+    stars: int,
+    label: str | None = None,
+    timeout: float | None = None,
+):
+    return await bot_api.call("createInvoiceLink", {
+        "title": title,
+        "description": description,
+        "payload": payload,
+        "currency": "XTR",
+        "prices": [{"label": label or title, "amount": stars}],
+    }, timeout=timeout)
 
 
 async def tg_answer_pre_checkout_query(query_id: str, ok: bool, error_message: str | None = None):
-    async with httpx.AsyncClient(timeout=10) as client:
-        payload = {"pre_checkout_query_id": query_id, "ok": ok}
-        if not ok and error_message:
-            payload["error_message"] = error_message
-        r = await client.post(f"{BOT_API}/answerPreCheckoutQuery", json=payload)
-        r.raise_for_status()
-        return r.json()
+    payload = {"pre_checkout_query_id": query_id, "ok": ok}
+    if not ok and error_message:
+        payload["error_message"] = error_message
+    return await bot_api.call("answerPreCheckoutQuery", payload)
 
 
 # опционально для возвратов
 async def tg_refund_star_payment(user_id: int, charge_id: str):
-    async with httpx.AsyncClient(timeout=10) as client:
-        r = await client.post(f"{BOT_API}/refundStarPayment", json={
-            "user_id": user_id,
-            "telegram_payment_charge_id": charge_id
-        })
-        r.raise_for_status()
-        return r.json()
+    return await bot_api.call("refundStarPayment", {
+        "user_id": user_id,
+        "telegram_payment_charge_id": charge_id
+    })
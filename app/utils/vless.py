@@ -0,0 +1,5 @@
+from datetime import datetime
+
+
+def dt_to_str(dt: datetime | None) -> str:
+    return dt.isoformat() if dt else ""
@@ -1,15 +1,180 @@
+"""
+Управление пользователями Xray через gRPC API (HandlerService.AlterInbound).
+
+Пользователи добавляются/удаляются в работающий VLESS-инбаунд без правки
+конфига и рестарта, живые соединения ноды не рвутся. На каждую ноду —
+один долгоживущий канал, общий для всех запросов процесса.
+"""
+import asyncio
+import logging
+from typing import Any
+
+import grpc
+
+from app.core.configs.xray import xray_settings as settings
+from app.core.metrics import register_collector
 from app.core.schemas.xray import XraySchemasCreate
+from app.utils import xray_proto
+
+logger = logging.getLogger(__name__)
+
+# Повторяем только то, что похоже на сетевую проблему
+_RETRYABLE = (grpc.StatusCode.UNAVAILABLE, grpc.StatusCode.DEADLINE_EXCEEDED)
+
+_CHANNEL_OPTIONS = (
+    ("grpc.keepalive_time_ms", 30_000),
+    ("grpc.keepalive_timeout_ms", 10_000),
+    ("grpc.keepalive_permit_without_calls", 1),
+    ("grpc.initial_reconnect_backoff_ms", 500),
+    ("grpc.max_reconnect_backoff_ms", 10_000),
+    # QueryStats на большой ноде — сотни тысяч счётчиков, больше дефолтных 4 МБ
+    ("grpc.max_receive_message_length", 256 * 1024 * 1024),
+)
+
+
+class XrayError(RuntimeError):
+    pass
+
+
+def _identity(data: bytes) -> bytes:
+    return data
+
+
+def user_email(user_data: XraySchemasCreate) -> str:
+    """email в Xray — ключ пользователя в инбаунде и в статистике."""
+    return user_data.email or user_data.uuid
 
 
 class XrayService:
     def __init__(self):
-        pass
+        self._channels: dict[str, grpc.aio.Channel] = {}
+        self._calls: dict[tuple[str, str], grpc.aio.UnaryUnaryMultiCallable] = {}
+
+        self.requests = 0
+        self.retries = 0
+        self.errors = 0
+
+    def address(self, node: str) -> str:
+        return settings.NODES.get(node) or f"{node}:{settings.API_PORT}"
+
+    def resolve_node(self, node: str | None) -> str:
+        node = node or settings.DEFAULT_NODE or next(iter(settings.NODES), None)
+        if not node:
+            raise XrayError("Xray node is not specified and XRAY_DEFAULT_NODE is empty")
+        return node
+
+    def channel(self, node: str) -> grpc.aio.Channel:
+        channel = self._channels.get(node)
+        if channel is None:
+            channel = grpc.aio.insecure_channel(self.address(node), options=_CHANNEL_OPTIONS)
+            self._channels[node] = channel
+        return channel
+
+    def _method(self, node: str, method: str) -> grpc.aio.UnaryUnaryMultiCallable:
+        call = self._calls.get((node, method))
+        if call is None:
+            call = self.channel(node).unary_unary(
+                method,
+                request_serializer=_identity,
+                response_deserializer=_identity,
+            )
+            self._calls[(node, method)] = call
+        return call
+
+    def _alter_inbound(self, node: str) -> grpc.aio.UnaryUnaryMultiCallable:
+        return self._method(node, xray_proto.ALTER_INBOUND)
+
+    async def unary(self, node: str, call: grpc.aio.UnaryUnaryMultiCallable, request: bytes) -> bytes:
+        """Вызов с таймаутом и повторами на UNAVAILABLE/DEADLINE_EXCEEDED."""
+        attempt = 0
+        while True:
+            self.requests += 1
+            try:
+                return await call(request, timeout=settings.TIMEOUT)
+            except grpc.aio.AioRpcError as e:
+                if e.code() not in _RETRYABLE or attempt >= settings.RETRIES:
+                    raise
+                delay = settings.RETRY_BACKOFF * 2 ** attempt
+                attempt += 1
+                self.retries += 1
+                logger.warning("Xray %s: %s, повтор %s через %.2fs", node, e.code().name, attempt, delay)
+                await asyncio.sleep(delay)
+
+    async def add_client(
+        self, node: str, email: str, uuid: str, flow: str | None = None, protocol: str = "vless",
+        tag: str | None = None,
+    ) -> bool:
+        """
+        False — пользователь уже был в инбаунде. protocol — протокол инбаунда
+        ноды, tag — его тег (по умолчанию XRAY_INBOUND_TAG).
+        """
+        request = xray_proto.add_user_request(tag or settings.INBOUND_TAG, email, uuid, flow, protocol)
+        try:
+            await self.unary(node, self._alter_inbound(node), request)
+        except grpc.aio.AioRpcError as e:
+            if "already exists" in (e.details() or ""):
+                return False
+            self.errors += 1
+            raise XrayError(f"AddUser {email} on {node}: {e.details()}") from e
+        return True
+
+    async def remove_client(self, node: str, email: str, tag: str | None = None) -> bool:
+        """False — такого пользователя в инбаунде не было."""
+        request = xray_proto.remove_user_request(tag or settings.INBOUND_TAG, email)
+        try:
+            await self.unary(node, self._alter_inbound(node), request)
+        except grpc.aio.AioRpcError as e:
+            if "not found" in (e.details() or ""):
+                return False
+            self.errors += 1
+            raise XrayError(f"RemoveUser {email} on {node}: {e.details()}") from e
+        return True
+
+    async def query_stats_raw(self, node: str, pattern: str, reset: bool = False) -> bytes:
+        """Ответ StatsService.QueryStats как есть — разбор на стороне вызывающего."""
+        request = xray_proto.query_stats_request(pattern, reset)
+        try:
+            return await self.unary(node, self._method(node, xray_proto.QUERY_STATS), request)
+        except grpc.aio.AioRpcError as e:
+            self.errors += 1
+            raise XrayError(f"QueryStats on {node}: {e.details()}") from e
+
+    async def query_stats(self, node: str, pattern: str, reset: bool = False) -> list[tuple[str, int]]:
+        """StatsService.QueryStats: [(имя счётчика, значение)]."""
+        return xray_proto.parse_query_stats(await self.query_stats_raw(node, pattern, reset))
+
+    async def reload(self, node: str | None = None):
+        """Переоткрыть каналы (например, после смены адресов нод)."""
+        nodes = [node] if node else list(self._channels)
+        for name in nodes:
+            for key in [key for key in self._calls if key[0] == name]:
+                del self._calls[key]
+            channel = self._channels.pop(name, None)
+            if channel is not None:
+                await channel.close()
+
+    async def add_user(self, user_data: XraySchemasCreate, node: str | None = None):
+        return await self.add_client(
+            self.resolve_node(node or user_data.node), user_email(user_data), user_data.uuid, user_data.flow,
+        )
+
+    async def delete_user(self, user_id: str, node: str | None = None):
+        return await self.remove_client(self.resolve_node(node), user_id)
+
+    async def close(self) -> None:
+        await self.reload()
 
-    async def reload(self):
-        pass
+    def stats(self) -> dict[str, Any]:
+        return {
+            "nodes": {
+                name: str(channel.get_state(try_to_connect=False).name)
+                for name, channel in self._channels.items()
+            },
+            "requests": self.requests,
+            "retries": self.retries,
+            "errors": self.errors,
+        }
 
-    async def add_user(self, user_data: XraySchemasCreate):
-        pass
 
-    async def delete_user(self, user_id: str):
-        pass
+xray_service = XrayService()
+register_collector("xray", xray_service.stats)
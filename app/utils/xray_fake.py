@@ -0,0 +1,118 @@
+"""
+Фейковый gRPC API Xray для локальной разработки и проверок без ноды.
+
+Понимает HandlerService.AlterInbound (AddUser/RemoveUser) и ведёт список
+пользователей по тегам инбаундов в памяти; ошибки отдаёт с теми же
+текстами, что и Xray ("already exists", "not found"). StatsService.QueryStats
+отдаёт счётчики из self.counters (паттерн — подстрока имени, как у Xray).
+
+    python -m app.utils.xray_fake --port 10085
+"""
+import argparse
+import asyncio
+import logging
+
+import grpc
+
+from app.utils import xray_proto
+
+logger = logging.getLogger(__name__)
+
+
+def _identity(data: bytes) -> bytes:
+    return data
+
+
+class FakeXrayServer:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self.host = host
+        self.port = port
+        # tag -> email -> (uuid, flow)
+        self.inbounds: dict[str, dict[str, tuple[str, str]]] = {}
+        # имя счётчика -> значение, например "user>>>e1>>>traffic>>>uplink"
+        self.counters: dict[str, int] = {}
+        # ответы "недоступен" на первые N вызовов — для проверки повторов
+        self.fail_next = 0
+        self.calls = 0
+        self._server: grpc.aio.Server | None = None
+
+    async def _alter_inbound(self, request: bytes, context: grpc.aio.ServicerContext) -> bytes:
+        self.calls += 1
+        if self.fail_next > 0:
+            self.fail_next -= 1
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "fake: unavailable")
+
+        tag, op_type, op = xray_proto.parse_alter_inbound(request)
+        users = self.inbounds.setdefault(tag, {})
+        if op_type == xray_proto.ADD_USER_OPERATION:
+            user = xray_proto.fields(op.get(1, b""))
+            email = user.get(2, b"").decode()
+            account = xray_proto.fields(xray_proto.fields(user.get(3, b"")).get(2, b""))
+            if email in users:
+                await context.abort(grpc.StatusCode.UNKNOWN, f"User {email} already exists.")
+            users[email] = (account.get(1, b"").decode(), account.get(2, b"").decode())
+        elif op_type == xray_proto.REMOVE_USER_OPERATION:
+            email = op.get(1, b"").decode()
+            if users.pop(email, None) is None:
+                await context.abort(grpc.StatusCode.UNKNOWN, f"User {email} not found.")
+        else:
+            await context.abort(grpc.StatusCode.INVALID_ARGUMENT, f"unknown operation {op_type}")
+        return b""
+
+    async def _query_stats(self, request: bytes, context: grpc.aio.ServicerContext) -> bytes:
+        self.calls += 1
+        pattern, reset = xray_proto.parse_query_stats_request(request)
+        stats = [(name, value) for name, value in self.counters.items() if pattern in name]
+        if reset:
+            for name, _ in stats:
+                self.counters[name] = 0
+        return xray_proto.query_stats_response(stats)
+
+    def _handlers(self) -> list[grpc.GenericRpcHandler]:
+        return [
+            grpc.method_handlers_generic_handler(xray_proto.HANDLER_SERVICE, {
+                "AlterInbound": grpc.unary_unary_rpc_method_handler(
+                    self._alter_inbound,
+                    request_deserializer=_identity,
+                    response_serializer=_identity,
+                ),
+            }),
+            grpc.method_handlers_generic_handler(xray_proto.STATS_SERVICE, {
+                "QueryStats": grpc.unary_unary_rpc_method_handler(
+                    self._query_stats,
+                    request_deserializer=_identity,
+                    response_serializer=_identity,
+                ),
+            }),
+        ]
+
+    @property
+    def address(self) -> str:
+        return f"{self.host}:{self.port}"
+
+    async def start(self) -> "FakeXrayServer":
+        self._server = grpc.aio.server()
+        self._server.add_generic_rpc_handlers(self._handlers())
+        self.port = self._server.add_insecure_port(self.address)
+        await self._server.start()
+        return self
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            await self._server.stop(grace=None)
+            self._server = None
+
+
+async def _serve(host: str, port: int) -> None:
+    server = await FakeXrayServer(host, port).start()
+    logger.info("Fake Xray API на %s", server.address)
+    await server._server.wait_for_termination()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Фейковый gRPC API Xray")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=10085)
+    args = parser.parse_args()
+    asyncio.run(_serve(args.host, args.port))
@@ -0,0 +1,191 @@
+"""
+Минимальная protobuf-сериализация сообщений gRPC API Xray.
+
+Нужны несколько маленьких сообщений, поэтому вместо сгенерированных
+*_pb2 (и зависимости от protobuf) — ручное кодирование wire-формата.
+Номера полей — из .proto Xray-core (app/proxyman/command, common/protocol,
+common/serial, proxy/vless, proxy/vmess, proxy/trojan).
+"""
+from typing import Iterator
+
+HANDLER_SERVICE = "xray.app.proxyman.command.HandlerService"
+ALTER_INBOUND = f"/{HANDLER_SERVICE}/AlterInbound"
+
+STATS_SERVICE = "xray.app.stats.command.StatsService"
+QUERY_STATS = f"/{STATS_SERVICE}/QueryStats"
+
+ADD_USER_OPERATION = "xray.app.proxyman.command.AddUserOperation"
+REMOVE_USER_OPERATION = "xray.app.proxyman.command.RemoveUserOperation"
+VLESS_ACCOUNT = "xray.proxy.vless.Account"
+VMESS_ACCOUNT = "xray.proxy.vmess.Account"
+TROJAN_ACCOUNT = "xray.proxy.trojan.Account"
+
+# common/protocol SecurityType.AUTO — как "scy":"auto" в vmess-ссылке
+_VMESS_SECURITY_AUTO = 2
+
+_VARINT = 0
+_LEN = 2
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while True:
+        bits = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(bits | 0x80)
+        else:
+            out.append(bits)
+            return bytes(out)
+
+
+def _field(number: int, value: bytes | str | int | None) -> bytes:
+    if value is None or value == "" or value == b"" or value == 0:
+        return b""  # proto3: значения по умолчанию не пишутся
+    if isinstance(value, int):
+        return _varint(number << 3 | _VARINT) + _varint(value)
+    if isinstance(value, str):
+        value = value.encode("utf-8")
+    return _varint(number << 3 | _LEN) + _varint(len(value)) + value
+
+
+def typed_message(type_name: str, value: bytes) -> bytes:
+    # TypedMessage { string type = 1; bytes value = 2; }
+    return _field(1, type_name) + _field(2, value)
+
+
+def vless_account(uuid: str, flow: str | None = None) -> bytes:
+    # Account { string id = 1; string flow = 2; string encryption = 3; }
+    return _field(1, uuid) + _field(2, flow) + _field(3, "none")
+
+
+def vmess_account(uuid: str) -> bytes:
+    # Account { string id = 1; SecurityConfig security_settings = 3; }
+    # SecurityConfig { SecurityType type = 1; }
+    return _field(1, uuid) + _field(3, _field(1, _VMESS_SECURITY_AUTO))
+
+
+def trojan_account(password: str) -> bytes:
+    # Account { string password = 1; }
+    return _field(1, password)
+
+
+def account(protocol: str, uuid: str, flow: str | None = None) -> bytes:
+    """Аккаунт клиента под протокол инбаунда; у trojan паролем служит uuid."""
+    if protocol == "vless":
+        return typed_message(VLESS_ACCOUNT, vless_account(uuid, flow))
+    if protocol == "vmess":
+        return typed_message(VMESS_ACCOUNT, vmess_account(uuid))
+    if protocol == "trojan":
+        return typed_message(TROJAN_ACCOUNT, trojan_account(uuid))
+    raise ValueError(f"unsupported protocol: {protocol}")
+
+
+def user(email: str, account: bytes, level: int = 0) -> bytes:
+    # User { uint32 level = 1; string email = 2; TypedMessage account = 3; }
+    return _field(1, level) + _field(2, email) + _field(3, account)
+
+
+def add_user_request(
+    tag: str, email: str, uuid: str, flow: str | None = None, protocol: str = "vless",
+) -> bytes:
+    # AddUserOperation { User user = 1; }
+    operation = typed_message(ADD_USER_OPERATION, _field(1, user(email, account(protocol, uuid, flow))))
+    # AlterInboundRequest { string tag = 1; TypedMessage operation = 2; }
+    return _field(1, tag) + _field(2, operation)
+
+
+def remove_user_request(tag: str, email: str) -> bytes:
+    # RemoveUserOperation { string email = 1; }
+    operation = typed_message(REMOVE_USER_OPERATION, _field(1, email))
+    return _field(1, tag) + _field(2, operation)
+
+
+def query_stats_request(pattern: str, reset: bool) -> bytes:
+    # QueryStatsRequest { string pattern = 1; bool reset = 2; }
+    return _field(1, pattern) + _field(2, int(reset))
+
+
+def _as_int64(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# ---- разбор (нужен фейковому серверу и ответам со списками) ----
+
+def _read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    result = shift = 0
+    while True:
+        b = data[pos]
+        pos += 1
+        result |= (b & 0x7F) << shift
+        if not b & 0x80:
+            return result, pos
+        shift += 7
+
+
+def iter_fields(data: bytes) -> Iterator[tuple[int, int | bytes]]:
+    """(номер поля, значение): int для varint, bytes для length-delimited."""
+    pos = 0
+    while pos < len(data):
+        key, pos = _read_varint(data, pos)
+        number, wire_type = key >> 3, key & 0x07
+        if wire_type == _VARINT:
+            value, pos = _read_varint(data, pos)
+        elif wire_type == _LEN:
+            size, pos = _read_varint(data, pos)
+            value = data[pos:pos + size]
+            pos += size
+        elif wire_type == 1:  # fixed64
+            value = int.from_bytes(data[pos:pos + 8], "little")
+            pos += 8
+        elif wire_type == 5:  # fixed32
+            value = int.from_bytes(data[pos:pos + 4], "little")
+            pos += 4
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        yield number, value
+
+
+def fields(data: bytes) -> dict[int, int | bytes]:
+    """Последнее значение каждого поля (для сообщений без repeated)."""
+    return dict(iter_fields(data))
+
+
+def parse_alter_inbound(data: bytes) -> tuple[str, str, dict[int, int | bytes]]:
+    """AlterInboundRequest -> (tag, тип операции, поля операции)."""
+    request = fields(data)
+    operation = fields(request.get(2, b""))
+    return (
+        request.get(1, b"").decode(),
+        operation.get(1, b"").decode(),
+        fields(operation.get(2, b"")),
+    )
+
+
+def parse_query_stats(data: bytes) -> list[tuple[str, int]]:
+    """QueryStatsResponse { repeated Stat stat = 1; } -> [(name, value)]."""
+    result = []
+    for number, stat in iter_fields(data):
+        if number != 1:
+            continue
+        name, value = "", 0
+        # Stat { string name = 1; int64 value = 2; }
+        for field_number, field_value in iter_fields(stat):
+            if field_number == 1:
+                name = field_value.decode()
+            elif field_number == 2:
+                value = _as_int64(field_value)
+        result.append((name, value))
+    return result
+
+
+def query_stats_response(stats: list[tuple[str, int]]) -> bytes:
+    return b"".join(
+        _field(1, _field(1, name) + _field(2, value & ((1 << 64) - 1)))
+        for name, value in stats
+    )
+
+
+def parse_query_stats_request(data: bytes) -> tuple[str, bool]:
+    request = fields(data)
+    return request.get(1, b"").decode(), bool(request.get(2, 0))
@@ -0,0 +1,61 @@
+"""
+Микробенчмарк проверки initData (HMAC): старый путь vs InitDataVerifier.
+
+Запуск: python -m benchmarks.bench_init_data
+"""
+import hashlib
+import hmac
+import json
+import time
+import timeit
+from urllib.parse import urlencode
+
+from app.core.security.init_data import (
+    InitDataVerifier, build_data_check_string, compute_secret_key, parse_init_data,
+)
+
+BOT_TOKEN = "123456:bench-token"
+N = 50_000
+
+
+def make_init_data(user_id: int = 606825877) -> str:
+    fields = {
+        "query_id": "AAGVbSskAAAAAJVtKyTyM9DK",
+        "user": json.dumps({"id": user_id, "first_name": "Bench", "username": "bench"}),
+        "auth_date": str(int(time.time())),
+    }
+    dcs, _ = build_data_check_string(fields)
+    fields["hash"] = hmac.new(compute_secret_key(BOT_TOKEN), dcs.encode(), hashlib.sha256).hexdigest()
+    return urlencode(fields)
+
+
+def legacy_verify(init_data: str, bot_token: str) -> dict:
+    """Прежняя реализация: секрет и разбор строки на каждый вызов."""
+    fields = parse_init_data(init_data)
+    data_check_string, received_hash = build_data_check_string(fields)
+    secret_key = compute_secret_key(bot_token)
+    calc_hash = hmac.new(secret_key, data_check_string.encode("utf-8"), hashlib.sha256).hexdigest()
+    assert hmac.compare_digest(calc_hash, received_hash)
+    int(fields.get("auth_date", "0"))
+    return fields
+
+
+def report(name: str, seconds: float) -> None:
+    print(f"{name:<34} {seconds / N * 1e6:8.2f} µs/call")
+
+
+def main() -> None:
+    init_data = make_init_data()
+
+    report("before (legacy verify_hmac)", timeit.timeit(lambda: legacy_verify(init_data, BOT_TOKEN), number=N))
+
+    cold = InitDataVerifier(BOT_TOKEN, cache_size=0)
+    report("after, cached secret only", timeit.timeit(lambda: cold.verify(init_data), number=N))
+
+    warm = InitDataVerifier(BOT_TOKEN)
+    warm.verify(init_data)
+    report("after, repeated initData (LRU)", timeit.timeit(lambda: warm.verify(init_data), number=N))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Пропускная способность создания инвойса Stars: прежний create_invoice
+(SELECT по payload + INSERT + COMMIT + refresh, Bot на запрос, соединение
+с БД занято всё время вызова Telegram) vs текущий (один INSERT ... RETURNING
+и COMMIT, соединение отпущено до вызова, общий клиент Bot API).
+
+Нужен Postgres из настроек приложения и хотя бы один пользователь в users.
+Telegram заменён локальным HTTP-сервером с задержкой LATENCY (как RTT до
+api.telegram.org). Глобальный лимит общего клиента снят: в проде потолок
+задаёт Telegram, здесь меряется стоимость самого пути. Созданные платежи
+удаляются в конце.
+
+Запуск: python -m benchmarks.bench_invoice
+"""
+import asyncio
+import json
+import math
+import time
+from decimal import Decimal
+from uuid import uuid4
+
+import httpx
+from sqlalchemy import delete, select
+
+from app.api import payments_stars
+from app.api.jwt_auth import CurrentUser
+from app.core.consts import PaymentStatus
+from app.core.db.postgres import dispose_engine, get_session_maker, init_engine
+from app.core.models.payments import Payment
+from app.core.models.users import User
+from app.utils.tg_bot_api import TokenBucket, bot_api
+
+N = 1_000
+CONCURRENCY = 100
+LATENCY = 0.03
+AMOUNT_RUB = 100
+
+
+async def fake_telegram(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+    """Минимальный HTTP/1.1 с keep-alive: на любой POST — ok с ссылкой."""
+    try:
+        while True:
+            head = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":", 1)[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(LATENCY)
+            body = json.dumps({"ok": True, "result": "https://t.me/$bench"}).encode()
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def legacy_create_invoice(current: CurrentUser, amount_rub: int, api_url: str) -> str:
+    """Прежняя реализация (без веток гонки/смены суммы, которые не срабатывают)."""
+    async with get_session_maker()() as db:
+        rub_dec = Decimal(str(amount_rub))
+        stars = int(math.ceil(rub_dec * payments_stars.XTR_PER_RUB))
+        payload = f"topup:{current.telegram_id}:{amount_rub}:v2:{uuid4().hex[:8]}"
+        payment = (
+            await db.execute(select(Payment).where(Payment.payload == payload))
+        ).scalar_one_or_none()
+        if payment is None:
+            payment = Payment(
+                user_id=current.id, payload=payload, rub_amount=rub_dec,
+                stars_amount=stars, status=PaymentStatus.PENDING, currency="XTR",
+            )
+            db.add(payment)
+            await db.commit()
+        await db.refresh(payment)
+
+        # Bot на запрос: своя HTTP-сессия, новое соединение
+        async with httpx.AsyncClient(base_url=f"{api_url}/botbench/") as bot:
+            r = await bot.post("createInvoiceLink", json={
+                "title": "Пополнение баланса", "payload": payload, "currency": "XTR",
+                "prices": [{"label": "Balance top-up", "amount": stars}],
+            })
+            r.json()["result"]
+        return payload
+
+
+async def current_create_invoice(current: CurrentUser, amount_rub: int) -> str:
+    async with get_session_maker()() as db:
+        response = await payments_stars.create_invoice(
+            payments_stars.CreateInvoiceRequest(amount_rub=amount_rub), current=current, db=db,
+        )
+    return response.payload
+
+
+async def run(name: str, call) -> list[str]:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def one() -> str:
+        async with semaphore:
+            return await call()
+
+    started = time.perf_counter()
+    payloads = await asyncio.gather(*(one() for _ in range(N)))
+    elapsed = time.perf_counter() - started
+    print(f"{name:<44} {N / elapsed:8.1f} invoices/s  ({elapsed:.2f} s / {N})")
+    return payloads
+
+
+async def main() -> None:
+    server = await asyncio.start_server(fake_telegram, "127.0.0.1", 0)
+    api_url = "http://127.0.0.1:%s" % server.sockets[0].getsockname()[1]
+    bot_api._base_url = f"{api_url}/botbench/"
+    # меряем свой путь, а не лимит Telegram (~30 запросов/с на бота) в общем клиенте
+    bot_api._global_bucket = TokenBucket(1e9)
+
+    init_engine()
+    async with get_session_maker()() as db:
+        user = (await db.execute(select(User.id, User.telegram_id).limit(1))).one()
+    current = CurrentUser(id=user.id, telegram_id=user.telegram_id)
+
+    print(f"N={N}, concurrency={CONCURRENCY}, Telegram latency={LATENCY * 1000:.0f} ms")
+    payloads: list[str] = []
+    try:
+        # прогрев пула и клиента
+        payloads += await asyncio.gather(*(current_create_invoice(current, AMOUNT_RUB) for _ in range(10)))
+        payloads += await run(
+            "before (select+commit+refresh, Bot per call)",
+            lambda: legacy_create_invoice(current, AMOUNT_RUB, api_url),
+        )
+        payloads += await run(
+            "after (INSERT ... RETURNING, shared client)",
+            lambda: current_create_invoice(current, AMOUNT_RUB),
+        )
+    finally:
+        async with get_session_maker()() as db, db.begin():
+            await db.execute(delete(Payment).where(Payment.payload.in_(payloads)))
+        await bot_api.close()
+        await dispose_engine()
+        server.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,94 @@
+"""
+Микробенчмарк рендера ссылок: прежний build_vless_link vs шаблоны нод.
+
+Выигрыша по скорости шаблоны не дают и не должны: обе версии упираются
+в чтение атрибутов ORM-объекта VpnConfig (строка "floor"), а шаблон
+сверх прежней f-строки ещё экранирует подпись. Бенчмарк следит, чтобы
+параметры нод, vmess/trojan и экранирование не сделали рендер заметно
+дороже прежнего.
+
+Запуск: python -m benchmarks.bench_links
+"""
+import time
+import timeit
+import uuid
+
+from app.core.configs.vpn_config import vpn_settings
+from app.core.models.vpn_configs import VpnConfig
+from app.services.link_renderer import LinkRenderer, build_template, render_subscription
+from app.services.server_registry import ServerInfo, ServerSnapshot, server_registry
+
+N = 10_000
+ROUNDS = 7
+NODES = ("de1.example.com", "de2.example.com", "tr1.example.com", "nl1.example.com")
+
+
+def legacy_build_vless_link(cfg: VpnConfig) -> str:
+    """Прежняя реализация: вся query-строка собирается на каждый ключ."""
+    return (
+        f"vless://{cfg.uuid}@{cfg.vpn_domain}:443"
+        f"?flow={cfg.flow or 'xtls-rprx-vision'}&type=tcp&security=reality"
+        f"&fp=random&sni={vpn_settings.SNI}&pbk={vpn_settings.PBK}"
+        f"&sid={vpn_settings.SID}&spx=/#" + (cfg.email or "vpn-user")
+    )
+
+
+def make_configs() -> list[VpnConfig]:
+    return [
+        VpnConfig(
+            id=i, uuid=str(uuid.uuid4()), vpn_domain=NODES[i % len(NODES)],
+            flow="xtls-rprx-vision", email=f"user{i}-{NODES[i % len(NODES)][:3]}",
+        )
+        for i in range(N)
+    ]
+
+
+def measure(fn) -> float:
+    # минимум из повторов — меньше шума от соседей по машине
+    return min(timeit.repeat(fn, number=1, repeat=ROUNDS))
+
+
+def report(name: str, seconds: float) -> None:
+    print(f"{name:<36} {seconds * 1000:8.2f} ms / {N} links")
+
+
+def main() -> None:
+    configs = make_configs()
+    server_registry.snapshot = ServerSnapshot.build(
+        [ServerInfo(i, "XX", domain, 0, True, 100) for i, domain in enumerate(NODES, 1)],
+        version=int(time.time()),
+    )
+    renderer = LinkRenderer()
+
+    report("floor (ORM attribute reads only)", measure(
+        lambda: [(c.uuid, c.vpn_domain, c.flow, c.email) for c in configs]
+    ))
+    report("legacy build_vless_link", measure(lambda: [legacy_build_vless_link(c) for c in configs]))
+    report("vless templates", measure(lambda: renderer.render_many(configs)))
+    report("vless templates + subscription body", measure(
+        lambda: render_subscription(renderer.render_many(configs))
+    ))
+
+    for protocol in ("vmess", "trojan"):
+        templates = {
+            domain: build_template(domain, ServerInfo(0, "XX", domain, 0, True, 100, protocol=protocol))
+            for domain in NODES
+        }
+        report(
+            f"{protocol} templates",
+            measure(lambda: [templates[c.vpn_domain].render(c.uuid, c.email, c.flow) for c in configs]),
+        )
+
+    try:
+        from app.services.link_renderer import render_qr_svg
+        link = renderer.render(configs[0])
+        started = time.perf_counter()
+        render_qr_svg(link)
+        print(f"{'QR, first render':<36} {(time.perf_counter() - started) * 1000:8.2f} ms")
+        report("QR, cached", measure(lambda: [render_qr_svg(link) for _ in range(N)]))
+    except ImportError:
+        print("segno не установлен — QR пропущен")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,15 @@
+import os
+
+# Настройки приложения читаются при импорте app.core.configs;
+# для тестов хватает заглушек, к сервисам тесты не ходят
+for name, value in {
+    "DEBUG": "true",
+    "SERVICE_HOST": "127.0.0.1",
+    "SERVICE_PORT": "8000",
+    "ALLOW_METHODS": '["*"]',
+    "ALLOW_HOSTS": '["*"]',
+    "ALLOW_HEADERS": '["*"]',
+    "ALLOW_ORIGINS": '["*"]',
+    "ALLOW_CREDENTIALS": "false",
+}.items():
+    os.environ.setdefault(name, value)
@@ -0,0 +1,95 @@
+"""XrayService против фейкового gRPC API Xray (app/utils/xray_fake.py)."""
+import asyncio
+
+import pytest
+
+from app.utils import xray
+from app.utils.xray_fake import FakeXrayServer
+
+NODE = "fake"
+TAG = xray.settings.INBOUND_TAG
+UUID = "11111111-1111-1111-1111-111111111111"
+
+
+def run(scenario) -> None:
+    """Поднимает фейковую ноду и свой XrayService на время сценария."""
+    async def main():
+        fake = await FakeXrayServer().start()
+        xray.settings.NODES[NODE] = fake.address
+        service = xray.XrayService()
+        try:
+            await scenario(fake, service)
+        finally:
+            await service.close()
+            await fake.stop()
+    asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def fast_settings(monkeypatch):
+    monkeypatch.setattr(xray.settings, "NODES", {})
+    monkeypatch.setattr(xray.settings, "RETRY_BACKOFF", 0.01)
+
+
+def test_add_client():
+    async def scenario(fake, service):
+        assert await service.add_client(NODE, "e1", UUID, "xtls-rprx-vision") is True
+        assert fake.inbounds[TAG] == {"e1": (UUID, "xtls-rprx-vision")}
+    run(scenario)
+
+
+def test_duplicate_add_is_not_an_error():
+    async def scenario(fake, service):
+        assert await service.add_client(NODE, "e1", UUID) is True
+        assert await service.add_client(NODE, "e1", UUID) is False
+        assert list(fake.inbounds[TAG]) == ["e1"]
+        assert service.errors == 0
+    run(scenario)
+
+
+def test_remove_client():
+    async def scenario(fake, service):
+        await service.add_client(NODE, "e1", UUID)
+        assert await service.remove_client(NODE, "e1") is True
+        assert fake.inbounds[TAG] == {}
+        assert await service.remove_client(NODE, "e1") is False
+    run(scenario)
+
+
+def test_retry_on_unavailable():
+    async def scenario(fake, service):
+        fake.fail_next = 2
+        assert await service.add_client(NODE, "e1", UUID) is True
+        assert fake.calls == 3
+        assert service.retries == 2
+    run(scenario)
+
+
+def test_retries_exhausted(monkeypatch):
+    monkeypatch.setattr(xray.settings, "RETRIES", 1)
+
+    async def scenario(fake, service):
+        fake.fail_next = 5
+        with pytest.raises(xray.XrayError):
+            await service.add_client(NODE, "e1", UUID)
+        assert fake.calls == 2
+    run(scenario)
+
+
+def test_query_stats_with_reset():
+    async def scenario(fake, service):
+        fake.counters.update({
+            "user>>>e1>>>traffic>>>uplink": 100,
+            "user>>>e1>>>traffic>>>downlink": 2500,
+            "inbound>>>vless-in>>>traffic>>>uplink": 7,
+        })
+        stats = dict(await service.query_stats(NODE, "user>>>", reset=True))
+        assert stats == {
+            "user>>>e1>>>traffic>>>uplink": 100,
+            "user>>>e1>>>traffic>>>downlink": 2500,
+        }
+        assert fake.counters["user>>>e1>>>traffic>>>uplink"] == 0
+        assert fake.counters["inbound>>>vless-in>>>traffic>>>uplink"] == 7
+        again = dict(await service.query_stats(NODE, "user>>>"))
+        assert set(again.values()) <= {0}
+    run(scenario)